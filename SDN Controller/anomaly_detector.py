@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Anomaly Detector - robust z-scores against a node's own history and its peers
+
+import warnings
+import numpy as np
+
+from config import *
+
+# Robust z-score scale: MAD of a normal distribution is 0.6745 sigma
+MAD_SCALE = 0.6745
+
+INTERFACE_CODES = {'ITSG5': 0, 'CV2X': 1}
+
+def robust_z(values, median, mad):
+    """
+    (value - median) / MAD, scaled to standard deviations
+    """
+    return MAD_SCALE * (values - median) / np.maximum(mad, ANOMALY_MAD_FLOOR)
+
+def _nanmedian(values, axis=None):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(values, axis=axis)
+
+class AnomalyDetector:
+    """
+    Keeps a fixed-length history of window means per node in one matrix
+    per metric, so every tick is scored in a single vectorized pass
+    """
+    def __init__(self, history=ANOMALY_HISTORY, capacity=64):
+        self.history = history
+        self.rows = {}  # {node_id: row}
+        self.latency_history = np.full((capacity, history), np.nan)
+        self.power_history = np.full((capacity, history), np.nan)
+        self.cursor = np.zeros(capacity, dtype=np.int64)
+        self.latest_latency = np.full(capacity, np.nan)
+        self.latest_power = np.full(capacity, np.nan)
+        self.interfaces = np.full(capacity, -1, dtype=np.int8)
+
+    def _row(self, node_id):
+        row = self.rows.get(node_id)
+        if row is None:
+            row = self.rows[node_id] = len(self.rows)
+            if row >= len(self.cursor):
+                self._grow()
+        return row
+
+    def _grow(self):
+        old = len(self.cursor)
+        capacity = old * 2
+        for name in ('latency_history', 'power_history'):
+            grown = np.full((capacity, self.history), np.nan)
+            grown[:old] = getattr(self, name)
+            setattr(self, name, grown)
+        for name, fill, dtype in (('cursor', 0, np.int64), ('latest_latency', np.nan, float),
+                                  ('latest_power', np.nan, float), ('interfaces', -1, np.int8)):
+            grown = np.full(capacity, fill, dtype=dtype)
+            grown[:old] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def reset(self, node_id):
+        """
+        Forget a node's baseline (e.g. after it changed interface)
+        """
+        row = self.rows.get(node_id)
+        if row is not None:
+            self.latency_history[row] = np.nan
+            self.power_history[row] = np.nan
+            self.cursor[row] = 0
+
+    def detect(self, node_ids, avg_latency, avg_power, interfaces):
+        """
+        Score a batch of nodes and record their values in the history.
+        Returns [(node_id, score)] of anomalous nodes, worst first.
+        """
+        rows = np.array([self._row(n) for n in node_ids], dtype=np.int64)
+        avg_latency = np.asarray(avg_latency, dtype=float)
+        avg_power = np.asarray(avg_power, dtype=float)
+        self.latest_latency[rows] = avg_latency
+        self.latest_power[rows] = avg_power
+        self.interfaces[rows] = [INTERFACE_CODES.get(i, -1) for i in interfaces]
+
+        # Against the node's own history (needs a minimum baseline)
+        enough = np.minimum(self.cursor[rows], self.history) >= ANOMALY_MIN_HISTORY
+        self_latency = self._self_z(self.latency_history[rows], avg_latency)
+        self_power = self._self_z(self.power_history[rows], avg_power)
+        self_latency[~enough] = np.nan
+        self_power[~enough] = np.nan
+
+        # Against peers currently on the same interface
+        peer_latency = np.full(len(rows), np.nan)
+        peer_power = np.full(len(rows), np.nan)
+        known = len(self.rows)
+        for code in np.unique(self.interfaces[rows]):
+            if code < 0:
+                continue
+            members = self.interfaces[:known] == code
+            if members.sum() < ANOMALY_MIN_PEERS:
+                continue
+            batch = self.interfaces[rows] == code
+            peer_latency[batch] = self._peer_z(self.latest_latency[:known][members], avg_latency[batch])
+            peer_power[batch] = self._peer_z(self.latest_power[:known][members], avg_power[batch])
+
+        # Higher latency and lower power are the bad directions
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            scores = np.nanmax(np.vstack([self_latency, peer_latency, -self_power, -peer_power]), axis=0)
+
+        self._record(rows, avg_latency, avg_power)
+
+        flagged = np.flatnonzero(scores >= ANOMALY_Z_THRESHOLD)
+        ranked = flagged[np.argsort(-scores[flagged], kind='stable')]
+        return [(node_ids[i], float(scores[i])) for i in ranked]
+
+    def _self_z(self, history, values):
+        median = _nanmedian(history, axis=1)
+        mad = _nanmedian(np.abs(history - median[:, None]), axis=1)
+        return robust_z(values, median, mad)
+
+    def _peer_z(self, peers, values):
+        median = _nanmedian(peers)
+        mad = _nanmedian(np.abs(peers - median))
+        return robust_z(values, median, mad)
+
+    def _record(self, rows, avg_latency, avg_power):
+        slots = self.cursor[rows] % self.history
+        self.latency_history[rows, slots] = avg_latency
+        self.power_history[rows, slots] = avg_power
+        self.cursor[rows] += 1
+
+detector = AnomalyDetector()
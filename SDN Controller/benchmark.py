@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# Benchmarks - offline performance measurements for controller components
+
+import sys
+
+from benchmarks import BENCHMARKS
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+        print()
+
+if __name__ == "__main__":
+    main()
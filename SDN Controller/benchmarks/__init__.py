@@ -0,0 +1,30 @@
+# Benchmarks - offline performance measurements for controller components, by area
+
+from benchmarks.switching import (benchmark_switching_kernel, evaluate_predictive_switching,
+                                  benchmark_link_scoring, benchmark_anomaly_detection)
+from benchmarks.mobility import (benchmark_relay_selection, benchmark_spatial_index, evaluate_handover_scheduling,
+                                 benchmark_coverage_model, benchmark_node_movement)
+from benchmarks.congestion import evaluate_congestion_control
+from benchmarks.rules import (benchmark_rule_broadcast, evaluate_group_broadcast, evaluate_rule_patches,
+                              evaluate_rule_reconciliation, benchmark_rule_expiry)
+from benchmarks.delivery import evaluate_delivery_tracking, evaluate_switch_timing
+
+BENCHMARKS = {
+    'switching_kernel': benchmark_switching_kernel,
+    'predictive_switching': evaluate_predictive_switching,
+    'link_scoring': benchmark_link_scoring,
+    'relay_selection': benchmark_relay_selection,
+    'spatial_index': benchmark_spatial_index,
+    'anomaly_detection': benchmark_anomaly_detection,
+    'congestion_control': evaluate_congestion_control,
+    'handover_scheduling': evaluate_handover_scheduling,
+    'coverage_model': benchmark_coverage_model,
+    'node_movement': benchmark_node_movement,
+    'rule_broadcast': benchmark_rule_broadcast,
+    'group_broadcast': evaluate_group_broadcast,
+    'rule_patches': evaluate_rule_patches,
+    'rule_reconciliation': evaluate_rule_reconciliation,
+    'rule_expiry': benchmark_rule_expiry,
+    'delivery_tracking': evaluate_delivery_tracking,
+    'switch_timing': evaluate_switch_timing,
+}
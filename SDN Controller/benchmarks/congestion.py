@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Benchmarks - channel load with fixed rates vs CBR-driven hints
+
+import numpy as np
+
+from config import *
+
+def _fake_fleet_run(control, nodes=120, areas=4, duration=300, seed=6,
+                    packet_airtime=0.0002, report_airtime=0.01, messages_per_report=4):
+    """
+    Fake ITSG5 nodes on a shared channel per area. Busy ratio is the airtime
+    of test traffic plus telemetry; nodes report it at their reporting
+    interval in the JSON the node's data monitor publishes, and the reports
+    go through data_processor.process_channel_load. With control, nodes
+    follow the hints handed back for them instead of a rate control rule
+    sent over MQTT; the rest of process_received_data needs a broker.
+    """
+    import json
+    import congestion_control as cc
+    import data_processor
+
+    rng = np.random.default_rng(seed)
+    for store in (cc.node_loads, cc.area_loads, cc.area_members, cc.area_states, cc.hinted_states):
+        store.clear()
+    node_ids = [f"F{i}" for i in range(nodes)]
+    area_ids = rng.integers(0, areas, nodes)
+    for node_id, area in zip(node_ids, area_ids):
+        # Parked on the track inside their area
+        data_processor.speed_data[node_id] = {'speed': 0, 'position': (area + rng.uniform(0.1, 0.9)) * CBR_AREA_SIZE,
+                                              'direction': 1}
+
+    # Without hints nodes keep the legacy 5 s reports and 100 pps test traffic
+    interval = np.full(nodes, 5.0)
+    rate = np.full(nodes, 100.0)
+    next_report = rng.uniform(0, 5.0, nodes)
+    busy_samples, messages, delivered = [], 0, 0.0
+
+    def follow_hints(node_id):
+        hints = cc.rate_hints(node_id)
+        j = int(node_id[1:])
+        interval[j] = hints['Report interval']
+        rate[j] = hints['Traffic rate']
+
+    for t in range(duration):
+        load = rate * packet_airtime + report_airtime / interval
+        busy = np.bincount(area_ids, weights=load, minlength=areas) + 0.05
+        busy_samples.append(busy)
+        delivered += rate.sum()
+
+        due = np.flatnonzero(next_report <= t)
+        for i in due:
+            measured = min(1.0, busy[area_ids[i]] + rng.normal(0, 0.02))
+            messages += messages_per_report
+            next_report[i] = t + interval[i]
+            if not control:
+                continue
+            message = json.dumps({'NODE_ID': node_ids[i], 'Current interface': 'ITSG5', 'CBR': f"{measured:.3f}"})
+            data = json.loads(message)
+            data_processor.process_channel_load(data['NODE_ID'], data['Current interface'], data, follow_hints)
+
+    for node_id in node_ids:
+        del data_processor.speed_data[node_id]
+    busy_samples = np.minimum(np.array(busy_samples), 1.0)
+    return {
+        'mean': busy_samples.mean(),
+        'p95': np.quantile(busy_samples, 0.95),
+        'saturated': (busy_samples >= 0.65).mean(),
+        'ingest': messages / duration,
+        'pps': delivered / duration,
+    }
+
+def evaluate_congestion_control():
+    """
+    Channel load and controller ingest rate with fixed rates vs CBR-driven hints
+    """
+    print(f"{'mode':>10} {'mean CBR':>9} {'p95 CBR':>9} {'>=0.65':>8} {'ingest msg/s':>13} {'test pps':>9}")
+    for name, control in (('fixed', False), ('cbr hints', True)):
+        r = _fake_fleet_run(control)
+        print(f"{name:>10} {r['mean']:>9.2f} {r['p95']:>9.2f} {r['saturated']:>8.1%} "
+              f"{r['ingest']:>13.1f} {r['pps']:>9.0f}")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# Benchmarks - rule delivery tracking and per-switch timing
+
+import numpy as np
+
+from config import *
+
+def evaluate_delivery_tracking(messages=100_000, rate=2_000, loss=(0.0, 0.01, 0.05), refused=0.001,
+                               reconnect_every=10.0, seed=14):
+    """
+    Simulated broker with log-normal PUBACK latency and lost publishes
+    that paho resends under the same mid when the client reconnects
+    (every reconnect_every seconds), plus publishes paho refuses outright:
+    peak in-flight depth, rule delivery latency, messages counted late and
+    rules delivered on the first attempt vs after a resend or retry
+    """
+    import heapq
+    import logging
+    from delivery_tracker import DeliveryTracker
+
+    # Late messages are counted in the table; the tracker's warnings would drown it
+    logging.disable(logging.WARNING)
+    rng = np.random.default_rng(seed)
+    print(f"{'loss':>5} {'max in flight':>14} {'p50 ms':>7} {'p99 ms':>8} {'late':>6} {'retried':>8} "
+          f"{'first attempt':>14} {'delivered':>10}")
+    for p in loss:
+        clock = [0.0]
+        tracker = DeliveryTracker(clock=lambda: clock[0])
+        acks = []  # [(ack time, mid)]
+        mids = iter(range(1, 10 ** 9))
+        latencies = []
+        first_attempt = 0
+        next_reconnect = reconnect_every
+
+        def transmit(mid):
+            if rng.random() >= p:
+                heapq.heappush(acks, (clock[0] + rng.lognormal(np.log(0.02), 0.6), mid))
+
+        def send(delivery=None):
+            mid = next(mids)
+            queued = rng.random() >= refused
+            if queued:
+                transmit(mid)
+            tracker.track(mid, 'node/command/N', b'', 'N', ['001'], delivery=delivery, queued=queued)
+
+        def advance(now):
+            nonlocal first_attempt, next_reconnect
+            while acks and acks[0][0] <= now:
+                clock[0], mid = heapq.heappop(acks)
+                delivery = tracker.pending.get(mid)
+                if delivery is not None:
+                    latencies.append((clock[0] - delivery.first_sent) * 1000)
+                    first_attempt += delivery.attempt == 0
+                tracker.acknowledge(mid)
+            clock[0] = now
+            if now >= next_reconnect:
+                # paho resends its unacknowledged messages under their mids
+                for mid in list(tracker.pending):
+                    transmit(mid)
+                tracker.reconnected()
+                next_reconnect += reconnect_every
+            for delivery in tracker.overdue():
+                send(delivery)
+
+        for i in range(messages):
+            advance(i / rate)
+            send()
+        while acks or tracker.pending or tracker.refused:
+            advance(min(acks[0][0] if acks else next_reconnect, next_reconnect))
+        stats = tracker.stats()
+        print(f"{p:>5.2f} {stats['max in flight']:>14} {np.percentile(latencies, 50):>7.1f} "
+              f"{np.percentile(latencies, 99):>8.1f} {stats['late']:>6} {stats['retried']:>8} "
+              f"{first_attempt / messages:>14.2%} {stats['acknowledged'] / messages:>10.3%}")
+    logging.disable(logging.NOTSET)
+
+def evaluate_switch_timing(switches=2_000, rates=(0.1, 1, 10), seed=15):
+    """
+    Switch timing measurements with overlapping switches across nodes:
+    the single global T_r/T_g/T_s/T_b vs transactions keyed by (Num,
+    NODE_ID). A measurement is correct when all its timestamps belong to
+    the switch that was acknowledged.
+    """
+    import os
+    import heapq
+    from switch_transactions import SwitchTransactions
+
+    rng = np.random.default_rng(seed)
+    print(f"{'switches/s':>11} {'global kept':>12} {'global correct':>15} {'table correct':>14}")
+    for rate in rates:
+        starts = np.cumsum(rng.exponential(1 / rate, switches))
+        events = []  # [(time, order, kind, switch)]
+        for i, start in enumerate(starts):
+            generated = start + rng.uniform(0.001, 0.01)
+            sent = generated + rng.uniform(0.001, 0.02)
+            acked = sent + rng.lognormal(np.log(0.05), 0.8)
+            for order, (kind, at) in enumerate((('r', start), ('g', generated), ('s', sent), ('b', acked))):
+                heapq.heappush(events, (at, order, kind, i))
+
+        clock = [0.0]
+        table = SwitchTransactions(clock=lambda: clock[0], log_path=os.devnull)
+        stamps, generated_at = {}, {}
+        global_kept = global_correct = table_correct = 0
+        while events:
+            clock[0], _, kind, i = heapq.heappop(events)
+            node_id, num = f"N{i % 50}", f"{i:05d}"
+            stamps[kind] = i  # the global variables only remember the last switch
+            if kind == 'r':
+                table.note_received(node_id)
+            elif kind == 'g':
+                generated_at[i] = clock[0]  # the decision passes its own start along
+            elif kind == 's':
+                table.open(node_id, num, 'ITSG5', 'CV2X', generated_at.pop(i))
+            else:
+                if len(stamps) == 4:
+                    global_kept += 1
+                    global_correct += all(owner == i for owner in stamps.values())
+                    stamps = {}
+                transaction = table.acknowledge(node_id, num)
+                table_correct += (transaction is not None and transaction.num == num
+                                  and transaction.generated < transaction.sent < transaction.acked)
+        print(f"{rate:>11} {global_kept / switches:>12.1%} {global_correct / switches:>15.1%} "
+              f"{table_correct / switches:>14.1%}")
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# Benchmarks - node movement, coverage, handovers and relay selection
+
+import time
+import numpy as np
+
+from config import *
+
+def benchmark_relay_selection(sizes=(1000, 5000, 10000), spacing=10.0, queries=200):
+    """
+    Relay path search time on a corridor with one node every spacing meters
+    """
+    import relay_graph
+    from spatial_index import track_index
+
+    rng = np.random.default_rng(3)
+    print(f"{'nodes':>8} {'build ms':>10} {'update us':>10} {'select us':>10}")
+    for n in sizes:
+        relay_graph.graph_nodes.clear()
+        relay_graph.adjacency.clear()
+        track_index.entries.clear()
+        track_index.positions.clear()
+
+        positions = rng.uniform(0, n * spacing, n)
+        start = time.perf_counter()
+        for i, position in enumerate(positions):
+            relay_graph.update_node(f"N{i}", position=float(position),
+                                    interface='ITSG5' if i % 2 else 'CV2X')
+        build = time.perf_counter() - start
+
+        movers = rng.integers(0, n, queries)
+        start = time.perf_counter()
+        for i in movers:
+            relay_graph.update_node(f"N{i}", position=float(positions[i] + rng.uniform(-10, 10)))
+        update = (time.perf_counter() - start) / queries
+
+        targets = rng.integers(0, n, queries)
+        start = time.perf_counter()
+        for i in targets:
+            relay_graph.find_relay_path(f"N{i}", 'ITSG5')
+        select = (time.perf_counter() - start) / queries
+        print(f"{n:>8} {build * 1000:>10.1f} {update * 1e6:>10.1f} {select * 1e6:>10.1f}")
+
+def benchmark_spatial_index(sizes=(1000, 10000, 100000), queries=1000):
+    """
+    Update, radius and k-nearest query cost for the track and road grid indexes
+    """
+    from spatial_index import TrackIndex, GridIndex
+
+    rng = np.random.default_rng(4)
+    print(f"{'index':>6} {'nodes':>8} {'update us':>10} {'radius us':>10} {'knn us':>10}")
+    for n in sizes:
+        track, grid = TrackIndex(), GridIndex()
+        xs = rng.uniform(0, n * 10.0, n)
+        ys = rng.uniform(0, 2000.0, n)
+        for i in range(n):
+            track.update(str(i), float(xs[i]))
+            grid.update(str(i), float(xs[i]), float(ys[i]))
+
+        picks = [int(i) for i in rng.integers(0, n, queries)]
+        for name, index, move, around in (
+            ('track', track,
+             lambda i: track.update(str(i), float(xs[i] + 5)),
+             lambda i: (float(xs[i]),)),
+            ('grid', grid,
+             lambda i: grid.update(str(i), float(xs[i] + 5), float(ys[i])),
+             lambda i: (float(xs[i]), float(ys[i]))),
+        ):
+            start = time.perf_counter()
+            for i in picks:
+                move(i)
+            update = (time.perf_counter() - start) / queries
+            start = time.perf_counter()
+            for i in picks:
+                index.within(*around(i), RELAY_RANGE)
+            radius = (time.perf_counter() - start) / queries
+            start = time.perf_counter()
+            for i in picks:
+                index.nearest(*around(i), 8, exclude=(str(i),))
+            knn = (time.perf_counter() - start) / queries
+            print(f"{name:>6} {n:>8} {update * 1e6:>10.1f} {radius * 1e6:>10.1f} {knn * 1e6:>10.1f}")
+
+def _handover_outage(predictive, nodes=200, duration=600.0, step=0.1, seed=7,
+                     cells=None, detection_delay=LATENCY_WINDOW):
+    """
+    Seconds per node spent outside the coverage of the technology in use.
+    Reactive switching starts once the node has left coverage and its
+    metric window has filled with bad samples; predictive switching starts
+    when the scheduler fires ahead of the predicted crossing.
+    """
+    from handover_scheduler import HandoverScheduler
+    from coverage_model import CoverageModel
+
+    model = CoverageModel(cells or {'ITSG5': [(600, 0, 600)], 'CV2X': [(1400, 0, 600)]})
+    rng = np.random.default_rng(seed)
+    clock = [0.0]
+    scheduler = HandoverScheduler(clock=lambda: clock[0])
+
+    position = rng.uniform(0, COVERAGE, nodes)
+    speed = rng.uniform(30, 120, nodes)
+    direction = rng.choice([-1, 1], nodes)
+    interface = np.array(['ITSG5' if p < 1000 else 'CV2X' for p in position], dtype=object)
+    switch_done = np.full(nodes, np.inf)  # time the in-flight switch completes
+    switch_target = [None] * nodes
+    outside_since = np.full(nodes, np.nan)
+    outage = 0.0
+
+    def plan(i):
+        point = [[position[i], 0]]
+        velocity = [[direction[i] * speed[i] / 3.6, 0]]
+        covered, eta, target = model.evaluate([i], point, velocity, [True])[i][interface[i]]
+        if not covered or np.isinf(eta):
+            scheduler.cancel(str(i))
+        else:
+            scheduler.schedule(str(i), clock[0] + eta, target)
+
+    def start_switch(i, target):
+        if target is None or np.isfinite(switch_done[i]):
+            return
+        switch_target[i] = target
+        switch_done[i] = clock[0] + rng.lognormal(np.log(DEFAULT_SWITCH_DURATION), 0.3)
+
+    if predictive:
+        for i in range(nodes):
+            plan(i)
+
+    for _ in range(int(duration / step)):
+        clock[0] += step
+        position += direction * speed / 3.6 * step
+        turned = (position >= COVERAGE) | (position <= 0)
+        direction[turned] *= -1
+        np.clip(position, 0, COVERAGE, out=position)
+
+        for i in np.flatnonzero(switch_done <= clock[0]):
+            interface[i] = switch_target[i]
+            switch_done[i] = np.inf
+            if predictive:
+                plan(i)
+        if predictive:
+            for i in np.flatnonzero(turned):
+                plan(i)
+            for node_id, _, target in scheduler.due():
+                start_switch(int(node_id), target)
+
+        points = np.column_stack([position, np.zeros(nodes)])
+        inside = np.zeros(nodes, dtype=bool)
+        for technology in model.technologies:
+            on_technology = interface == technology
+            inside[on_technology] = model.covered(points[on_technology], technology)
+        outside_since[inside] = np.nan
+        for i in np.flatnonzero(~inside):
+            outage += step
+            if np.isnan(outside_since[i]):
+                outside_since[i] = clock[0]
+            if not predictive and clock[0] - outside_since[i] >= detection_delay:
+                other = 'CV2X' if interface[i] == 'ITSG5' else 'ITSG5'
+                start_switch(i, other)
+
+    return outage / nodes
+
+def evaluate_handover_scheduling():
+    """
+    Outage per node, reactive switching vs handovers scheduled from kinematics
+    """
+    reactive = _handover_outage(predictive=False)
+    predictive = _handover_outage(predictive=True)
+    print(f"{'mode':>10} {'outage s/node':>14}")
+    print(f"{'reactive':>10} {reactive:>14.1f}")
+    print(f"{'scheduled':>10} {predictive:>14.1f}")
+
+def benchmark_coverage_model(sizes=(1_000, 10_000, 100_000), cells_per_tech=50, seed=8):
+    """
+    Vectorized membership, time to exit and handover target for a fleet
+    on a road grid covered by overlapping cells of both technologies
+    """
+    from coverage_model import CoverageModel
+
+    rng = np.random.default_rng(seed)
+    extent = 10_000
+    cells = {t: [(x, y, r) for x, y, r in zip(rng.uniform(0, extent, cells_per_tech),
+                                             rng.uniform(0, extent, cells_per_tech),
+                                             rng.uniform(400, 1200, cells_per_tech))]
+             for t in ('ITSG5', 'CV2X')}
+    model = CoverageModel(cells, track=(0, extent))
+
+    print(f"{'nodes':>8} {'cells':>6} {'ms/tick':>9} {'us/node':>8} {'covered':>8}")
+    for n in sizes:
+        node_ids = [str(i) for i in range(n)]
+        points = rng.uniform(0, extent, (n, 2))
+        velocities = rng.normal(0, 15, (n, 2))
+        on_track = np.zeros(n, dtype=bool)
+        start = time.perf_counter()
+        snapshot = model.evaluate(node_ids, points, velocities, on_track)
+        elapsed = time.perf_counter() - start
+        covered = sum(any(c for c, _, _ in entry.values()) for entry in snapshot.values()) / n
+        print(f"{n:>8} {cells_per_tech * 2:>6} {elapsed * 1e3:>9.1f} {elapsed / n * 1e6:>8.2f} {covered:>8.0%}")
+
+def benchmark_node_movement(sizes=(1_000, 10_000, 100_000), ticks=20, seed=9):
+    """
+    Keeping positions current: the per-node dict loop run every second
+    (debug line formatted for every node) vs evaluating the whole fleet in
+    closed form, which is only needed when a query asks for positions
+    """
+    import logging
+    from fleet_motion import FleetMotion
+
+    rng = np.random.default_rng(seed)
+    clock = [0.0]
+    print(f"{'nodes':>8} {'loop ms/tick':>13} {'closed form ms':>15} {'max error m':>12}")
+    for n in sizes:
+        speeds = rng.uniform(30, 120, n)
+        positions = rng.uniform(0, COVERAGE, n)
+        clock[0] = 0.0
+        fleet = FleetMotion(clock=lambda: clock[0])
+        speed_data = {}
+        for i in range(n):
+            fleet[str(i)] = {'speed': speeds[i], 'position': positions[i], 'direction': 1}
+            speed_data[str(i)] = {'speed': speeds[i], 'position': positions[i], 'direction': 1}
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for node_id in list(speed_data.keys()):
+                speed = speed_data[node_id]['speed']
+                position = speed_data[node_id]['position']
+                direction = speed_data[node_id]['direction']
+                new_position = position + direction * (speed * 1000 / 3600)
+                if new_position >= COVERAGE or new_position <= 0:
+                    speed_data[node_id]['direction'] *= -1
+                    new_position = max(0, min(COVERAGE, new_position))
+                speed_data[node_id]['position'] = new_position
+                logging.debug(f"Node {node_id} moved to position {new_position:.2f}m "
+                              f"(speed: {speed}km/h, direction: {'+' if direction > 0 else '-'})")
+        loop = (time.perf_counter() - start) / ticks
+
+        clock[0] = float(ticks)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            closed, _ = fleet.kinematics()
+        lazy = (time.perf_counter() - start) / ticks
+
+        # The tick loop clamps at the track ends and loses the overshoot
+        error = np.abs(closed - np.array([speed_data[str(i)]['position'] for i in range(n)])).max()
+        print(f"{n:>8} {loop * 1e3:>13.2f} {lazy * 1e3:>15.3f} {error:>12.1f}")
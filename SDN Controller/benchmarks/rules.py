@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# Benchmarks - flow rule rendering, broadcast, patches, reconciliation and expiry
+
+import time
+import numpy as np
+
+from config import *
+from benchmarks.timing import time_call
+
+def benchmark_rule_broadcast(nodes=1_000, rounds=20):
+    """
+    Fleet-wide TX rule broadcast: a fresh dict, json.dumps, an f-string log
+    line and a log file append per rule vs rendering from a template with
+    one batched log write
+    """
+    import os
+    import json
+    import logging
+    import tracemalloc
+    from rule_templates import RuleTemplate
+
+    logger = logging.getLogger('benchmark.rules')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.FileHandler(os.devnull))
+
+    matches = [{'NODE_ID': f"N{i}", 'Src MAC': f"02:00:00:00:{i // 256:02x}:{i % 256:02x}",
+                'Des MAC': '*', 'Src IP': f"10.0.{i // 256}.{i % 256}", 'Des IP': '*',
+                'Src Port': 5000, 'Des Port': 5000, 'Current interface': 'ITSG5'} for i in range(nodes)]
+    encoded = [json.dumps(match) for match in matches]
+    extras = {'Report interval': 5, 'Traffic rate': 50,
+              'TX profile': {'MCS': 'MK2MCS_R12QPSK', 'Power': 30, 'Rate': 100, 'Length': 50}}
+    shared = {'Command type': 'Tech switching', 'Value': 'ITSG5_tx',
+              'Rx Power Threshold': '*', 'Latency': '*', 'Priority': '*'}
+
+    # Both return the rules the controller keeps in its flow rule table
+    def per_rule():
+        stored = []
+        for i, match in enumerate(matches):
+            flow_rule = {'Num': f"{i:03d}", 'match': dict(match), **shared, **extras,
+                         'Counter': 0, 'Timeout': 35.0}
+            payload = json.dumps(flow_rule)
+            logger.info(f"Sending ITSG5 flow rule: {flow_rule}")
+            with open(os.devnull, 'a') as f:
+                f.write(json.dumps(flow_rule) + '\n')
+            stored.append(flow_rule)
+        return stored
+
+    def templated():
+        template = RuleTemplate(**shared)
+        stored, payloads = [], []
+        for i, match in enumerate(matches):
+            flow_rule, payload = template.render(f"{i:03d}", encoded[i], match, 35.0, extras)
+            stored.append(flow_rule)
+            payloads.append(payload)
+        logger.info(f"Sent {len(payloads)} ITSG5_tx flow rules (Tech switching)")
+        with open(os.devnull, 'ab') as f:
+            f.write(b'\n'.join(payloads) + b'\n')
+        return stored
+
+    print(f"{'mode':>10} {'rules/s':>10} {'stored B/rule':>14}")
+    for name, broadcast in (('per rule', per_rule), ('template', templated)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            broadcast()
+        rate = nodes * rounds / (time.perf_counter() - start)
+        tracemalloc.start()
+        stored = broadcast()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del stored
+        print(f"{name:>10} {rate:>10.0f} {retained / nodes:>14.0f}")
+
+def evaluate_group_broadcast(sizes=(1_000, 10_000), broadcasts=10, interval=10.0, track=10_000, seed=10):
+    """
+    Broker messages per TX rule broadcast: one publish per node vs one per
+    segment group plus a membership message for each node that changed
+    segment since the previous broadcast
+    """
+    from rule_groups import RuleGroups
+
+    rng = np.random.default_rng(seed)
+    print(f"{'nodes':>8} {'groups':>7} {'per node':>9} {'first':>7} {'steady':>7}")
+    for n in sizes:
+        groups = RuleGroups()
+        position = rng.uniform(0, track, n)
+        velocity = rng.uniform(30, 120, n) / 3.6 * rng.choice([-1, 1], n)
+        counts = []
+        for _ in range(broadcasts):
+            segments = np.floor(position / RULE_GROUP_SEGMENT).astype(int)
+            moves = 0
+            for i in range(n):
+                gid = f"seg_{segments[i]}"
+                if groups.group_of.get(i) != gid:
+                    groups.assign(i, gid)
+                    moves += 1
+            counts.append(moves + len(groups.members))
+            position = np.mod(position + velocity * interval, track)
+        print(f"{n:>8} {len(groups.members):>7} {n:>9} {counts[0]:>7} {np.mean(counts[1:]):>7.0f}")
+
+def evaluate_rule_patches(nodes=1_000, decisions=10, seed=11):
+    """
+    Bytes sent and rules held per node when every switching decision
+    sends a new rule vs patching the node's rule of the same kind in place
+    """
+    import json
+    from rule_templates import RuleTemplate, rule_patch
+
+    rng = np.random.default_rng(seed)
+    extras = {'Report interval': 5, 'Traffic rate': 50, 'TX profile': '*'}
+    matches = [{'NODE_ID': f"N{i}", **dict.fromkeys(MATCH_FIELDS, '*')} for i in range(nodes)]
+    encoded = [json.dumps(match) for match in matches]
+    latencies = np.round(rng.uniform(20, LATENCY_THRESHOLD_CAP, (decisions, nodes)), 1)
+    timeouts = np.round(rng.uniform(10, 150, (decisions, nodes)), 1)
+
+    results = {}
+    for mode in ('new rule', 'patch'):
+        held = [dict() for _ in range(nodes)]  # {Num: rule} as the node keeps them
+        sent = 0
+        num = 0
+        for d in range(decisions):
+            for i in range(nodes):
+                template = RuleTemplate(**{'Command type': 'Tech switching', 'Value': 'ITSG5_rx',
+                                           'Rx Power Threshold': -70.0, 'Latency': float(latencies[d, i]),
+                                           'Priority': 1})
+                previous = next(iter(held[i].values()), None) if mode == 'patch' else None
+                if previous is None:
+                    num += 1
+                    flow_rule, payload = template.render(f"{num:03d}", encoded[i], matches[i],
+                                                         float(timeouts[d, i]), extras)
+                else:
+                    flow_rule, _ = template.render(previous['Num'], encoded[i], matches[i],
+                                                   float(timeouts[d, i]), extras, previous['Version'] + 1)
+                    payload = json.dumps(rule_patch(f"N{i}", previous, flow_rule)).encode()
+                held[i][flow_rule['Num']] = flow_rule
+                sent += len(payload)
+        results[mode] = (sent / (nodes * decisions), np.mean([len(rules) for rules in held]))
+
+    print(f"{'mode':>10} {'B/decision':>11} {'rules/node':>11}")
+    for mode, (size, count) in results.items():
+        print(f"{mode:>10} {size:>11.0f} {count:>11.1f}")
+
+def evaluate_rule_reconciliation(rules=100, drifts=(0, 1, 5, 20), trials=200, seed=12):
+    """
+    Rules resent and dropped per reconciliation of one node's rule set
+    against the controller's view, for growing numbers of lost rules, lost
+    disable messages and stale versions, vs resending the whole rule set
+    """
+    import json
+    from rule_digest import rule_digest, drifted_buckets, bucket_of, rule_differences
+
+    rng = np.random.default_rng(seed)
+    controller = {f"{i:03d}": 1 for i in range(rules)}
+    print(f"{'drift':>6} {'digest B':>9} {'buckets':>8} {'reply B':>8} {'resent':>7} {'dropped':>8} {'full':>6}")
+    for drift in drifts:
+        resent, dropped, buckets, size, reply = [], [], [], [], []
+        for _ in range(trials):
+            node = dict(controller)
+            for k, num in enumerate(rng.choice(rules, drift, replace=False)):
+                num = f"{num:03d}"
+                kind = k % 3
+                if kind == 0:
+                    del node[num]  # rule lost on the way
+                elif kind == 1:
+                    node[num] += 1  # patch the controller forgot about
+                else:
+                    node[f"x{num}"] = 1  # disable message lost, node still has it
+            node_digest = rule_digest(node.items())
+            drifted = set(drifted_buckets(rule_digest(controller.items()), node_digest))
+            # The node reports its (Num, Version) pairs of the drifted buckets
+            node_rules = {num: version for num, version in node.items() if bucket_of(num) in drifted}
+            send, drop = rule_differences({num: version for num, version in controller.items()
+                                           if bucket_of(num) in drifted}, node_rules)
+            resent.append(len(send))
+            dropped.append(len(drop))
+            buckets.append(len(drifted))
+            size.append(len(json.dumps({str(bucket): value for bucket, value in node_digest.items()})))
+            reply.append(len(json.dumps(node_rules)) if drifted else 0)
+        print(f"{drift:>6} {np.mean(size):>9.0f} {np.mean(buckets):>8.1f} {np.mean(reply):>8.0f} "
+              f"{np.mean(resent):>7.1f} {np.mean(dropped):>8.1f} {rules:>6}")
+
+def benchmark_rule_expiry(sizes=(10_000, 100_000, 1_000_000), ticks=50, seed=13):
+    """
+    Cost of finding expired rules once per second: scanning every rule's
+    deadline vs popping due slots from the timer wheel, while a tenth of
+    the rules get their timeout restarted (patches) and leave stale entries
+    """
+    from rule_expiry import RuleExpiry
+
+    rng = np.random.default_rng(seed)
+    print(f"{'rules':>9} {'scan ms/tick':>13} {'wheel ms/tick':>14} {'schedule us':>12} {'expired':>8}")
+    for n in sizes:
+        timeouts = rng.uniform(10, 150, n)
+        deadlines = {(f"N{i % 1000}", f"{i:07d}"): timeouts[i] for i in range(n)}
+
+        def scan():
+            expired = 0
+            for now in range(ticks):
+                due = [key for key, deadline in deadlines.items() if deadline <= now]
+                expired += len(due)
+            return expired
+
+        expiry = RuleExpiry(clock=lambda: 0.0)
+        start = time.perf_counter()
+        for (node_id, num), timeout in deadlines.items():
+            expiry.schedule(node_id, num, timeout, now=0.0)
+        schedule_us = (time.perf_counter() - start) / n * 1e6
+        refresh = list(deadlines)[:n // 10]
+
+        scan_time = time_call(scan, repeat=1)
+        wheel_time = 0.0
+        expired = 0
+        for now in range(ticks):
+            for node_id, num in refresh[now::ticks]:
+                expiry.schedule(node_id, num, 150.0, now=float(now))
+            start = time.perf_counter()
+            expired += len(expiry.due(float(now)))
+            wheel_time += time.perf_counter() - start
+        print(f"{n:>9} {scan_time / ticks * 1e3:>13.2f} {wheel_time / ticks * 1e3:>14.3f} "
+              f"{schedule_us:>12.2f} {expired:>8}")
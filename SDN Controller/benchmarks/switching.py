@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# Benchmarks - switching decisions: fleet kernel, predictive switching, link scores and anomalies
+
+import time
+import numpy as np
+
+from config import *
+from benchmarks.timing import time_call
+
+def _scalar_fleet_pass(avg_latency, std_latency, avg_power, std_power):
+    """
+    Per-node reference of the fleet kernel's switch/abnormal conditions
+    """
+    decisions = []
+    for lat, lat_std, pw, pw_std in zip(avg_latency, std_latency, avg_power, std_power):
+        if (LATENCY_SWITCH_RANGE[0] <= lat <= LATENCY_SWITCH_RANGE[1] or
+                POWER_SWITCH_RANGE[0] <= pw <= POWER_SWITCH_RANGE[1]):
+            latency_value = min(lat + 2 * lat_std, LATENCY_THRESHOLD_CAP)
+            power_value = np.interp(pw, [-45, -10], [-70, -45])
+            decisions.append((1, latency_value, power_value))
+        elif lat > LATENCY_SWITCH_RANGE[1] or lat <= 0 or pw < POWER_SWITCH_RANGE[0] or pw == 0:
+            decisions.append((2, None, None))
+        else:
+            decisions.append((0, None, None))
+    return decisions
+
+def benchmark_switching_kernel(sizes=(100, 1000, 10000, 100000)):
+    """
+    Compare the vectorized fleet kernel with the per-node scalar path
+    """
+    from switching_kernel import evaluate_fleet
+
+    rng = np.random.default_rng(0)
+    print(f"{'nodes':>8} {'scalar ms':>12} {'kernel ms':>12} {'speedup':>9}")
+    for n in sizes:
+        avg_latency = rng.gamma(2.0, 8.0, n)
+        std_latency = rng.gamma(1.5, 2.0, n)
+        avg_power = rng.normal(-70, 10, n)
+        std_power = rng.gamma(1.5, 1.5, n)
+
+        scalar = time_call(_scalar_fleet_pass, avg_latency, std_latency, avg_power, std_power,
+                            repeat=1 if n >= 100000 else 3)
+        kernel = time_call(evaluate_fleet, avg_latency, std_latency, avg_power, std_power)
+        print(f"{n:>8} {scalar * 1000:>12.3f} {kernel * 1000:>12.3f} {scalar / kernel:>8.1f}x")
+
+def _synthetic_latency_traces(count=200, duration=120, seed=1):
+    """
+    1 Hz latency traces: half degrade with a linear drift, half stay healthy
+    """
+    rng = np.random.default_rng(seed)
+    traces = []
+    for i in range(count):
+        base = rng.uniform(5, 10)
+        trace = base + rng.normal(0, 1.0, duration)
+        if i % 2 == 0:
+            start = int(rng.integers(10, duration // 2))
+            slope = rng.uniform(0.5, 3.0)
+            trace[start:] += slope * np.arange(duration - start)
+        traces.append(list(trace))
+    return traces
+
+def _logged_latency_traces(log_path):
+    """
+    Per-node latency traces from a received_data log (one sample per second)
+    """
+    import json
+    traces = {}
+    with open(log_path) as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+                latency = float(str(data['Latency']).replace('ms', '').split()[0])
+            except (ValueError, KeyError, IndexError):
+                continue
+            traces.setdefault(data.get('NODE_ID'), []).append(latency)
+    return [trace for trace in traces.values() if len(trace) >= LATENCY_WINDOW]
+
+def _degraded_seconds(trace, switch_duration, predictive):
+    """
+    Replay one trace; the link recovers switch_duration after the rule is sent.
+    Returns (degraded seconds, whether a switch was issued).
+    """
+    from trend_predictor import time_to_crossing
+
+    threshold = LATENCY_SWITCH_RANGE[0]
+    restored_at = None
+    for t in range(len(trace)):
+        window = trace[max(0, t - LATENCY_WINDOW + 1):t + 1]
+        reactive = len(window) == LATENCY_WINDOW and np.mean(window) >= threshold
+        early = False
+        if predictive:
+            samples = list(enumerate(trace[max(0, t - TREND_WINDOW + 1):t + 1]))
+            eta = time_to_crossing(samples, threshold, rising=True)
+            early = eta is not None and 0 < eta <= switch_duration
+        if reactive or early:
+            restored_at = t + switch_duration
+            break
+
+    limit = len(trace) if restored_at is None else min(len(trace), int(np.ceil(restored_at)))
+    degraded = sum(1 for value in trace[:limit] if value >= threshold)
+    return degraded, restored_at is not None
+
+def evaluate_predictive_switching(log_path=None, switch_duration=DEFAULT_SWITCH_DURATION):
+    """
+    Degraded seconds with reactive vs trend-based pre-emptive switching,
+    replayed on logged latency data (synthetic traces if no log exists)
+    """
+    import os
+
+    log_path = log_path or RECEIVED_DATA_LOG
+    traces = _logged_latency_traces(log_path) if os.path.exists(log_path) else []
+    source = log_path
+    if not traces:
+        traces = _synthetic_latency_traces()
+        source = 'synthetic traces'
+
+    print(f"{len(traces)} traces from {source}, switch duration {switch_duration} s")
+    print(f"{'policy':>12} {'degraded s':>12} {'switches':>10}")
+    for name, predictive in (('reactive', False), ('predictive', True)):
+        results = [_degraded_seconds(trace, switch_duration, predictive) for trace in traces]
+        degraded = sum(r[0] for r in results)
+        switches = sum(r[1] for r in results)
+        print(f"{name:>12} {degraded:>12} {switches:>10}")
+
+def benchmark_link_scoring(samples=100000, nodes=1000):
+    """
+    Per-sample cost of folding telemetry into the link scores
+    """
+    from link_scoring import update_link_score
+
+    rng = np.random.default_rng(2)
+    messages = []
+    for i in range(1000):
+        messages.append({
+            'Latency': f"{rng.gamma(2.0, 8.0):.2f}ms",
+            'Power': f"{rng.normal(-70, 5):.1f},{rng.normal(-70, 5):.1f}",
+            'RSSI': f"{rng.normal(-70, 5):.1f},{rng.normal(-70, 5):.1f}",
+            'Noise': f"{rng.normal(-95, 2):.1f},{rng.normal(-95, 2):.1f}",
+            'PER': f"{rng.uniform(0, 0.2):.3f}",
+            'CBR': f"({rng.uniform(0, 1):.2f})",
+            'PPS': f"{rng.uniform(50, 100):.0f}",
+            'CBP': f"{rng.uniform(0, 60):.0f}",
+        })
+
+    start = time.perf_counter()
+    for i in range(samples):
+        update_link_score(f"N{i % nodes}", 'ITSG5' if i % 3 else 'CV2X', messages[i % len(messages)])
+    elapsed = time.perf_counter() - start
+    print(f"{samples} samples over {nodes} nodes: {elapsed / samples * 1e6:.2f} us/sample "
+          f"({samples / elapsed:,.0f} samples/s)")
+
+def benchmark_anomaly_detection(sizes=(100, 1000, 10000), ticks=40, outliers=10):
+    """
+    Per-tick detection cost and how many injected outliers are caught
+    """
+    from anomaly_detector import AnomalyDetector
+
+    rng = np.random.default_rng(5)
+    print(f"{'nodes':>8} {'tick ms':>10} {'caught':>8} {'false':>8}")
+    for n in sizes:
+        detector = AnomalyDetector()
+        node_ids = [str(i) for i in range(n)]
+        interfaces = ['ITSG5' if i % 2 else 'CV2X' for i in range(n)]
+        base_latency = rng.uniform(5, 15, n)
+        base_power = rng.uniform(-65, -55, n)
+        elapsed, caught, false = 0.0, 0, 0
+        for tick in range(ticks):
+            latency = base_latency + rng.normal(0, 1, n)
+            power = base_power + rng.normal(0, 1, n)
+            bad = set()
+            if tick == ticks - 1:
+                bad = set(int(i) for i in rng.choice(n, outliers, replace=False))
+                latency[list(bad)] += 15
+            start = time.perf_counter()
+            flagged = detector.detect(node_ids, latency, power, interfaces)
+            elapsed += time.perf_counter() - start
+            if tick == ticks - 1:
+                hits = set(int(node_id) for node_id, _ in flagged)
+                caught, false = len(hits & bad), len(hits - bad)
+        print(f"{n:>8} {elapsed / ticks * 1000:>10.2f} {caught:>5}/{outliers:<2} {false:>8}")
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# Benchmark Timing - wall-clock helpers shared by the benchmarks
+
+import time
+
+def time_call(func, *args, repeat=5):
+    """
+    Best wall-clock time of several calls, in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
@@ -11,6 +11,18 @@ MQTT_TOPIC_COMMAND = 'node/command'
 MQTT_TOPIC_DATA = 'node/data/#'
 MQTT_TOPIC_DISABLE = 'node/disable'
 MQTT_TOPIC_RECEIVED = 'node/received'
+MQTT_TOPIC_DIGEST = 'node/digest'  # periodic rule set digests from nodes
+MQTT_TOPIC_GROUP = 'node/command/group'  # group-addressed rules, node/command/group/<gid>
+RULE_GROUP_RETAIN = True  # keep the last group rule on the broker for nodes joining later
+RULE_GROUP_SEGMENT = 2000  # meters, track segment / road square covered by one rule group
+RULE_PATCHES = True  # update a node's rule with the same Command type and Value in place instead of adding one
+RULE_DIGEST_BUCKETS = 32  # hash buckets per node rule set digest, must match the nodes
+RULE_EXPIRY_RESOLUTION = 1.0  # seconds per timer wheel slot, rules expire at most this late
+RULE_CONFIRM_WINDOW = 30  # seconds a locally expired rule waits for the node's disable message
+DELIVERY_DEADLINE = 5  # seconds without a PUBACK before a publish is counted as late
+DELIVERY_RETRY_BACKOFF = 1.0  # seconds before publishing again a message paho refused
+DELIVERY_MAX_RETRIES = 3  # attempts at a refused publish before giving up
+DELIVERY_LATENCY_BUCKETS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)  # ms, PUBACK latency histogram bounds
 
 # Logging Configuration
 LOG_PATH = '/home/ferromobile/srsRAN_4G/test/Qoc_log'
@@ -22,6 +34,7 @@ DISABLE_FLOWRULE_LOG = os.path.join(LOG_PATH, 'disable_flowrule.log')
 REALTIME_RULE_LOG = os.path.join(LOG_PATH, 'realtime_rule.log')
 TESTING_DATA_LOG = os.path.join(LOG_PATH, 'Testing_Data_CV2X_SNR30_Speed10.log')
 RECEIVED_MESSAGE_LOG = os.path.join(LOG_PATH, 'Received_message.log')
+SWITCH_TIMING_LOG = os.path.join(LOG_PATH, 'switch_timing.log')  # one JSON line per switch transaction
 
 # Data Structure Configuration
 BASE_COLUMNS = ['NODE_ID', 'Current interface', 'Speed']
@@ -30,7 +43,111 @@ OPTIONAL_COLUMNS = [
     'Freq', 'Power', 'Noise', 'RSSI', 'CBR', 'DataRate', 'Latency',
     'PCR', 'PER', 'PPS', 'CBP', 'Position', 'Payload', 'Timestamp'
 ]
+MATCH_FIELDS = [  # flow rule match fields, in rule order after NODE_ID
+    'Src MAC', 'Des MAC', 'Src IP', 'Des IP', 'Src Port', 'Des Port', 'Current interface'
+]
+
+# Switching Thresholds
+LATENCY_SWITCH_RANGE = (20.0, 60000)  # ms, average latency that triggers a switch
+POWER_SWITCH_RANGE = (-100, -75)  # dBm, average power that triggers a switch
+LATENCY_THRESHOLD_CAP = 30.0  # ms, upper bound for the latency threshold sent in rules
+POWER_THRESHOLD_FLOOR = -80.0  # dBm, lower bound for the power threshold sent in rules
+
+# Analysis Windows
+LATENCY_WINDOW = 5  # samples used for latency mean/std
+POWER_WINDOW = 5  # samples used for power mean/std
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)  # streaming latency quantiles per node
+POWER_QUANTILES = (0.01, 0.05, 0.5)  # streaming power quantiles per node (weak-signal tail)
+SWITCHING_STATISTIC = 'std'  # 'std' uses avg +/- 2*std, 'quantile' uses the tail quantiles below
+TAIL_LATENCY_QUANTILE = 0.95
+TAIL_POWER_QUANTILE = 0.05
+
+# Predictive Switching
+PREDICTIVE_SWITCHING = True
+TREND_WINDOW = 8  # samples used for the trend regression
+TREND_MIN_SAMPLES = 3
+DEFAULT_SWITCH_DURATION = 2.0  # seconds, used until switch durations have been measured
+SWITCH_DURATION_SAMPLES = 50  # measured switch durations kept for the median
+PENDING_SWITCH_EXPIRY = 30  # seconds before an unanswered switch request is forgotten
+PREEMPT_COOLDOWN = 10  # seconds between pre-emptive switching attempts for a node
+
+# Link Scoring
+LINK_SCORE_WEIGHTS = {
+    'Latency': 0.30, 'PER': 0.20, 'Power': 0.15, 'RSSI': 0.15,
+    'CBR': 0.05, 'CBP': 0.05, 'PPS': 0.05, 'Noise': 0.05
+}
+LINK_SCORE_ALPHA = 0.3  # EWMA smoothing factor per metric
+LINK_SCORE_MARGIN = 0.1  # score advantage needed to stay on the current technology
+EXPECTED_PPS = 100  # packet rate that scores as a perfect link
+
+# Switching Orchestration
+MAX_CONCURRENT_SWITCHES = 4  # relay switches allowed in flight at once
+RELAY_SWITCH_STAGE_TIMEOUT = 30  # seconds allowed for each stage of a relay switch
+
+# Relay Selection
+RELAY_RANGE = 200  # meters, Wi-Fi Direct range used for relay graph edges
+RELAY_MAX_HOPS = 1  # hops between the failing RX node and its relay
+RELAY_UNKNOWN_SCORE = 0.5  # link score assumed for nodes without measurements
+RELAY_SWITCH_PENALTY = 0.25  # extra cost when the relay has to change technology
+
+# Spatial Index
+GRID_CELL_SIZE = 200  # meters per grid cell for reported road positions
+MAP_ORIGIN = None  # (lat, lon) of the local projection origin, first report if None
+EARTH_RADIUS = 6371000  # meters
+
+# Anomaly Detection
+ANOMALY_HISTORY = 30  # window means kept per node as its own baseline
+ANOMALY_MIN_HISTORY = 5  # baseline samples needed before self z-scores are used
+ANOMALY_MIN_PEERS = 3  # nodes on an interface needed before peer z-scores are used
+ANOMALY_Z_THRESHOLD = 3.5  # robust z-score that marks a node as anomalous
+ANOMALY_MAD_FLOOR = 1.0  # lower bound on the MAD so flat baselines do not explode
+
+# Congestion Control
+CBR_AREA_SIZE = 400  # meters per area over which channel busy ratios are aggregated
+CBR_ALPHA = 0.3  # EWMA smoothing factor for reported CBR/CBP
+CBR_HYSTERESIS = 0.05  # busy ratio margin below a state's bound before relaxing
+# (upper busy ratio, reporting interval in s, test traffic rate in packets/s), relaxed to restrictive
+CONGESTION_STATES = [
+    (0.30, 2, 100),
+    (0.40, 5, 50),
+    (0.50, 8, 25),
+    (0.65, 12, 10),
+    (float('inf'), 20, 5),
+]
+CONGESTION_RULE_TIMEOUT = 150  # seconds a rate control rule stays valid on the node
+
+# Link Adaptation
+ITSG5_MCS_LADDER = ['MK2MCS_R12BPSK', 'MK2MCS_R34BPSK', 'MK2MCS_R12QPSK', 'MK2MCS_R34QPSK',
+                    'MK2MCS_R12QAM16', 'MK2MCS_R34QAM16', 'MK2MCS_R23QAM64', 'MK2MCS_R34QAM64']
+ITSG5_MCS_BITRATES = [3, 4.5, 6, 9, 12, 18, 24, 27]  # Mbit/s on a 10 MHz channel
+ITSG5_MCS_SENSITIVITY = [-85, -84, -82, -80, -77, -73, -69, -68]  # dBm needed per MCS
+CV2X_MCS_LADDER = list(range(16))
+DEFAULT_TX_PROFILES = {
+    'ITSG5': {'MCS': 'MK2MCS_R12QPSK', 'Power': 30, 'Rate': 100, 'Length': 50},
+    'CV2X': {'MCS': 5, 'Power': 23, 'Length': 300},
+}
+TX_POWER_RANGE = {'ITSG5': (10, 33), 'CV2X': (10, 23)}  # dBm
+TX_RATE_RANGE = (10, 1000)  # packets/s accepted by llc test-tx
+MIN_PACKET_LENGTH = {'ITSG5': 50, 'CV2X': 64}  # bytes
+PER_TARGET = (0.01, 0.1)  # step the MCS up below, down (after power) above
+LINK_MARGIN_DB = 3  # RSSI margin kept above the chosen MCS's sensitivity
+MAX_LINK_OFFSET_DB = 12  # extra margin learned from packet errors at a given RSSI
+POWER_STEP_DB = 3  # power change per step when RSSI is unknown
+LINK_ADAPTATION_ALPHA = 0.3  # EWMA smoothing factor for PER/RSSI/latency
 
 # Network Configuration
-COVERAGE = 2000  # in meters
+COVERAGE = 2000  # in meters, length of the simulated track (x axis of the local frame)
 DEFAULT_SPEED = 40  # km/h
+NODE_INACTIVITY_TIMEOUT = 60  # seconds without data before a node is removed
+NODE_SWEEP_INTERVAL = 10  # seconds between checks for inactive nodes
+
+# Coverage Model
+# Cells per technology as (x, y, radius) in meters of the local frame (RSUs for ITSG5,
+# eNB sites for CV2X), e.g. {'ITSG5': [(500, 0, 300)], 'CV2X': [(1000, 0, 900)]}.
+# None: both technologies cover the simulated track and rule timeouts follow the time
+# to leave the track from position, speed and direction.
+COVERAGE_CELLS = None
+COVERAGE_EPSILON = 0.5  # meters, tolerance when chaining overlapping cells
+
+# Handover Scheduling
+HANDOVER_GUARD = 1.0  # seconds added to the median switch duration when scheduling ahead of a crossing
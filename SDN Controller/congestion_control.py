@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Congestion Control - per-area channel busy ratio and reporting/traffic rate hints
+
+import math
+import logging
+
+from config import *
+import spatial_index
+
+# Global data structures
+node_loads = {}  # {node_id: (area, smoothed busy ratio)}
+area_loads = {}  # {area: [sum of node busy ratios, node count]}
+area_members = {}  # {area: set of node_ids}
+area_states = {}  # {area: index into CONGESTION_STATES}
+hinted_states = {}  # {node_id: state whose hints the node was last sent}
+
+def parse_busy_ratio(raw):
+    """
+    Busy ratio as 0..1 from a CBR ('0.25', '(25)') or CBP ('25%') report
+    """
+    value = float(str(raw).strip('()').replace('%', '').split()[0])
+    return value / 100 if value > 1 else value
+
+def area_of(node_id, technology):
+    """
+    Area a node's channel measurement belongs to: a square of the road grid
+    when the node reports positions, a track segment otherwise. ITSG5 and
+    CV2X use different channels, so they never share an area.
+    """
+    from data_processor import speed_data
+
+    if node_id in spatial_index.road_index.positions:
+        x, y, _ = spatial_index.road_index.positions[node_id]
+        return (technology, math.floor(x / CBR_AREA_SIZE), math.floor(y / CBR_AREA_SIZE))
+    if node_id in speed_data:
+        return (technology, math.floor(speed_data[node_id]['position'] / CBR_AREA_SIZE))
+    return (technology, None)
+
+def record_busy_ratio(node_id, technology, data):
+    """
+    Fold a CBR (llc cbrmon) or CBP (acme) report into the node's area.
+    Returns the nodes whose hints are out of date: every node of the area
+    when its congestion state changed, or a node that just joined it.
+    """
+    raw = data.get('CBR', data.get('CBP'))
+    if raw is None:
+        return []
+    try:
+        ratio = parse_busy_ratio(raw)
+    except (ValueError, IndexError):
+        return []
+
+    area = area_of(node_id, technology)
+    previous = node_loads.get(node_id)
+    if previous is None:
+        smoothed = ratio
+    else:
+        _discard(node_id, *previous)
+        smoothed = previous[1] + CBR_ALPHA * (ratio - previous[1])
+
+    node_loads[node_id] = (area, smoothed)
+    load = area_loads.setdefault(area, [0.0, 0])
+    load[0] += smoothed
+    load[1] += 1
+    area_members.setdefault(area, set()).add(node_id)
+
+    evaluate_area(area)
+    state = area_states.get(area, 0)
+    stale = sorted(n for n in area_members[area] if hinted_states.get(n, 0) != state)
+    for stale_node in stale:
+        hinted_states[stale_node] = state
+    return stale
+
+def _discard(node_id, area, smoothed):
+    load = area_loads[area]
+    load[0] -= smoothed
+    load[1] -= 1
+    area_members[area].discard(node_id)
+    if not load[1]:
+        del area_loads[area]
+        del area_members[area]
+
+def area_busy_ratio(area):
+    """
+    Mean smoothed busy ratio over the nodes in an area (None if empty)
+    """
+    load = area_loads.get(area)
+    if not load or not load[1]:
+        return None
+    return load[0] / load[1]
+
+def evaluate_area(area):
+    """
+    Move an area between congestion states: back off as soon as the channel
+    is busier than the current state allows, relax one state at a time once
+    it has been idle enough to clear the hysteresis margin
+    """
+    busy = area_busy_ratio(area)
+    if busy is None:
+        return False
+
+    state = area_states.get(area, 0)
+    target = next(i for i, (upper, _, _) in enumerate(CONGESTION_STATES) if busy <= upper)
+    if target > state:
+        new_state = target
+    elif target < state and busy < CONGESTION_STATES[state - 1][0] - CBR_HYSTERESIS:
+        new_state = state - 1
+    else:
+        return False
+
+    area_states[area] = new_state
+    _, interval, rate = CONGESTION_STATES[new_state]
+    logging.info(f"Area {area} busy ratio {busy:.2f}: congestion state {state} -> {new_state} "
+                 f"(report every {interval}s, {rate} pps)")
+    return True
+
+def rate_hints(node_id):
+    """
+    Reporting interval and traffic rate hints for a node, from its area's state
+    """
+    previous = node_loads.get(node_id)
+    return area_hints(previous[0] if previous else None)
+
+def area_hints(*areas):
+    """
+    Reporting interval and traffic rate hints for every node of the given
+    areas, from the most congested of them
+    """
+    _, interval, rate = CONGESTION_STATES[max((area_states.get(area, 0) for area in areas), default=0)]
+    return {'Report interval': interval, 'Traffic rate': rate}
+
+def remove_node(node_id):
+    """
+    Drop a node's contribution to its area
+    """
+    hinted_states.pop(node_id, None)
+    previous = node_loads.pop(node_id, None)
+    if previous is not None:
+        _discard(node_id, *previous)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# Coverage Model - per-technology cells with vectorized membership and time-to-exit
+
+import time
+import numpy as np
+
+from config import *
+from link_scoring import TECHNOLOGIES
+
+class CoverageModel:
+    """
+    Union of circular cells per technology. Nodes on the simulated track
+    move along the x axis and turn back at its ends; nodes reporting road
+    positions move in a straight line with their observed velocity.
+    """
+    def __init__(self, cells=COVERAGE_CELLS, track=(0, COVERAGE)):
+        self.configured = cells is not None
+        if cells is None:
+            # One cell per technology spanning the track
+            low, high = track
+            cells = {t: [((low + high) / 2, 0, (high - low) / 2)] for t in TECHNOLOGIES}
+        self.technologies = tuple(cells)
+        self.centers = {t: np.array([c[:2] for c in cells[t]], dtype=float).reshape(-1, 2)
+                        for t in self.technologies}
+        self.radii = {t: np.array([c[2] for c in cells[t]], dtype=float) for t in self.technologies}
+        self.track = track
+
+    def _distances(self, points, technology):
+        # Squared point-to-center distances as |p|^2 - 2 p.c + |c|^2 (one matmul)
+        centers = self.centers[technology]
+        return (points ** 2).sum(axis=1)[:, None] - 2 * points @ centers.T + (centers ** 2).sum(axis=1)
+
+    def membership(self, points, technology):
+        """
+        (N, M) matrix, True where a point lies in a cell of the technology
+        """
+        return self._distances(points, technology) <= self.radii[technology] ** 2
+
+    def covered(self, points, technology):
+        return self.membership(points, technology).any(axis=1)
+
+    def line_exit(self, points, velocities, technology):
+        """
+        Seconds until each point, moving in a straight line, leaves the union
+        of the technology's cells (0 if outside, inf if it never leaves)
+        """
+        centers, radii = self.centers[technology], self.radii[technology]
+        a = (velocities ** 2).sum(axis=1)[:, None]
+        b = 2 * ((points * velocities).sum(axis=1)[:, None] - velocities @ centers.T)
+        c = self._distances(points, technology) - radii ** 2
+
+        # Each cell is an interval [t_in, t_out] along the line
+        with np.errstate(divide='ignore', invalid='ignore'):
+            root = np.sqrt(np.maximum(b * b - 4 * a * c, 0))
+            t_in = np.where(a > 0, (-b - root) / (2 * a), np.where(c <= 0, -np.inf, np.inf))
+            t_out = np.where(a > 0, (-b + root) / (2 * a), np.where(c <= 0, np.inf, -np.inf))
+        crossing = (b * b - 4 * a * c >= 0) | (a == 0)
+        t_in = np.where(crossing, t_in, np.inf)
+        speed = np.sqrt(a[:, 0])
+        slack = np.divide(COVERAGE_EPSILON, speed, out=np.zeros_like(speed), where=speed > 0)
+
+        # Chain overlapping cells until no cell extends the covered stretch;
+        # only the rows that still grow are carried to the next round
+        exit_time = np.zeros(len(points))
+        rows = np.arange(len(points))
+        for _ in range(len(radii)):
+            current = exit_time[rows][:, None]
+            active = (t_in[rows] <= current + slack[rows][:, None]) & (t_out[rows] > current)
+            reach = np.where(active, t_out[rows], -np.inf).max(axis=1, initial=-np.inf)
+            grow = reach > current[:, 0]
+            rows = rows[grow]
+            if not len(rows):
+                break
+            exit_time[rows] = reach[grow]
+        return exit_time
+
+    def advance(self, points, velocities, seconds, on_track):
+        """
+        Positions after the given time, reflecting track nodes at the track ends
+        """
+        seconds = np.where(np.isfinite(seconds), seconds, 0)
+        moved = points + velocities * seconds[:, None]
+        low, high = self.track
+        span = high - low
+        folded = np.mod(moved[:, 0] - low, 2 * span)
+        reflected = low + np.where(folded <= span, folded, 2 * span - folded)
+        moved[:, 0] = np.where(on_track, reflected, moved[:, 0])
+        return moved
+
+    def exit_times(self, points, velocities, on_track, technology):
+        """
+        Seconds until each node leaves the technology's coverage, taking
+        the turn back at the track ends into account for track nodes
+        """
+        exit_time = self.line_exit(points, velocities, technology)
+        track_nodes = np.flatnonzero(on_track & (velocities[:, 0] != 0) & (exit_time > 0))
+        if not len(track_nodes):
+            return exit_time
+
+        low, high = self.track
+        vx = velocities[track_nodes, 0]
+        x = points[track_nodes, 0]
+        edge = np.where(vx > 0, high, low)
+        to_edge = (edge - x) / vx
+        turns = exit_time[track_nodes] * np.abs(vx) >= to_edge * np.abs(vx) - COVERAGE_EPSILON
+
+        # Second leg: from the track end back along the track; covering
+        # the whole way back means the node never leaves
+        turning = track_nodes[turns]
+        if len(turning):
+            start = points[turning].copy()
+            start[:, 0] = edge[turns]
+            back = -velocities[turning]
+            second = self.line_exit(start, back, technology)
+            whole_way = second * np.abs(back[:, 0]) >= (high - low) - COVERAGE_EPSILON
+            exit_time[turning] = np.where(whole_way, np.inf, to_edge[turns] + second)
+        return exit_time
+
+    def evaluate(self, node_ids, points, velocities, on_track, technologies=None):
+        """
+        Membership, time to exit and handover target for the given nodes
+        on the given technologies (all by default) in one vectorized pass:
+        {node_id: {technology: (covered, seconds to exit, target)}}
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        velocities = np.asarray(velocities, dtype=float).reshape(-1, 2)
+        on_track = np.asarray(on_track, dtype=bool)
+        known = np.isfinite(points).all(axis=1)
+        technologies = self.technologies if technologies is None else tuple(technologies)
+
+        covered = {t: self.covered(points, t) & known for t in technologies}
+        exits = {}
+        for t in technologies:
+            inside = np.flatnonzero(covered[t])
+            exits[t] = np.zeros(len(points))
+            exits[t][inside] = self.exit_times(points[inside], velocities[inside], on_track[inside], t)
+
+        # Just past the exit point, used to find who covers the node next
+        speed = np.sqrt((velocities ** 2).sum(axis=1))
+        nudge = np.divide(COVERAGE_EPSILON, speed, out=np.zeros_like(speed), where=speed > 0)
+
+        snapshot = {}
+        for t in technologies:
+            finite = np.isfinite(exits[t])
+            after = self.advance(points, velocities, np.where(finite, exits[t] + nudge, 0), on_track)
+            targets = np.full(len(points), None, dtype=object)
+            for other in self.technologies:
+                if other != t:
+                    free = np.equal(targets, None) & self.covered(after, other)
+                    targets[free] = other
+            for i in np.flatnonzero(known):
+                snapshot.setdefault(node_ids[i], {})[t] = (bool(covered[t][i]), float(exits[t][i]),
+                                                           targets[i] if finite[i] else None)
+        return snapshot
+
+coverage = CoverageModel()
+
+# Observed road motion: {node_id: (x, y, vx, vy, timestamp)}
+road_motion = {}
+
+def observe_position(node_id, x, y, timestamp=None):
+    """
+    Track a reported road position and the velocity between reports
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    previous = road_motion.get(node_id)
+    vx = vy = 0.0
+    if previous is not None and timestamp > previous[4]:
+        dt = timestamp - previous[4]
+        vx, vy = (x - previous[0]) / dt, (y - previous[1]) / dt
+    road_motion[node_id] = (x, y, vx, vy, timestamp)
+
+def fleet_geometry(node_ids, now=None):
+    """
+    Positions, velocities (m/s) and track flags for nodes at now; road
+    reports win over the simulated track position
+    """
+    from data_processor import speed_data
+
+    now = time.time() if now is None else now
+    rows = speed_data.rows(node_ids)
+    on_track = rows >= 0
+    points = np.full((len(node_ids), 2), np.nan)
+    velocities = np.zeros((len(node_ids), 2))
+    position, direction = speed_data.kinematics(rows[on_track], now)
+    points[on_track, 0] = position
+    points[on_track, 1] = 0
+    velocities[on_track, 0] = direction * speed_data.speed[rows[on_track]] / 3.6
+
+    if road_motion:
+        for i, node_id in enumerate(node_ids):
+            motion = road_motion.get(node_id)
+            if motion is not None:
+                # Dead-reckoned from the last report
+                x, y, vx, vy, timestamp = motion
+                points[i] = (x + vx * (now - timestamp), y + vy * (now - timestamp))
+                velocities[i] = (vx, vy)
+                on_track[i] = False
+    return points, velocities, on_track
+
+def _node_coverage(node_id, technologies=None):
+    return coverage.evaluate([node_id], *fleet_geometry([node_id]), technologies).get(node_id)
+
+def coverage_info(node_id, technology):
+    """
+    (covered, seconds to exit, handover target) of a node on a technology
+    at the time of the call. None if its position is unknown.
+    """
+    entry = _node_coverage(node_id, [technology])
+    return None if entry is None else entry.get(technology)
+
+def track_exit_times(node_ids, now=None):
+    """
+    Seconds until simulated nodes reach the end of the track they are
+    heading to (NaN for nodes not on the track, inf when standing still)
+    """
+    from data_processor import speed_data
+
+    rows = speed_data.rows(node_ids)
+    on_track = rows >= 0
+    exits = np.full(len(node_ids), np.nan)
+    position, direction = speed_data.kinematics(rows[on_track], now)
+    low, high = coverage.track
+    remaining = np.where(direction > 0, high - position, position - low)
+    velocity = speed_data.speed[rows[on_track]] / 3.6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exits[on_track] = np.where(velocity > 0, remaining / velocity, np.inf)
+    return exits
+
+def covering_technologies(node_id):
+    """
+    Technologies whose cells contain the node (None if its position is unknown)
+    """
+    entry = _node_coverage(node_id)
+    if entry is None:
+        return None
+    return {t for t, (covered, _, _) in entry.items() if covered}
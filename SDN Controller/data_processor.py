@@ -11,17 +11,36 @@ from datetime import datetime
 import os
 
 from config import *
+from quantile_estimator import StreamingQuantiles
+from trend_predictor import record_sample, clear_history, record_switch_completion
+from link_scoring import update_link_score
+from link_adaptation import update_link_adaptation
+from switching_orchestrator import orchestrator
+import relay_graph
+import spatial_index
+from anomaly_detector import detector
+from congestion_control import record_busy_ratio
+from handover_scheduler import plan_handover
+from coverage_model import observe_position
+from fleet_motion import FleetMotion
+from pairing_registry import PairingRegistry
+from match_cache import match_cache
+from switch_transactions import transactions
 
 # Initialize global data structures
 df = pd.DataFrame(columns=BASE_COLUMNS + OPTIONAL_COLUMNS)
 active_nodes = {}
+last_seen = {}  # {node_id: time of its latest data}
 switching_nodes = set()
 received_nodes = []
 latency_data = {}
 power_data = {}
+window_versions = {}  # Bumped whenever a node's latency/power window changes
+latency_quantiles = {}  # Streaming latency quantiles per node
+power_quantiles = {}  # Streaming power quantiles per node
 current_interfaces = {}
-tx_rx_mapping = {}
-speed_data = {}  # Store speed and position data
+tx_rx_mapping = PairingRegistry()  # {tx_node: rx_node} with a reverse index
+speed_data = FleetMotion()  # Store speed and position data
 calculate_metrics = True
 
 def process_received_data(data, topic):
@@ -36,6 +55,8 @@ def process_received_data(data, topic):
     
     # Update active nodes
     active_nodes[node_id] = data
+    last_seen[node_id] = time.time()
+    transactions.note_received(node_id)
     
     # Initialize node data if not present
     if node_id not in received_nodes:
@@ -51,10 +72,28 @@ def process_received_data(data, topic):
     
     # Process metrics data
     process_metrics_data(node_id, data)
+    update_link_score(node_id, current_interfaces.get(node_id, current_interface), data)
+    update_link_adaptation(node_id, current_interfaces.get(node_id, current_interface), data)
+    
+    # Push rate hints to nodes whose area changed congestion state
+    process_channel_load(node_id, current_interfaces.get(node_id, current_interface), data)
     
     # Display updated data
     display_node_data()
 
+def process_channel_load(node_id, interface, data, on_stale=None):
+    """
+    Fold a node's CBR/CBP report into its area and hand every node whose
+    hints went stale to on_stale (sending it a rate control rule by default)
+    """
+    stale_nodes = record_busy_ratio(node_id, interface, data)
+    if stale_nodes and on_stale is None:
+        from flow_rule_manager import send_rate_control_rule
+        on_stale = send_rate_control_rule
+    for stale_node in stale_nodes:
+        on_stale(stale_node)
+    return stale_nodes
+
 def initialize_node_data(node_id, current_interface, speed):
     """
     Initialize data structures for a new node
@@ -71,6 +110,7 @@ def initialize_node_data(node_id, current_interface, speed):
     new_row['Current interface'] = current_interface
     new_row['Speed'] = speed
     df = df._append(new_row)
+    match_cache.observe(node_id, new_row)
     
     # Initialize speed tracking
     speed_data[node_id] = {
@@ -78,6 +118,7 @@ def initialize_node_data(node_id, current_interface, speed):
         'position': 0,
         'direction': 1  # 1 for forward, -1 for backward
     }
+    relay_graph.update_node(node_id, position=0, interface=current_interface)
 
 def update_dataframe(node_id, data):
     """
@@ -88,6 +129,28 @@ def update_dataframe(node_id, data):
     for key, value in data.items():
         if key in df.columns:
             df.at[node_id, key] = value
+    if match_cache.observe(node_id, data):
+        from flow_rule_manager import refresh_stale_rules
+        refresh_stale_rules(node_id)
+    
+    orchestrator.notify_fields(node_id, data)
+    
+    # A reported speed re-anchors the simulated movement from now on
+    if data.get('Speed') is not None and node_id in speed_data:
+        try:
+            speed = float(data['Speed'])
+        except (TypeError, ValueError):
+            speed = None
+        if speed is not None and speed != speed_data.speed[speed_data.index[node_id]]:
+            speed_data.update(node_id, speed=speed)
+            plan_handover(node_id)
+    
+    if data.get('Position'):
+        projected = spatial_index.update_reported_position(node_id, data['Position'])
+        if projected is not None:
+            observe_position(node_id, *projected)
+            relay_graph.refresh_edges(node_id)
+            plan_handover(node_id)
 
 def handle_interface_change(node_id, current_interface, speed):
     """
@@ -98,16 +161,35 @@ def handle_interface_change(node_id, current_interface, speed):
     previous_interface = df.at[node_id, 'Current interface']
     df.at[node_id, 'Current interface'] = current_interface
     df.at[node_id, 'Speed'] = speed
+    match_cache.observe(node_id, {'Current interface': current_interface})
+    orchestrator.notify_interface(node_id, current_interface)
+    relay_graph.update_node(node_id, interface=current_interface)
     
     if current_interface != previous_interface:
         current_interfaces[node_id] = current_interface
+        record_switch_completion(node_id)
+        transactions.executed(node_id, current_interface)
+        plan_handover(node_id)
         clear_node_parameters(node_id)
         
         # Handle execution message for TX nodes
-        if node_id in tx_rx_mapping.values():
+        if tx_rx_mapping.is_rx(node_id):
             from flow_rule_manager import send_execution_message_to_tx
             send_execution_message_to_tx(node_id, current_interface)
 
+def handle_disabled_flow_rule(disabled_flow_rule):
+    """
+    Forget a rule the node reports as disabled, usually confirming its
+    local expiry; the rule-set version bump makes the metrics monitor look
+    at the node again
+    """
+    from flow_rule_manager import delete_flow_rule, rule_expiry
+    
+    rule_expiry.confirm(disabled_flow_rule['NODE_ID'], disabled_flow_rule['Num'])
+    delete_flow_rule(disabled_flow_rule['NODE_ID'], disabled_flow_rule['Num'])
+    with open(DISABLE_FLOWRULE_LOG, 'a') as f:
+        f.write(json.dumps(disabled_flow_rule) + '\n')
+
 def clear_node_parameters(node_id):
     """
     Clear metrics data and schedule parameter clearing
@@ -133,14 +215,30 @@ def clear_latency_and_power_data(node_id):
     global latency_data, power_data
     latency_data[node_id] = []
     power_data[node_id] = []
+    window_versions[node_id] = window_versions.get(node_id, 0) + 1
+    latency_quantiles.pop(node_id, None)
+    power_quantiles.pop(node_id, None)
+    clear_history(node_id)
+    detector.reset(node_id)
     logging.info(f"Cleared latency and power data for NODE_ID: {node_id}")
 
+def clear_all_metric_windows():
+    """
+    Clear the latency and power windows of every node, bumping their
+    window versions so cached switching decisions are not served again
+    """
+    for node_id in set(latency_data) | set(power_data):
+        window_versions[node_id] = window_versions.get(node_id, 0) + 1
+    latency_data.clear()
+    power_data.clear()
+
 def partial_clear_node_parameters(node_id):
     """
     Clear optional parameters for a node after delay
     """
     global df
     df.loc[node_id, OPTIONAL_COLUMNS] = None
+    match_cache.observe(node_id, dict.fromkeys(OPTIONAL_COLUMNS))
     logging.info(f"Cleared parameters for NODE_ID: {node_id} after delay")
 
 def restart_metrics_calculation():
@@ -163,8 +261,13 @@ def process_metrics_data(node_id, data):
             latency_data[node_id] = []
         latency_value = float(data['Latency'].replace('ms', ''))
         latency_data[node_id].append(latency_value)
-        if len(latency_data[node_id]) > 5:
+        window_versions[node_id] = window_versions.get(node_id, 0) + 1
+        if len(latency_data[node_id]) > LATENCY_WINDOW:
             latency_data[node_id].pop(0)
+        if node_id not in latency_quantiles:
+            latency_quantiles[node_id] = StreamingQuantiles(LATENCY_QUANTILES)
+        latency_quantiles[node_id].add(latency_value)
+        record_sample(node_id, 'Latency', latency_value)
     
     # Process power data
     if 'Power' in data:
@@ -173,8 +276,18 @@ def process_metrics_data(node_id, data):
             if node_id not in power_data:
                 power_data[node_id] = []
             power_data[node_id].append(power_value)
-            if len(power_data[node_id]) > 5:
+            window_versions[node_id] = window_versions.get(node_id, 0) + 1
+            if len(power_data[node_id]) > POWER_WINDOW:
                 power_data[node_id].pop(0)
+            if node_id not in power_quantiles:
+                power_quantiles[node_id] = StreamingQuantiles(POWER_QUANTILES)
+            power_quantiles[node_id].add(power_value)
+            record_sample(node_id, 'Power', power_value)
+    
+    # Switch ahead of predicted threshold crossings
+    if PREDICTIVE_SWITCHING and ('Latency' in data or 'Power' in data):
+        from metrics_monitor import check_predicted_switch
+        check_predicted_switch(node_id)
 
 def display_node_data():
     """
@@ -196,6 +309,28 @@ def get_node_data(node_id):
     global df
     return df.loc[node_id] if node_id in df.index else None
 
+def inactive_nodes(now=None):
+    """
+    Nodes that sent no data for NODE_INACTIVITY_TIMEOUT
+    """
+    now = time.time() if now is None else now
+    return [node_id for node_id, seen in list(last_seen.items()) if now - seen >= NODE_INACTIVITY_TIMEOUT]
+
+def forget_node(node_id):
+    """
+    Drop a removed node's row, metric windows and motion
+    """
+    global df
+    df = df.drop(index=node_id, errors='ignore')
+    if node_id in received_nodes:
+        received_nodes.remove(node_id)
+    for store in (active_nodes, last_seen, latency_data, power_data, window_versions,
+                  latency_quantiles, power_quantiles, current_interfaces, speed_data):
+        store.pop(node_id, None)
+    switching_nodes.discard(node_id)
+    clear_history(node_id)
+    detector.reset(node_id)
+
 def get_all_node_ids():
     """
     Get list of all known node IDs
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# Delivery Tracker - PUBACK latency, in-flight depth and retries of the controller's QoS 1 publishes
+
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+
+from config import *
+
+class Delivery:
+    """
+    A publish waiting for its PUBACK
+    """
+    __slots__ = ('topic', 'payload', 'retain', 'destination', 'nums', 'sent', 'first_sent', 'attempt')
+
+    def __init__(self, topic, payload, retain, destination, nums, sent, first_sent, attempt):
+        self.topic = topic
+        self.payload = payload
+        self.retain = retain
+        self.destination = destination
+        self.nums = nums
+        self.sent = sent
+        self.first_sent = first_sent
+        self.attempt = attempt
+
+class DeliveryTracker:
+    """
+    Publishes by MQTT message id until paho reports their PUBACK through
+    on_publish. Tracks the rule Nums each message carries, PUBACK latency
+    histograms per destination (node or group) and the number of messages
+    in flight.
+
+    paho keeps unacknowledged QoS 1 messages and sends them again under
+    the same mid after a reconnect, so a message past DELIVERY_DEADLINE is
+    only counted as late. The tracker publishes again only messages paho
+    refused outright (queue full, out of memory), after
+    DELIVERY_RETRY_BACKOFF and up to DELIVERY_MAX_RETRIES times.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.pending = {}  # {mid: Delivery}
+        self.deadlines = deque()  # [(deadline, mid)], in send order
+        self.refused = deque()  # [(retry time, Delivery)] paho did not accept, oldest first
+        self.early_acks = {}  # {mid: ack time} for acks that arrived before track() saw the mid
+        self.early_order = deque()  # [(ack time, mid)], oldest first
+        self.histograms = {}  # {destination: [count per DELIVERY_LATENCY_BUCKETS bound, overflow]}
+        self.counts = dict.fromkeys(('sent', 'acknowledged', 'late', 'resent on reconnect',
+                                     'retried', 'failed'), 0)
+        self.latency_total = 0.0
+        self.max_in_flight = 0
+        self.worker = None
+        self.republish = None
+
+    def track(self, mid, topic, payload, destination=None, nums=(), retain=False, delivery=None, queued=True):
+        """
+        Start waiting for a message's PUBACK; delivery is the entry of an
+        earlier attempt when a refused message is being retried, queued is
+        False when paho refused the publish
+        """
+        now = self.clock()
+        with self.condition:
+            if delivery is None:
+                delivery = Delivery(topic, payload, retain, destination, tuple(nums), now, now, 0)
+                self.counts['sent'] += 1
+            else:
+                delivery.sent = now
+                delivery.attempt += 1
+            if not queued:
+                self._refused(delivery, now)
+                return
+            self._prune_early_acks(now)
+            acked_at = self.early_acks.pop(mid, None)
+            if acked_at is not None:
+                self._record(delivery, acked_at)
+                return
+            self.pending[mid] = delivery
+            self.deadlines.append((now + DELIVERY_DEADLINE, mid))
+            self.max_in_flight = max(self.max_in_flight, len(self.pending))
+            self.condition.notify_all()
+
+    def _refused(self, delivery, now):
+        if delivery.attempt >= DELIVERY_MAX_RETRIES:
+            self.counts['failed'] += 1
+            logging.warning(f"Publish of rules {list(delivery.nums)} to {delivery.destination} "
+                            f"refused {delivery.attempt + 1} times, giving up")
+            return
+        self.refused.append((now + DELIVERY_RETRY_BACKOFF, delivery))
+        self.condition.notify_all()
+
+    def acknowledge(self, mid):
+        """
+        PUBACK received for a message (paho's on_publish)
+        """
+        now = self.clock()
+        with self.condition:
+            delivery = self.pending.pop(mid, None)
+            if delivery is None:
+                # paho's network thread can beat publish() returning the mid
+                self._prune_early_acks(now)
+                self.early_acks[mid] = now
+                self.early_order.append((now, mid))
+                return
+            self._record(delivery, now)
+
+    def _prune_early_acks(self, now):
+        # An early ack is claimed by track() right after publish() returns;
+        # older ones belong to messages that are no longer tracked
+        while self.early_order and now - self.early_order[0][0] >= DELIVERY_DEADLINE:
+            acked_at, mid = self.early_order.popleft()
+            if self.early_acks.get(mid) == acked_at:
+                del self.early_acks[mid]
+
+    def _record(self, delivery, now):
+        # Rule delivery latency, retries included
+        latency = max(0.0, now - delivery.first_sent) * 1000
+        histogram = self.histograms.setdefault(delivery.destination, [0] * (len(DELIVERY_LATENCY_BUCKETS) + 1))
+        histogram[bisect.bisect_left(DELIVERY_LATENCY_BUCKETS, latency)] += 1
+        self.counts['acknowledged'] += 1
+        self.latency_total += latency
+
+    def overdue(self, now=None):
+        """
+        Count the messages past their PUBACK deadline as late (paho still
+        holds them) and pop the refused messages due for another attempt:
+        [Delivery] to publish again
+        """
+        now = self.clock() if now is None else now
+        late = []
+        retry = []
+        with self.condition:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, mid = self.deadlines.popleft()
+                delivery = self.pending.get(mid)
+                if delivery is not None and now - delivery.sent >= DELIVERY_DEADLINE:
+                    late.append(mid)
+            while self.refused and self.refused[0][0] <= now:
+                retry.append(self.refused.popleft()[1])
+            self.counts['late'] += len(late)
+            self.counts['retried'] += len(retry)
+        if late:
+            logging.warning(f"No PUBACK after {DELIVERY_DEADLINE}s for {len(late)} messages (mids {late[:10]})")
+        return retry
+
+    def reconnected(self):
+        """
+        The client reconnected and paho resent every unacknowledged
+        message under its mid; restart their deadlines
+        """
+        now = self.clock()
+        with self.condition:
+            for mid, delivery in self.pending.items():
+                delivery.sent = now
+                delivery.attempt += 1
+                self.deadlines.append((now + DELIVERY_DEADLINE, mid))
+            self.counts['resent on reconnect'] += len(self.pending)
+            self.condition.notify_all()
+
+    def in_flight(self):
+        return len(self.pending)
+
+    def rules_in_flight(self, destination):
+        """
+        Nums of rules sent to a destination whose PUBACK is outstanding
+        """
+        with self.condition:
+            return [num for delivery in self.pending.values() if delivery.destination == destination
+                    for num in delivery.nums]
+
+    def histogram(self, destination):
+        """
+        {'<=bound ms': count, '>last ms': count} of a destination's PUBACK latencies
+        """
+        with self.condition:
+            counts = self.histograms.get(destination, [0] * (len(DELIVERY_LATENCY_BUCKETS) + 1))
+            labels = [f"<={bound}ms" for bound in DELIVERY_LATENCY_BUCKETS] + [f">{DELIVERY_LATENCY_BUCKETS[-1]}ms"]
+            return dict(zip(labels, counts))
+
+    def stats(self):
+        with self.condition:
+            acknowledged = self.counts['acknowledged']
+            return {**self.counts, 'in flight': len(self.pending), 'max in flight': self.max_in_flight,
+                    'mean latency ms': round(self.latency_total / acknowledged, 2) if acknowledged else None}
+
+    def next_wakeup(self):
+        times = [queue[0][0] for queue in (self.deadlines, self.refused) if queue]
+        return min(times) if times else None
+
+    def start(self, republish):
+        """
+        Run a single thread that wakes at the next deadline, counts late
+        messages and calls republish(delivery) for each refused message
+        due again; republish publishes it and tracks it with delivery=
+        """
+        self.republish = republish
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.next_wakeup() is None:
+                    self.condition.wait()
+                delay = self.next_wakeup() - self.clock()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+            for delivery in self.overdue():
+                logging.info(f"Retrying refused publish to {delivery.destination} (rules {list(delivery.nums)}), "
+                             f"attempt {delivery.attempt + 2}")
+                self.republish(delivery)
+
+delivery_tracker = DeliveryTracker()
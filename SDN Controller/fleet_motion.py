@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Fleet Motion - simulated node kinematics held in NumPy arrays
+
+import time
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from config import *
+
+class NodeKinematics(MutableMapping):
+    """
+    Dict-like view of one node's row ('speed', 'position', 'direction');
+    position and direction are evaluated at the time of the lookup
+    """
+    def __init__(self, fleet, node_id):
+        self.fleet = fleet
+        self.node_id = node_id
+
+    def __getitem__(self, key):
+        row = self.fleet.index[self.node_id]
+        if key == 'speed':
+            return float(self.fleet.speed[row])
+        if key not in FleetMotion.FIELDS:
+            raise KeyError(key)
+        position, direction = self.fleet.kinematics([row])
+        return float(position[0]) if key == 'position' else int(direction[0])
+
+    def __setitem__(self, key, value):
+        if key not in FleetMotion.FIELDS:
+            raise KeyError(key)
+        self.fleet.update(self.node_id, **{key: value})
+
+    def __delitem__(self, key):
+        raise TypeError("kinematics fields cannot be removed")
+
+    def __iter__(self):
+        return iter(FleetMotion.FIELDS)
+
+    def __len__(self):
+        return len(FleetMotion.FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class FleetMotion(MutableMapping):
+    """
+    Simulated nodes as (anchor position, anchor time, speed, direction) in
+    parallel arrays. Positions are evaluated in closed form when asked for,
+    reflecting at the track ends, so nothing has to tick. Behaves as
+    {node_id: {'speed', 'position', 'direction'}}.
+    """
+    FIELDS = ('speed', 'position', 'direction')
+    COLUMNS = ('speed', 'anchor', 'anchor_time', 'direction')
+
+    def __init__(self, capacity=1024, track=(0, COVERAGE), clock=time.time):
+        self.track = track
+        self.clock = clock
+        self.index = {}  # {node_id: row}
+        self.node_ids = []  # [node_id] by row
+        self.speed = np.zeros(capacity)  # km/h
+        self.anchor = np.zeros(capacity)  # position at anchor_time (m along the track)
+        self.anchor_time = np.zeros(capacity)
+        self.direction = np.ones(capacity)  # direction at anchor_time
+
+    def __getitem__(self, node_id):
+        if node_id not in self.index:
+            raise KeyError(node_id)
+        return NodeKinematics(self, node_id)
+
+    def __setitem__(self, node_id, values):
+        row = self.index.get(node_id)
+        if row is None:
+            row = len(self.node_ids)
+            if row == len(self.speed):
+                self._grow()
+            self.index[node_id] = row
+            self.node_ids.append(node_id)
+        self.speed[row] = values.get('speed', DEFAULT_SPEED)
+        self.anchor[row] = values.get('position', 0)
+        self.anchor_time[row] = self.clock()
+        self.direction[row] = values.get('direction', 1)
+
+    def __delitem__(self, node_id):
+        # Move the last row into the freed one
+        row = self.index.pop(node_id)
+        last = len(self.node_ids) - 1
+        last_id = self.node_ids.pop()
+        if row != last:
+            self.node_ids[row] = last_id
+            self.index[last_id] = row
+            for field in self.COLUMNS:
+                column = getattr(self, field)
+                column[row] = column[last]
+
+    def __iter__(self):
+        return iter(list(self.node_ids))
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    def _grow(self):
+        for field in self.COLUMNS:
+            column = getattr(self, field)
+            setattr(self, field, np.concatenate([column, np.zeros(len(column))]))
+
+    def rows(self, node_ids):
+        """
+        Row numbers of the given nodes (-1 for unknown ones)
+        """
+        return np.fromiter((self.index.get(n, -1) for n in node_ids), dtype=np.intp, count=len(node_ids))
+
+    def kinematics(self, rows=None, now=None):
+        """
+        (position, direction) of the given rows (all by default) at now.
+        The track is unfolded into a loop of twice its length, so a node
+        in the second half is on its way back.
+        """
+        rows = slice(0, len(self.node_ids)) if rows is None else rows
+        now = self.clock() if now is None else now
+        low, high = self.track
+        span = high - low
+        direction = self.direction[rows]
+        travelled = self.anchor[rows] - low + direction * self.speed[rows] * (now - self.anchor_time[rows]) / 3.6
+        folded = np.mod(travelled, 2 * span)
+        outbound = folded < span
+        position = low + np.where(outbound, folded, 2 * span - folded)
+        return position, np.where(outbound, direction, -direction)
+
+    def update(self, node_id, now=None, **values):
+        """
+        Re-anchor a node at its current position, then apply new speed,
+        position or direction from now on
+        """
+        row = self.index[node_id]
+        now = self.clock() if now is None else now
+        position, direction = self.kinematics([row], now)
+        self.anchor[row] = values.get('position', position[0])
+        self.direction[row] = values.get('direction', direction[0])
+        self.anchor_time[row] = now
+        if 'speed' in values:
+            self.speed[row] = values['speed']
+
+    def near(self, center, radius, now=None):
+        """
+        (node_id, position) of nodes within radius of center at now
+        """
+        position, _ = self.kinematics(now=now)
+        rows = np.flatnonzero(np.abs(position - center) <= radius)
+        return [(self.node_ids[row], float(position[row])) for row in rows]
@@ -11,12 +11,25 @@ import numpy as np
 
 from config import *
 from data_processor import df, tx_rx_mapping, current_interfaces, speed_data
-from mqtt_handler import client
+import mqtt_handler
+from congestion_control import rate_hints, area_hints, area_of
+from link_adaptation import tx_profile
+from coverage_model import coverage, fleet_geometry, track_exit_times
+from flow_rule_table import FlowRuleTable
+from match_cache import match_cache
+from rule_templates import RuleTemplate, rule_patch
+from rule_groups import rule_groups, segment_group, group_topic
+from rule_digest import drifted_buckets, rule_differences
+from rule_expiry import rule_expiry
+from delivery_tracker import delivery_tracker
+from switch_transactions import transactions
 
 # Global variables for flow rule management
-flow_rules = {}  # {node_id: {rule_num: rule}}
+flow_rules = FlowRuleTable()  # {node_id: {rule_num: rule}} with secondary indexes
+flow_rules_lock = threading.RLock()  # guards every change to flow_rules (ingest, expiry and reconcile threads)
 latest_flow_rules = []  # Track recent rules for reference
 num_counter = 0  # Counter for generating rule numbers
+rule_set_versions = {}  # {node_id: version}, bumped whenever a node's rules change
 
 def get_next_num():
     """Generate the next sequential rule number"""
@@ -24,210 +37,546 @@ def get_next_num():
     num_counter += 1
     return f"{num_counter:03d}"
 
-def send_flow_rule(node_id, latency_value, power_value, priority, current_interface):
+def send_flow_rule(node_id, latency_value, power_value, priority, current_interface, generated=None):
     """
-    Determine and send appropriate flow rules based on current interface
+    Determine and send appropriate flow rules based on current interface,
+    timing the switch as a transaction keyed by its RX rule; generated is
+    when the decision started (now if not given)
     """
+    sent = time.time()
     if current_interface == 'ITSG5':
+        targets = ['CV2X']
         send_cv2x_flow_rules(node_id, latency_value, power_value, priority, 'Tech switching')
     elif current_interface == 'CV2X':
+        targets = ['ITSG5']
         send_itsg5_flow_rules(node_id, latency_value, power_value, priority, 'Tech switching')
     else:
+        targets = ['CV2X', 'ITSG5']
         send_cv2x_flow_rules(node_id, latency_value, power_value, priority, 'Tech switching')
         send_itsg5_flow_rules(node_id, latency_value, power_value, priority, 'Tech switching')
+    
+    for target in targets:
+        rx_rule = own_rule(node_id, 'Tech switching', f"{target}_rx")
+        if rx_rule is not None:
+            transactions.open(node_id, rx_rule['Num'], current_interfaces.get(node_id), target,
+                              generated, now=sent)
 
 def send_itsg5_flow_rules(rx_node_id, latency_value, power_value, priority, command_type):
     """
     Send ITSG5 flow rules to all nodes with appropriate roles
     """
-    node_ids = get_all_node_ids()
-    for node_id in node_ids:
-        if node_id == rx_node_id:
-            send_itsg5_flow_rule(node_id, 'ITSG5_rx', latency_value, power_value, priority, command_type)
-        else:
-            send_itsg5_flow_rule(node_id, 'ITSG5_tx', '*', '*', '*', command_type)
-            tx_rx_mapping[node_id] = rx_node_id
+    broadcast_flow_rules('ITSG5', rx_node_id, latency_value, power_value, priority, command_type)
 
 def send_cv2x_flow_rules(rx_node_id, latency_value, power_value, priority, command_type):
     """
     Send CV2X flow rules to all nodes with appropriate roles
     """
-    node_ids = get_all_node_ids()
-    for node_id in node_ids:
-        if node_id == rx_node_id:
-            send_cv2x_flow_rule(node_id, 'CV2X_rx', latency_value, power_value, priority, command_type)
-        else:
-            send_cv2x_flow_rule(node_id, 'CV2X_tx', '*', '*', '*', command_type)
-            tx_rx_mapping[node_id] = rx_node_id
+    broadcast_flow_rules('CV2X', rx_node_id, latency_value, power_value, priority, command_type)
+
+def broadcast_flow_rules(technology, rx_node_id, latency_value, power_value, priority, command_type):
+    """
+    Send the RX rule to rx_node_id and the TX rule to every other node
+    """
+    tx_node_ids = [node_id for node_id in get_all_node_ids() if node_id != rx_node_id]
+    for node_id in tx_node_ids:
+        tx_rx_mapping[node_id] = rx_node_id
+    
+    # The RX node must not follow its segment's TX rule
+    update_group_membership([rx_node_id], group_of=lambda node_id: None)
+    send_templated_rules(rule_template(f"{technology}_rx", latency_value, power_value, priority, command_type),
+                         [rx_node_id])
+    send_group_rules(rule_template(f"{technology}_tx", '*', '*', '*', command_type), tx_node_ids, rx_node_id)
 
 def send_itsg5_flow_rule(node_id, action, latency_value, power_value, priority, command_type):
     """
     Create and send an ITSG5 flow rule
     """
-    match = create_match_dict(node_id)
-    timeout = calculate_timeout(node_id) if any(match[key] != '*' for key in match if key != 'NODE_ID') else 20
+    send_templated_rules(rule_template(action, latency_value, power_value, priority, command_type), [node_id])
+
+def send_cv2x_flow_rule(node_id, action, latency_value, power_value, priority, command_type):
+    """
+    Create and send a CV2X flow rule
+    """
+    send_templated_rules(rule_template(action, latency_value, power_value, priority, command_type), [node_id])
+
+def update_group_membership(node_ids, group_of=segment_group):
+    """
+    Move nodes into the group of their current segment (or out of any
+    group when group_of gives None). Each move costs one membership
+    message; a group left empty has its retained rule cleared.
+    """
+    for node_id in node_ids:
+        gid = group_of(node_id)
+        previous = rule_groups.group_of.get(node_id)
+        if gid == previous:
+            continue
+        
+        # Nodes drop the rule of the group they leave
+        left_rule = rule_groups.retained.get(previous)
+        if left_rule is not None:
+            delete_flow_rule(node_id, left_rule['Num'])
+        emptied = rule_groups.assign(node_id, gid) if gid is not None else rule_groups.remove_node(node_id)
+        if emptied is not None and RULE_GROUP_RETAIN:
+            publish(group_topic(emptied), b'', destination=emptied, retain=True)
+        
+        message = {'NODE_ID': node_id, 'Groups': [gid] if gid is not None else []}
+        publish(f"{MQTT_TOPIC_COMMAND}/{node_id}", json.dumps(message), node_id)
+        
+        # The retained rule reaches the node when it subscribes
+        retained = rule_groups.retained.get(gid)
+        if retained is not None:
+            store_flow_rule(node_id, retained['Num'], retained, log=False)
+
+def send_group_rules(template, node_ids, rx_node_id):
+    """
+    Publish a shared rule once per group instead of once per node. The
+    group rule carries the hints of the busiest congestion area among its
+    members and their shortest timeout; nodes without a group get
+    per-node rules.
+    """
+    update_group_membership(node_ids)
+    groups, ungrouped = rule_groups.partition(node_ids)
+    action = template.shared['Value']
+    technology = action.split('_')[0]
+    grouped = [node_id for members in groups.values() for node_id in members]
+    timeouts = dict(zip(grouped, calculate_timeouts(grouped)))
     
-    flow_rule = {
-        'Num': get_next_num(),
-        'match': match,
+    lines = []
+    for gid, members in groups.items():
+        hints = area_hints(*{area_of(node_id, technology) for node_id in members})
+        profile = tx_profile(rx_node_id, technology, hints['Traffic rate']) if action.endswith('_tx') else '*'
+        match = {'NODE_ID': '*', 'Group': gid, **dict.fromkeys(MATCH_FIELDS, '*')}
+        timeout = min(timeouts[node_id] for node_id in members)
+        flow_rule, payload = template.render(get_next_num(), json.dumps(match), match, timeout,
+                                             {**hints, 'TX profile': profile})
+        publish(group_topic(gid), payload, gid, [flow_rule['Num']], retain=RULE_GROUP_RETAIN)
+        
+        # A group holds one rule at a time, the new one replaces the last
+        replaced = rule_groups.retained.get(gid)
+        rule_groups.retained[gid] = flow_rule
+        for node_id in rule_groups.members[gid]:
+            if replaced is not None:
+                delete_flow_rule(node_id, replaced['Num'])
+            store_flow_rule(node_id, flow_rule['Num'], flow_rule, log=False)
+        lines.append(payload)
+    
+    if lines:
+        logging.info(f"Sent {action} to {len(lines)} groups ({len(grouped)} nodes)")
+        with open(FLOWRULE_LOG, 'ab') as f:
+            f.write(b'\n'.join(lines) + b'\n')
+    send_templated_rules(template, ungrouped)
+
+def rule_template(action, latency_value, power_value, priority, command_type):
+    """
+    Template of the fields a switching rule shares across nodes
+    """
+    return RuleTemplate(**{
         'Command type': command_type,
         'Value': action,
         'Rx Power Threshold': power_value,
         'Latency': latency_value,
         'Priority': priority,
-        'Counter': 0,
-        'Timeout': timeout
-    }
+    })
+
+def send_templated_rules(template, node_ids):
+    """
+    Render, publish and store one rule per node from a template. Nodes
+    with the same RX node and congestion state share their rate hints and
+    TX profile, and the log file is written once for the whole batch. A
+    node that already has a rule with the template's Command type and
+    Value gets a patch of that rule instead.
+    """
+    if not node_ids:
+        return
+    action = template.shared['Value']
+    timeouts = calculate_timeouts(node_ids)
+    extras_by_key = {}
+    payloads = []
     
-    logging.info(f"Sending ITSG5 flow rule: {flow_rule}")
-    publish_flow_rule(node_id, flow_rule)
+    for node_id, timeout in zip(node_ids, timeouts):
+        hints = rate_hints(node_id)
+        key = (tx_rx_mapping.get(node_id), hints['Report interval'], hints['Traffic rate'])
+        extras = extras_by_key.get(key)
+        if extras is None:
+            extras = extras_by_key[key] = {**hints, 'TX profile': sender_profile(node_id, action)}
+        
+        match, match_json = match_cache.encoded(node_id)
+        with flow_rules_lock:
+            previous = own_rule(node_id, template.shared['Command type'], action) if RULE_PATCHES else None
+            if previous is None:
+                flow_rule, payload = template.render(get_next_num(), match_json, match, timeout, extras)
+            else:
+                flow_rule, _ = template.render(previous['Num'], match_json, match, timeout, extras,
+                                               previous.get('Version', 1) + 1)
+                payload = json.dumps(rule_patch(node_id, previous, flow_rule)).encode()
+            publish(f"{MQTT_TOPIC_COMMAND}/{node_id}", payload, node_id, [flow_rule['Num']])
+            store_flow_rule(node_id, flow_rule['Num'], flow_rule, log=False)
+        payloads.append(payload)
+    
+    if len(payloads) == 1:
+        logging.info(f"Sending {action} flow rule: {payloads[0].decode()}")
+    else:
+        logging.info(f"Sent {len(payloads)} {action} flow rules ({template.shared['Command type']})")
+    with open(FLOWRULE_LOG, 'ab') as f:
+        f.write(b'\n'.join(payloads) + b'\n')
 
-def send_cv2x_flow_rule(node_id, action, latency_value, power_value, priority, command_type):
+def sender_profile(node_id, action):
     """
-    Create and send a CV2X flow rule
+    TX profile for a node transmitting towards its RX node ('*' otherwise)
+    """
+    technology, role = action.split('_')
+    if role != 'tx' or technology not in ('ITSG5', 'CV2X') or node_id not in tx_rx_mapping:
+        return '*'
+    return tx_profile(tx_rx_mapping.get(node_id), technology, rate_hints(node_id)['Traffic rate'])
+
+def send_initialization_flow_rule(node_id):
+    """
+    Create and send a rule that resets a node to its initial state, and
+    reset the controller's view of it
     """
-    match = create_match_dict(node_id)
-    timeout = calculate_timeout(node_id) if any(match[key] != '*' for key in match if key != 'NODE_ID') else 20
+    import data_processor
     
     flow_rule = {
         'Num': get_next_num(),
-        'match': match,
-        'Value': action,
-        'Command type': command_type,
-        'Rx Power Threshold': power_value,
-        'Latency': latency_value,
-        'Priority': priority,
+        'Version': 1,
+        'match': {
+            'NODE_ID': node_id,
+            'Src MAC': '*',
+            'Des MAC': '*',
+            'Src IP': '*',
+            'Des IP': '*',
+            'Src Port': '*',
+            'Des Port': '*',
+            'Current interface': '*'
+        },
+        'Command type': 'Initialization',
+        'Value': 'Initialization',
+        'Rx Power Threshold': 0,
+        'Latency': '*',
+        'Priority': 0,
         'Counter': 0,
-        'Timeout': timeout
+        'Timeout': 20
     }
     
-    logging.info(f"Sending CV2X flow rule: {flow_rule}")
+    logging.info(f"Sending initialization flow rule: {flow_rule}")
     publish_flow_rule(node_id, flow_rule)
+    
+    df = data_processor.df
+    if node_id in df.index:
+        df.at[node_id, 'Current interface'] = '*'
+        df.at[node_id, 'Speed'] = DEFAULT_SPEED
+        match_cache.observe(node_id, {'Current interface': '*'})
+        
+        def delayed_clear():
+            for col in OPTIONAL_COLUMNS:
+                data_processor.df.at[node_id, col] = None
+            match_cache.observe(node_id, dict.fromkeys(OPTIONAL_COLUMNS))
+            logging.info(f"Cleared optional columns for NODE_ID: {node_id}")
+        
+        threading.Timer(5, delayed_clear).start()
+        logging.info(f"Node {node_id} reset: Current interface = '*', Speed = {DEFAULT_SPEED}, "
+                     f"optional columns will be cleared after 5s.")
 
 def create_match_dict(node_id):
     """
     Create match dictionary for flow rule based on node's current data
+    (cached until one of its fields changes)
     """
-    return {
-        'NODE_ID': node_id,
-        'Src MAC': df.at[node_id, 'Src MAC'] if pd.notna(df.at[node_id, 'Src MAC']) else '*',
-        'Des MAC': df.at[node_id, 'Des MAC'] if pd.notna(df.at[node_id, 'Des MAC']) else '*',
-        'Src IP': df.at[node_id, 'Src IP'] if pd.notna(df.at[node_id, 'Src IP']) else '*',
-        'Des IP': df.at[node_id, 'Des IP'] if pd.notna(df.at[node_id, 'Des IP']) else '*',
-        'Src Port': df.at[node_id, 'Src Port'] if pd.notna(df.at[node_id, 'Src Port']) else '*',
-        'Des Port': df.at[node_id, 'Des Port'] if pd.notna(df.at[node_id, 'Des Port']) else '*',
-        'Current interface': df.at[node_id, 'Current interface'] if pd.notna(df.at[node_id, 'Current interface']) else '*'
-    }
+    return match_cache.match(node_id)
 
 def calculate_timeout(node_id):
     """
-    Calculate timeout based on node's speed and position
+    Calculate timeout from the time the node needs to leave the coverage
+    of its current technology (of any technology when unknown)
     """
-    if node_id not in speed_data:
-        return 20
-    
-    speed = speed_data[node_id]['speed']
-    position = speed_data[node_id]['position']
-    direction = speed_data[node_id]['direction']
+    return calculate_timeouts([node_id])[0]
+
+def calculate_timeouts(node_ids):
+    """
+    Timeouts for a batch of nodes. Without configured coverage cells this
+    is the time to leave the track from position, speed and direction;
+    with cells, one coverage evaluation of the requested nodes. Nodes
+    that cannot be placed keep the default of 20 seconds.
+    """
+    if not coverage.configured:
+        exits = track_exit_times(node_ids)
+        # Cap timeout between 10 and 150 seconds
+        return [20 if np.isnan(exit) else max(10, min(150, float(exit))) for exit in exits]
     
-    # Calculate time to coverage boundary
-    if direction == 1:
-        time_to_boundary = (COVERAGE - position) / (speed * 1000 / 3600)  # Convert speed to m/s
-    else:
-        time_to_boundary = position / (speed * 1000 / 3600)  # Convert speed to m/s
+    specific = [node_id for node_id in node_ids if match_cache.is_specific(node_id)]
+    entries = coverage.evaluate(specific, *fleet_geometry(specific)) if specific else {}
     
-    # Cap timeout between 10 and 150 seconds
-    return max(10, min(150, time_to_boundary))
+    timeouts = []
+    for node_id in node_ids:
+        entry = entries.get(node_id)
+        interface = current_interfaces.get(node_id)
+        technologies = [interface] if interface in coverage.technologies else coverage.technologies
+        exits = [entry[t][1] for t in technologies if entry[t][0]] if entry else []
+        # Cap timeout between 10 and 150 seconds
+        timeouts.append(max(10, min(150, max(exits))) if exits else 20)
+    return timeouts
+
+def publish(topic, payload, destination=None, nums=(), retain=False):
+    """
+    Publish with QoS 1 and track the message until its PUBACK; nums are
+    the rules it carries
+    """
+    info = mqtt_handler.client.publish(topic, payload, qos=1, retain=retain)
+    delivery_tracker.track(info.mid, topic, payload, destination, nums, retain, queued=publish_queued(info.rc))
+
+def publish_queued(rc):
+    """
+    Whether paho accepted a publish; without a connection QoS 1 messages
+    are kept and sent after reconnecting
+    """
+    return rc in (mqtt_handler.mqtt.MQTT_ERR_SUCCESS, mqtt_handler.mqtt.MQTT_ERR_NO_CONN)
+
+def republish(delivery):
+    """
+    Publish again a message paho refused, unless the rules it carries
+    have been removed meanwhile
+    """
+    node_rules = flow_rules.get(delivery.destination, {})
+    if delivery.nums and delivery.destination not in rule_groups.members \
+            and not all(num in node_rules for num in delivery.nums):
+        return
+    info = mqtt_handler.client.publish(delivery.topic, delivery.payload, qos=1, retain=delivery.retain)
+    delivery_tracker.track(info.mid, delivery.topic, delivery.payload, delivery=delivery,
+                           queued=publish_queued(info.rc))
 
 def publish_flow_rule(node_id, flow_rule):
     """
     Publish flow rule to MQTT and store it locally
     """
-    client.publish(f"{MQTT_TOPIC_COMMAND}/{node_id}", json.dumps(flow_rule), qos=1)
+    publish(f"{MQTT_TOPIC_COMMAND}/{node_id}", json.dumps(flow_rule), node_id, [flow_rule['Num']])
     store_flow_rule(node_id, flow_rule['Num'], flow_rule)
 
-def store_flow_rule(node_id, num, flow_rule):
+def publish_rule_patch(node_id, previous, flow_rule):
     """
-    Store flow rule in local data structures and log file
+    Publish the changes from a node's previous rule to flow_rule (same
+    Num) and store flow_rule in its place
     """
-    global flow_rules, latest_flow_rules
-    
-    if node_id not in flow_rules:
-        flow_rules[node_id] = {}
-    flow_rules[node_id][num] = flow_rule
+    patch = rule_patch(node_id, previous, flow_rule)
+    publish(f"{MQTT_TOPIC_COMMAND}/{node_id}", json.dumps(patch), node_id, [patch['Num']])
+    store_flow_rule(node_id, flow_rule['Num'], flow_rule, log=False)
+    with open(FLOWRULE_LOG, 'a') as f:
+        f.write(json.dumps(patch) + '\n')
+
+def own_rule(node_id, command_type, value):
+    """
+    Latest rule addressed to the node itself (not through a group) with
+    the given Command type and Value, the rule a new decision of the same
+    kind patches; None if it has none
+    """
+    with flow_rules_lock:
+        for flow_rule in reversed(list(flow_rules.with_value(node_id, value).values())):
+            if flow_rule.get('Command type') == command_type and flow_rule['match'].get('NODE_ID') == node_id:
+                return flow_rule
+    return None
+
+def store_flow_rule(node_id, num, flow_rule, log=True):
+    """
+    Store flow rule in local data structures and log file (batches
+    write their log lines themselves)
+    """
+    global latest_flow_rules
     
-    # Keep track of recent rules
-    latest_flow_rules.append({'NODE_ID': node_id, 'Value': flow_rule['Value']})
-    if len(latest_flow_rules) > 3:
-        latest_flow_rules.pop(0)
+    with flow_rules_lock:
+        match_version = match_cache.version(node_id) if built_on_match(node_id, flow_rule) else None
+        flow_rules.insert(node_id, num, flow_rule, match_version)
+        rule_expiry.schedule(node_id, num, flow_rule.get('Timeout'))
+        bump_rule_set_version(node_id)
+        
+        # Keep track of recent rules (rate hints say nothing about roles)
+        if flow_rule.get('Command type') != 'Rate control':
+            latest_flow_rules.append({'NODE_ID': node_id, 'Value': flow_rule['Value']})
+            if len(latest_flow_rules) > 3:
+                latest_flow_rules.pop(0)
     
     # Log the rule
-    with open(FLOWRULE_LOG, 'a') as f:
-        f.write(json.dumps(flow_rule) + '\n')
+    if log:
+        with open(FLOWRULE_LOG, 'a') as f:
+            f.write(json.dumps(flow_rule) + '\n')
 
-def flow_rule_exists(node_id, value):
+def built_on_match(node_id, flow_rule):
     """
-    Check if a flow rule with given value exists for a node
+    Whether a rule carries the node's cached match; group rules and the
+    initialization rule match on wildcards instead
+    """
+    return flow_rule['match'].get('NODE_ID') == node_id and flow_rule.get('Command type') != 'Initialization'
+
+def refresh_stale_rules(node_id):
+    """
+    Patch the node's rules built on an older match after one of its match
+    fields changed during ingestion. The Current interface a rule matches
+    on is the condition it was sent for, so it is kept; a rule whose match
+    comes out the same is only marked current.
+    """
+    version = match_cache.version(node_id)
+    patched = 0
+    with flow_rules_lock:
+        for num in flow_rules.stale(node_id, version):
+            previous = flow_rules[node_id][num]
+            match = {**match_cache.match(node_id), 'Current interface': previous['match'].get('Current interface', '*')}
+            if match == previous['match']:
+                flow_rules.mark_current(node_id, num, version)
+                continue
+            publish_rule_patch(node_id, previous, {**previous, 'match': match,
+                                                   'Version': previous.get('Version', 1) + 1})
+            patched += 1
+    if patched:
+        logging.info(f"Patched {patched} rules of {node_id} to its new match fields")
+
+def delete_flow_rule(node_id, num):
+    """
+    Remove a rule (expired, locally or as reported by the node, or
+    replaced); returns it, None if unknown
+    """
+    with flow_rules_lock:
+        flow_rule = flow_rules.delete(node_id, num)
+        rule_expiry.cancel(node_id, num)
+        if flow_rule is not None:
+            bump_rule_set_version(node_id)
+    return flow_rule
+
+def remove_node_rules(node_id):
+    """
+    Forget every rule of a removed node and its rule group membership
     """
-    if node_id in flow_rules:
-        for rule in flow_rules[node_id].values():
-            if rule["Value"] == value:
-                return True
-    return False
+    with flow_rules_lock:
+        for num in list(flow_rules.get(node_id, ())):
+            rule_expiry.cancel(node_id, num)
+        flow_rules.remove_node(node_id)
+        rule_set_versions.pop(node_id, None)
+    emptied = rule_groups.remove_node(node_id)
+    if emptied is not None and RULE_GROUP_RETAIN:
+        publish(group_topic(emptied), b'', destination=emptied, retain=True)
 
-def get_latest_interface():
+def bump_rule_set_version(node_id):
     """
-    Get the latest interface from recent flow rules
+    Mark a node's rule set as changed
     """
-    if not latest_flow_rules:
-        return None
+    rule_set_versions[node_id] = rule_set_versions.get(node_id, 0) + 1
+
+def reconcile_rules(node_id, node_digest):
+    """
+    Compare a node's rule set digest with the controller's view and ask the
+    node which Nums and Versions it holds in the buckets that differ
+    """
+    node_digest = {int(bucket): value for bucket, value in node_digest.items()}
+    with flow_rules_lock:
+        drifted = drifted_buckets(flow_rules.digest(node_id), node_digest)
+    if not drifted:
+        return
     
-    latest_rule = latest_flow_rules[-1]
-    if 'ITSG5' in latest_rule['Value']:
-        return 'ITSG5'
-    elif 'CV2X' in latest_rule['Value']:
-        return 'CV2X'
-    return None
+    message = {'NODE_ID': node_id, 'Reconcile': {'Buckets': drifted}}
+    publish(f"{MQTT_TOPIC_COMMAND}/{node_id}", json.dumps(message), node_id)
+    logging.info(f"Rule set of {node_id} drifted in {len(drifted)} of {RULE_DIGEST_BUCKETS} buckets, "
+                 f"asking for its rules there")
+
+def repair_rules(node_id, buckets, node_rules):
+    """
+    Repair drifted buckets from the {Num: Version} the node reported for
+    them: it drops the rules the controller does not have (or has at
+    another Version) and gets only the rules it lacks
+    """
+    buckets = {int(bucket) for bucket in buckets}
+    topic = f"{MQTT_TOPIC_COMMAND}/{node_id}"
+    with flow_rules_lock:
+        local = {num: flow_rule.get('Version', 1) for num, flow_rule in flow_rules.in_buckets(node_id, buckets).items()}
+        send, drop = rule_differences(local, node_rules)
+        lines = []
+        if drop:
+            message = {'NODE_ID': node_id, 'Drop': drop}
+            lines.append(json.dumps(message))
+            publish(topic, lines[-1], node_id)
+        for num in send:
+            lines.append(json.dumps(dict(flow_rules[node_id][num])))
+            publish(topic, lines[-1], node_id, [num])
+    
+    if lines:
+        logging.info(f"Reconciled {len(buckets)} buckets of {node_id}: "
+                     f"resent {len(send)} rules, dropped {len(drop)}")
+        with open(FLOWRULE_LOG, 'a') as f:
+            f.writelines(line + '\n' for line in lines)
+
+def flow_rule_exists(node_id, value):
+    """
+    Check if a flow rule with given value exists for a node
+    """
+    return flow_rules.has_value(node_id, value)
 
 def send_forwarding_rule(node_id, next_hop, forwarding_interface, value_type):
     """
     Create and send a forwarding flow rule
     """
-    next_hop_mac = df.at[next_hop, 'Src MAC'] if next_hop in df.index and pd.notna(df.at[next_hop, 'Src MAC']) else '*'
+    next_hop_mac = match_cache.match(next_hop)['Src MAC']
     
-    # Check if rule already exists
-    existing_rules = flow_rules.get(node_id, {})
-    for rule in existing_rules.values():
-        if rule['Command type'] == 'Forwarding' and rule['Next hop'] == next_hop_mac:
+    with flow_rules_lock:
+        # Check if rule already exists
+        if flow_rules.with_command(node_id, 'Forwarding', next_hop_mac):
             return
-    
-    # Create new forwarding rule
-    num = get_next_num()
-    flow_rule = {
-        'Num': num,
-        'match': create_match_dict(node_id),
-        'Command type': 'Forwarding',
-        'Value': value_type,
-        'Next hop': next_hop_mac,
-        'Rx Power Threshold': '*',
-        'Latency': '*',
-        'Priority': '*',
-        'Counter': 0,
-        'Timeout': 20
-    }
-    
-    logging.info(f"Sending Forwarding Rule: {flow_rule}")
-    publish_flow_rule(node_id, flow_rule)
+        
+        # Create new forwarding rule
+        num = get_next_num()
+        flow_rule = {
+            'Num': num,
+            'Version': 1,
+            'match': create_match_dict(node_id),
+            'Command type': 'Forwarding',
+            'Value': value_type,
+            'Next hop': next_hop_mac,
+            'Rx Power Threshold': '*',
+            'Latency': '*',
+            'Priority': '*',
+            'Counter': 0,
+            'Timeout': 20
+        }
+        
+        logging.info(f"Sending Forwarding Rule: {flow_rule}")
+        publish_flow_rule(node_id, flow_rule)
+
+def send_rate_control_rule(node_id):
+    """
+    Create and send a rule carrying the node's congestion hints,
+    replacing the hints it was sent before
+    """
+    with flow_rules_lock:
+        previous = own_rule(node_id, 'Rate control', 'Rate') if RULE_PATCHES else None
+        for num in list(flow_rules.with_command(node_id, 'Rate control')):
+            if previous is None or num != previous['Num']:
+                delete_flow_rule(node_id, num)
+        
+        flow_rule = {
+            'Num': get_next_num() if previous is None else previous['Num'],
+            'Version': 1 if previous is None else previous.get('Version', 1) + 1,
+            'match': create_match_dict(node_id),
+            'Command type': 'Rate control',
+            'Value': 'Rate',
+            'Rx Power Threshold': '*',
+            'Latency': '*',
+            'Priority': '*',
+            **rate_hints(node_id),
+            'TX profile': sender_profile(node_id, f"{current_interfaces.get(node_id)}_tx"),
+            'Counter': 0,
+            'Timeout': CONGESTION_RULE_TIMEOUT
+        }
+        
+        logging.info(f"Sending Rate Control Rule: {flow_rule}")
+        if previous is None:
+            publish_flow_rule(node_id, flow_rule)
+        else:
+            publish_rule_patch(node_id, previous, flow_rule)
 
 def send_execution_message_to_tx(rx_node_id, rx_current_interface):
     """
-    Send execution message to TX node when RX interface changes
+    Send execution messages to every TX node paired with an RX node when
+    its interface changes, as one batch
     """
-    tx_node_id = [k for k, v in tx_rx_mapping.items() if v == rx_node_id]
-    if not tx_node_id:
+    tx_node_ids = tx_rx_mapping.tx_nodes(rx_node_id)
+    if not tx_node_ids:
         return
     
-    tx_node_id = tx_node_id[0]
     if rx_current_interface == 'ITSG5':
         value = 'ITSG5_tx'
     elif rx_current_interface == 'CV2X':
@@ -235,15 +584,12 @@ def send_execution_message_to_tx(rx_node_id, rx_current_interface):
     else:
         return
     
-    message = {
-        'NODE_ID': tx_node_id,
-        'Value': value
-    }
-    
-    logging.info(f"Sending execution message to tx NODE: {message}")
-    client.publish(f"{MQTT_TOPIC_COMMAND}/{tx_node_id}", json.dumps(message), qos=1)
+    messages = [{'NODE_ID': tx_node_id, 'Value': value} for tx_node_id in tx_node_ids]
+    logging.info(f"Sending execution message to {len(messages)} tx NODEs of {rx_node_id}: {value}")
+    for message in messages:
+        publish(f"{MQTT_TOPIC_COMMAND}/{message['NODE_ID']}", json.dumps(message), message['NODE_ID'])
     with open(FLOWRULE_LOG, 'a') as f:
-        f.write(json.dumps(message) + '\n')
+        f.writelines(json.dumps(message) + '\n' for message in messages)
 
 def get_all_node_ids():
     """Get list of all node IDs from data processor"""
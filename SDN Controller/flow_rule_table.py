@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Flow Rule Table - flow rules by (node, Num) with secondary indexes for O(1) lookups
+
+from link_scoring import TECHNOLOGIES
+from rule_digest import bucket_of, rule_hash
+
+def rule_technology(rule):
+    """
+    Technology a rule's Value refers to ('ITSG5_rx' -> 'ITSG5'), None otherwise
+    """
+    value = rule.get('Value')
+    if isinstance(value, str):
+        for technology in TECHNOLOGIES:
+            if value.startswith(technology):
+                return technology
+    return None
+
+class FlowRuleTable:
+    """
+    Primary storage {node_id: {Num: rule}} plus indexes by (node, Value),
+    (node, Command type, Next hop) and (node, technology). Each index maps
+    its key to {Num: rule}, so inserts and deletes keep all of them in step
+    and lookups never scan a node's rules. Each node's rule set digest is
+    kept up to date the same way, by XOR-ing rule hashes in and out.
+    """
+    def __init__(self):
+        self.rules = {}  # {node_id: {num: rule}}
+        self.by_value = {}  # {(node_id, Value): {num: rule}}
+        self.by_command = {}  # {(node_id, Command type, Next hop): {num: rule}}
+        self.by_technology = {}  # {(node_id, technology): {num: rule}}
+        self.match_versions = {}  # {(node_id, num): match cache version the rule was built on, None if not built on it}
+        self.digests = {}  # {node_id: {bucket: XOR of (Num, Version) hashes}}
+
+    def _keys(self, node_id, rule):
+        yield self.by_value, (node_id, rule.get('Value'))
+        yield self.by_command, (node_id, rule.get('Command type'), rule.get('Next hop'))
+        technology = rule_technology(rule)
+        if technology is not None:
+            yield self.by_technology, (node_id, technology)
+
+    def insert(self, node_id, num, rule, match_version=None):
+        """
+        Store a rule, replacing any rule with the same Num
+        """
+        self.delete(node_id, num)
+        self.rules.setdefault(node_id, {})[num] = rule
+        self.match_versions[(node_id, num)] = match_version
+        for index, key in self._keys(node_id, rule):
+            index.setdefault(key, {})[num] = rule
+        self._toggle_digest(node_id, num, rule)
+
+    def delete(self, node_id, num):
+        """
+        Remove a rule from storage and every index; returns it (None if absent)
+        """
+        node_rules = self.rules.get(node_id)
+        if not node_rules or num not in node_rules:
+            return None
+        rule = node_rules.pop(num)
+        self.match_versions.pop((node_id, num), None)
+        if not node_rules:
+            del self.rules[node_id]
+        for index, key in self._keys(node_id, rule):
+            bucket = index[key]
+            del bucket[num]
+            if not bucket:
+                del index[key]
+        self._toggle_digest(node_id, num, rule)
+        return rule
+
+    def _toggle_digest(self, node_id, num, rule):
+        # XOR adds a rule's hash on insert and removes it again on delete
+        digest = self.digests.setdefault(node_id, {})
+        bucket = bucket_of(num)
+        value = digest.get(bucket, 0) ^ rule_hash(num, rule.get('Version', 1))
+        if value:
+            digest[bucket] = value
+        else:
+            digest.pop(bucket, None)
+            if not digest:
+                del self.digests[node_id]
+
+    def digest(self, node_id):
+        """
+        {bucket: hash} of a node's rule set, as the node computes it
+        """
+        return self.digests.get(node_id, {})
+
+    def in_buckets(self, node_id, buckets):
+        """
+        {Num: rule} of the node's rules that fall into the given buckets
+        """
+        return {num: rule for num, rule in self.rules.get(node_id, {}).items() if bucket_of(num) in buckets}
+
+    def remove_node(self, node_id):
+        for num in list(self.rules.get(node_id, ())):
+            self.delete(node_id, num)
+
+    def stale(self, node_id, match_version):
+        """
+        Nums of the node's rules built on an older match than match_version
+        """
+        return [num for num in self.rules.get(node_id, ())
+                if self.match_versions.get((node_id, num)) is not None
+                and self.match_versions[(node_id, num)] < match_version]
+
+    def mark_current(self, node_id, num, match_version):
+        """
+        Record that a rule still holds for a newer match version
+        """
+        if (node_id, num) in self.match_versions:
+            self.match_versions[(node_id, num)] = match_version
+
+    def has_value(self, node_id, value):
+        return (node_id, value) in self.by_value
+
+    def with_value(self, node_id, value):
+        return self.by_value.get((node_id, value), {})
+
+    def with_command(self, node_id, command_type, next_hop=None):
+        return self.by_command.get((node_id, command_type, next_hop), {})
+
+    def has_technology(self, node_id, technology):
+        return (node_id, technology) in self.by_technology
+
+    # Read access as {node_id: {num: rule}}
+    def get(self, node_id, default=None):
+        return self.rules.get(node_id, default)
+
+    def items(self):
+        return list(self.rules.items())
+
+    def __contains__(self, node_id):
+        return node_id in self.rules
+
+    def __getitem__(self, node_id):
+        return self.rules[node_id]
+
+    def __len__(self):
+        return len(self.rules)
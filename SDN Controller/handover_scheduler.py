@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Handover Scheduler - predicted coverage exits queued so switches start ahead of time
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+from config import *
+from trend_predictor import median_switch_duration
+from coverage_model import coverage, coverage_info
+
+class HandoverScheduler:
+    """
+    Priority queue of predicted boundary crossings. Each entry fires the
+    median switch duration (plus a guard) before its crossing; replanning a
+    node supersedes its older entries.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.heap = []  # [(fire time, seq, node_id, version)]
+        self.plans = {}  # {node_id: (version, crossing time, target technology)}
+        self.sequence = itertools.count()
+        self.worker = None
+        self.on_handover = None
+
+    def lead_time(self):
+        return median_switch_duration() + HANDOVER_GUARD
+
+    def schedule(self, node_id, crossing_time, target):
+        """
+        Plan a node's next crossing, replacing any earlier plan
+        """
+        with self.condition:
+            version = self.plans.get(node_id, (0,))[0] + 1
+            self.plans[node_id] = (version, crossing_time, target)
+            fire_time = crossing_time - self.lead_time()
+            heapq.heappush(self.heap, (fire_time, next(self.sequence), node_id, version))
+            self.condition.notify_all()
+        return fire_time
+
+    def cancel(self, node_id):
+        """
+        Forget a node's plan; its queued entries become stale
+        """
+        with self.condition:
+            version = self.plans.get(node_id, (0,))[0] + 1
+            self.plans[node_id] = (version, None, None)
+
+    def due(self, now=None):
+        """
+        Pop the plans whose fire time has come: [(node_id, crossing time, target)]
+        """
+        now = self.clock() if now is None else now
+        fired = []
+        with self.condition:
+            while self.heap and self.heap[0][0] <= now:
+                _, _, node_id, version = heapq.heappop(self.heap)
+                plan = self.plans.get(node_id)
+                if plan is None or plan[0] != version or plan[1] is None:
+                    continue
+                fired.append((node_id, plan[1], plan[2]))
+                self.plans[node_id] = (version, None, None)
+        return fired
+
+    def start(self, on_handover):
+        """
+        Run a single thread that sleeps until the next fire time and
+        calls on_handover(node_id, target) for each due plan
+        """
+        self.on_handover = on_handover
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap:
+                    self.condition.wait()
+                delay = self.heap[0][0] - self.clock()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+            for node_id, crossing_time, target in self.due():
+                logging.info(f"Handover for NODE {node_id} due, crossing in "
+                             f"{crossing_time - self.clock():.2f} s, target {target or 'relay'}")
+                self.on_handover(node_id, target)
+
+scheduler = HandoverScheduler()
+
+def plan_handover(node_id):
+    """
+    (Re)plan a node's handover from the coverage model: when it leaves
+    the cells of its current interface and who covers it afterwards
+    """
+    from data_processor import current_interfaces
+
+    interface = current_interfaces.get(node_id)
+    info = coverage_info(node_id, interface) if interface in coverage.technologies else None
+    if info is None or not info[0] or info[1] == float('inf'):
+        scheduler.cancel(node_id)
+        return None
+    _, eta, target = info
+    return scheduler.schedule(node_id, scheduler.clock() + eta, target)
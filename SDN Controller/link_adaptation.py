@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Link Adaptation - TX profile (MCS, power, rate, packet length) per link from recent PER, RSSI and latency
+
+from config import *
+from link_scoring import TECHNOLOGIES, metric_scorers
+
+# Global data structures
+link_states = {}  # {(rx_node_id, technology): {'mcs', 'power', 'length', 'offset', 'per', 'rssi', 'latency'}}
+
+MCS_LADDERS = {'ITSG5': ITSG5_MCS_LADDER, 'CV2X': CV2X_MCS_LADDER}
+
+def _state(node_id, technology):
+    key = (node_id, technology)
+    state = link_states.get(key)
+    if state is None:
+        default = DEFAULT_TX_PROFILES[technology]
+        state = link_states[key] = {
+            'mcs': MCS_LADDERS[technology].index(default['MCS']),
+            'power': default['Power'],
+            'length': default['Length'],
+            'offset': 0,
+            'per': None,
+            'rssi': None,
+            'latency': None,
+        }
+    return state
+
+def _smooth(state, field, value):
+    previous = state[field]
+    state[field] = value if previous is None else previous + LINK_ADAPTATION_ALPHA * (value - previous)
+
+def _parse(metric, raw):
+    try:
+        return metric_scorers[metric][0](raw)
+    except (KeyError, ValueError, IndexError, ZeroDivisionError):
+        return None
+
+def update_link_adaptation(node_id, technology, data):
+    """
+    Fold one telemetry message from a receiving node into the profile of
+    the link it measures. Returns the updated state or None.
+    """
+    if technology not in TECHNOLOGIES:
+        return None
+
+    per = _parse('PER', data['PER']) if 'PER' in data else None
+    if per is None and technology == 'CV2X' and 'PPS' in data:
+        # acme reports no PER, packets missing from the expected rate stand in
+        pps = _parse('PPS', data['PPS'])
+        per = None if pps is None else max(0.0, 1.0 - pps / EXPECTED_PPS)
+    rssi = _parse('RSSI', data['RSSI']) if 'RSSI' in data else None
+    if rssi is None and 'Power' in data:
+        rssi = _parse('Power', data['Power'])
+    latency = _parse('Latency', data['Latency']) if 'Latency' in data else None
+
+    if per is None and rssi is None and latency is None:
+        return None
+
+    state = _state(node_id, technology)
+    if per is not None:
+        _smooth(state, 'per', per)
+        _step_mcs(state, technology)
+    if rssi is not None:
+        _smooth(state, 'rssi', rssi)
+    if technology == 'ITSG5' and state['rssi'] is not None:
+        _fit_link_budget(state)
+    if latency is not None:
+        _smooth(state, 'latency', latency)
+        _fit_length(state, technology)
+    return state
+
+def _step_mcs(state, technology):
+    """
+    Outer loop: packet errors move the MCS one step. With RSSI known, errors
+    instead raise the margin the link budget keeps; without it, power is
+    raised before giving up throughput.
+    """
+    low, high = TX_POWER_RANGE[technology]
+    ladder = MCS_LADDERS[technology]
+    if state['per'] > PER_TARGET[1]:
+        if state['rssi'] is not None:
+            state['offset'] = min(MAX_LINK_OFFSET_DB, state['offset'] + POWER_STEP_DB)
+        elif state['power'] < high:
+            state['power'] = min(high, state['power'] + POWER_STEP_DB)
+        elif state['mcs'] > 0:
+            state['mcs'] -= 1
+    elif state['per'] < PER_TARGET[0]:
+        state['offset'] = max(0, state['offset'] - 1)
+        if state['mcs'] < len(ladder) - 1:
+            state['mcs'] += 1
+
+def _fit_link_budget(state):
+    """
+    Inner loop (ITSG5): cap the MCS at what the link budget can reach, then
+    use the lowest power that keeps the margin above its sensitivity
+    """
+    low, high = TX_POWER_RANGE['ITSG5']
+    margin = LINK_MARGIN_DB + state['offset']
+    reachable_rssi = state['rssi'] + high - state['power']
+    ceiling = 0
+    for index, sensitivity in enumerate(ITSG5_MCS_SENSITIVITY):
+        if sensitivity + margin <= reachable_rssi:
+            ceiling = index
+    state['mcs'] = min(state['mcs'], ceiling)
+
+    required = ITSG5_MCS_SENSITIVITY[state['mcs']] + margin
+    power = max(low, min(high, round(state['power'] + required - state['rssi'])))
+    # The smoothed RSSI was measured at the old power
+    state['rssi'] += power - state['power']
+    state['power'] = power
+
+def _fit_length(state, technology):
+    """
+    Shorter packets while latency is above the switching threshold cap,
+    back towards the default length once it has clearly recovered
+    """
+    default = DEFAULT_TX_PROFILES[technology]['Length']
+    if state['latency'] > LATENCY_THRESHOLD_CAP:
+        state['length'] = max(MIN_PACKET_LENGTH[technology], state['length'] // 2)
+    elif state['latency'] < LATENCY_THRESHOLD_CAP / 2:
+        state['length'] = min(default, state['length'] * 2)
+
+def airtime(mcs, length):
+    """
+    Relative airtime of an ITSG5 packet (bits over the MCS bitrate)
+    """
+    return length * 8 / ITSG5_MCS_BITRATES[ITSG5_MCS_LADDER.index(mcs)]
+
+def tx_profile(rx_node_id, technology, traffic_rate=None):
+    """
+    TX profile for nodes sending to rx_node_id. For ITSG5 the packet rate
+    spends the area's traffic rate budget in airtime, so faster MCS and
+    shorter packets allow more packets.
+    """
+    default = DEFAULT_TX_PROFILES[technology]
+    state = link_states.get((rx_node_id, technology))
+    if state is None:
+        profile = dict(default)
+    else:
+        profile = {
+            'MCS': MCS_LADDERS[technology][state['mcs']],
+            'Power': state['power'],
+            'Length': state['length'],
+        }
+
+    if technology == 'ITSG5':
+        budget = default['Rate'] if traffic_rate is None else traffic_rate
+        scale = airtime(default['MCS'], default['Length']) / airtime(profile['MCS'], profile['Length'])
+        profile['Rate'] = int(max(TX_RATE_RANGE[0], min(TX_RATE_RANGE[1], round(budget * scale))))
+    return profile
+
+def clear_link_adaptation(node_id):
+    """
+    Forget the link states measured by a node
+    """
+    for technology in TECHNOLOGIES:
+        link_states.pop((node_id, technology), None)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Link Scoring - incremental per-technology link quality scores from node telemetry
+
+import logging
+
+from config import *
+
+TECHNOLOGIES = ('ITSG5', 'CV2X')
+
+# Global data structures
+metric_scorers = {}  # {metric: (parse function, good value, bad value)}
+link_scores = {}  # {(node_id, technology): {'metrics': {metric: ewma}, 'weighted': x, 'weight': y}}
+
+def register_scorer(metric, parse, good, bad):
+    """
+    Register how a telemetry field maps to a 0..1 quality (1 at good, 0 at bad)
+    """
+    metric_scorers[metric] = (parse, good, bad)
+
+def normalize(value, good, bad):
+    """
+    Linear ramp between bad (0) and good (1), clipped
+    """
+    quality = (value - bad) / (good - bad)
+    return 0.0 if quality < 0 else 1.0 if quality > 1 else quality
+
+def _parse_number(raw):
+    return float(str(raw).replace('ms', '').replace('%', '').split()[0])
+
+def _parse_antenna_pair(raw):
+    values = [float(v) for v in str(raw).split(',') if v.strip()]
+    return sum(values) / len(values)
+
+def _parse_power(raw):
+    return float(str(raw).split(',')[1])
+
+def _parse_ratio(raw):
+    value = _parse_number(str(raw).strip('()'))
+    return value / 100 if value > 1 else value
+
+# Default scorers for the fields reported by DataMonitor
+register_scorer('Latency', _parse_number, good=5.0, bad=60.0)
+register_scorer('Power', _parse_power, good=-50.0, bad=-100.0)
+register_scorer('RSSI', _parse_antenna_pair, good=-50.0, bad=-95.0)
+register_scorer('Noise', _parse_antenna_pair, good=-100.0, bad=-80.0)
+register_scorer('PER', _parse_ratio, good=0.0, bad=0.3)
+register_scorer('CBR', _parse_ratio, good=0.2, bad=0.8)
+register_scorer('CBP', _parse_ratio, good=0.2, bad=0.8)
+register_scorer('PPS', _parse_number, good=EXPECTED_PPS, bad=0.0)
+
+def update_link_score(node_id, technology, data):
+    """
+    Fold one telemetry message into the node's score for the technology
+    it was measured on. Only the metrics present in the message are touched.
+    """
+    if technology not in TECHNOLOGIES:
+        return None
+
+    key = (node_id, technology)
+    entry = link_scores.get(key)
+    if entry is None:
+        entry = link_scores[key] = {'metrics': {}, 'weighted': 0.0, 'weight': 0.0}
+    metrics = entry['metrics']
+
+    for metric, raw in data.items():
+        scorer = metric_scorers.get(metric)
+        weight = LINK_SCORE_WEIGHTS.get(metric, 0)
+        if scorer is None or not weight or raw is None:
+            continue
+        parse, good, bad = scorer
+        try:
+            quality = normalize(parse(raw), good, bad)
+        except (ValueError, IndexError, ZeroDivisionError):
+            continue
+
+        previous = metrics.get(metric)
+        if previous is None:
+            metrics[metric] = quality
+            entry['weighted'] += weight * quality
+            entry['weight'] += weight
+        else:
+            smoothed = previous + LINK_SCORE_ALPHA * (quality - previous)
+            metrics[metric] = smoothed
+            entry['weighted'] += weight * (smoothed - previous)
+
+    return link_score(node_id, technology)
+
+def link_score(node_id, technology):
+    """
+    Current 0..1 score of a node's link on a technology (None if never measured)
+    """
+    entry = link_scores.get((node_id, technology))
+    if not entry or not entry['weight']:
+        return None
+    return entry['weighted'] / entry['weight']
+
+def clear_link_scores(node_id):
+    """
+    Forget all scores of a node
+    """
+    for technology in TECHNOLOGIES:
+        link_scores.pop((node_id, technology), None)
+
+def select_technology(node_id, current_interface):
+    """
+    Technology a switching decision should move the node to, or None when
+    there is not enough information (caller keeps its default behaviour)
+    """
+    scores = {tech: link_score(node_id, tech) for tech in TECHNOLOGIES}
+
+    if current_interface in TECHNOLOGIES:
+        other = 'CV2X' if current_interface == 'ITSG5' else 'ITSG5'
+        current_score, other_score = scores[current_interface], scores[other]
+        if current_score is None or other_score is None:
+            return other
+        if current_score >= other_score + LINK_SCORE_MARGIN:
+            logging.info(f"NODE {node_id}: {current_interface} score {current_score:.2f} "
+                         f"still above {other} score {other_score:.2f}")
+            return current_interface
+        return other
+
+    known = {tech: score for tech, score in scores.items() if score is not None}
+    if len(known) < len(TECHNOLOGIES):
+        return None
+    return max(known, key=known.get)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Match Cache - per-node flow rule match dictionaries rebuilt only when their fields change
+
+import json
+
+import pandas as pd
+
+from config import *
+
+class MatchCache:
+    """
+    Source values of each node's match fields, as last seen during
+    ingestion, with the match dictionary built from them. A change to any
+    field bumps the node's version and drops the built dictionary, so rule
+    builders reuse it until then and rules built on an older version can
+    be told apart.
+    """
+    def __init__(self):
+        self.sources = {}  # {node_id: {field: value}}
+        self.matches = {}  # {node_id: (match dict, JSON encoding)}
+        self.versions = {}  # {node_id: version}
+
+    def observe(self, node_id, data):
+        """
+        Fold the match fields present in a message (or reset) into the
+        cache; returns True if any of them changed
+        """
+        source = self.sources.setdefault(node_id, {})
+        changed = False
+        for field in MATCH_FIELDS:
+            if field not in data:
+                continue
+            value = data[field] if pd.notna(data[field]) else '*'
+            if source.get(field, '*') != value:
+                source[field] = value
+                changed = True
+        if changed or node_id not in self.versions:
+            self.versions[node_id] = self.versions.get(node_id, 0) + 1
+            self.matches.pop(node_id, None)
+        return changed
+
+    def encoded(self, node_id):
+        """
+        (match dictionary, its JSON encoding) of a node, shared by every
+        rule built until a field changes; callers must not modify it
+        """
+        cached = self.matches.get(node_id)
+        if cached is None:
+            source = self.sources.get(node_id, {})
+            match = {'NODE_ID': node_id, **{field: source.get(field, '*') for field in MATCH_FIELDS}}
+            cached = self.matches[node_id] = (match, json.dumps(match))
+        return cached
+
+    def match(self, node_id):
+        """
+        Match dictionary of a node ('*' for fields it has not reported)
+        """
+        return dict(self.encoded(node_id)[0])
+
+    def is_specific(self, node_id):
+        """
+        True once any match field of the node is known
+        """
+        return any(value != '*' for value in self.sources.get(node_id, {}).values())
+
+    def version(self, node_id):
+        return self.versions.get(node_id, 0)
+
+    def remove_node(self, node_id):
+        self.sources.pop(node_id, None)
+        self.matches.pop(node_id, None)
+        self.versions.pop(node_id, None)
+
+match_cache = MatchCache()
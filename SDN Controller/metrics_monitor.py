@@ -2,247 +2,445 @@
 # Metrics Monitor - handles monitoring, analysis, and switching decisions
 
 import numpy as np
+import pandas as pd
 import logging
 import time
 import threading
 from datetime import datetime
-from functools import partial
 
 from config import *
-from data_processor import latency_data, power_data, switching_nodes, received_nodes
+from data_processor import (
+    current_interfaces,
+    latency_data,
+    power_data,
+    latency_quantiles,
+    power_quantiles,
+    switching_nodes,
+    clear_all_metric_windows
+)
 from flow_rule_manager import (
     send_flow_rule, 
     send_initialization_flow_rule,
     send_itsg5_flow_rule,
     send_cv2x_flow_rule,
     send_forwarding_rule,
-    flow_rule_exists
+    flow_rule_exists,
+    flow_rules,
+    latest_flow_rules
 )
+from switching_kernel import evaluate_fleet, window_stats, action_indices, NO_OP, SWITCH, ABNORMAL
+from trend_predictor import should_preempt, record_switch_request, window_values
+from link_scoring import select_technology
+from switching_orchestrator import orchestrator
+import relay_graph
+from anomaly_detector import detector
+from coverage_model import covering_technologies
+
+# Switching decisions cached per node, keyed by everything they depend on
+decision_cache = {}  # {node_id: (cache key, decision)}
+decision_cache_stats = {'hits': 0, 'misses': 0}
 
 def monitor_metrics():
     """
     Continuously monitor metrics and trigger analysis when needed
     """
-    last_latency_data = {}
-    last_power_data = {}
-    
     while True:
         time.sleep(5)
-        check_node_metrics(last_latency_data, last_power_data)
+        check_node_metrics()
 
-def check_node_metrics(last_latency_data, last_power_data):
+def decision_key(node_id):
     """
-    Check metrics for all nodes and trigger analysis if data changed
+    Cache key of a node's switching decision:
+    (window version, current interface, rule-set version)
     """
-    for node_id in list(latency_data.keys()):
-        if (len(latency_data.get(node_id, [])) == 5 and 
-            latency_data.get(node_id) != last_latency_data.get(node_id)):
-            last_latency_data[node_id] = list(latency_data[node_id])
-            analyze_node_metrics(node_id)
-            
-    for node_id in list(power_data.keys()):
-        if (len(power_data.get(node_id, [])) == 5 and 
-            power_data.get(node_id) != last_power_data.get(node_id)):
-            last_power_data[node_id] = list(power_data[node_id])
-            analyze_node_metrics(node_id)
+    from data_processor import window_versions, current_interfaces
+    from flow_rule_manager import rule_set_versions
+    
+    return (window_versions.get(node_id, 0),
+            current_interfaces.get(node_id),
+            rule_set_versions.get(node_id, 0))
 
-def analyze_node_metrics(node_id):
+def check_node_metrics():
     """
-    Analyze metrics for a specific node and make switching decisions
+    Check metrics for all nodes with a full window and analyze those
+    whose decision key changed since the last analysis
     """
-    # Calculate averages and standard deviations
-    avg_latency, std_latency = calculate_latency_stats(node_id)
-    avg_power, std_power = calculate_power_stats(node_id)
+    candidates = set(node_id for node_id in list(latency_data.keys())
+                     if len(latency_data.get(node_id, [])) == LATENCY_WINDOW)
+    candidates.update(node_id for node_id in list(power_data.keys())
+                      if len(power_data.get(node_id, [])) == POWER_WINDOW)
     
-    # Check if metrics indicate need for switching
-    if should_switch_interface(avg_latency, std_latency, avg_power, std_power):
-        trigger_interface_switch(node_id, avg_latency, std_latency, avg_power, std_power)
-    elif is_abnormal_metrics(avg_latency, avg_power):
-        handle_abnormal_metrics(node_id)
+    changed_nodes = {}
+    for node_id in candidates:
+        key = decision_key(node_id)
+        cached = decision_cache.get(node_id)
+        if cached is not None and cached[0] == key:
+            decision_cache_stats['hits'] += 1
+        else:
+            decision_cache_stats['misses'] += 1
+            changed_nodes[node_id] = key
+    
+    if changed_nodes:
+        decisions = analyze_fleet_metrics(list(changed_nodes))
+        # Keys describe the state the decision was made on, so rules sent
+        # while acting bump the rule-set version and invalidate the entry
+        for (node_id, key), decision in zip(changed_nodes.items(), decisions):
+            decision_cache[node_id] = (key, int(decision))
 
-def calculate_latency_stats(node_id):
+def get_decision_cache_stats():
     """
-    Calculate latency statistics for a node
+    Hit/miss counters and size of the decision cache
     """
-    if node_id in latency_data and len(latency_data[node_id]) == 5:
-        avg = np.mean(latency_data[node_id])
-        std = np.std(latency_data[node_id])
-        
-        logging.info(f"Average latency for NODE {node_id}: {avg} ms, Std: {std} ms")
-        with open(CALCULATION_LATENCY_LOG, 'a') as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - NODE_ID: {node_id} - "
-                   f"Average Latency: {avg} ms, Std: {std} ms\n")
-        return avg, std
-    return None, None
+    total = decision_cache_stats['hits'] + decision_cache_stats['misses']
+    return {
+        'hits': decision_cache_stats['hits'],
+        'misses': decision_cache_stats['misses'],
+        'hit_rate': decision_cache_stats['hits'] / total if total else 0.0,
+        'entries': len(decision_cache)
+    }
 
-def calculate_power_stats(node_id):
+def analyze_fleet_metrics(node_ids):
     """
-    Calculate power statistics for a node
+    Analyze metrics for a batch of nodes in one vectorized pass;
+    only nodes that need an action are handled individually
     """
-    if node_id in power_data and len(power_data[node_id]) == 5:
-        avg = np.mean(power_data[node_id])
-        std = np.std(power_data[node_id])
-        
-        logging.info(f"Average power for NODE {node_id}: {avg} dBm, Std: {std} dBm")
-        with open(CALCULATION_POWER_LOG, 'a') as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - NODE_ID: {node_id} - "
-                   f"Average Power: {avg} dBm, Std: {std} dBm\n")
-        return avg, std
-    return None, None
+    generated = time.time()
+    avg_latency, std_latency = window_stats([latency_data.get(n) for n in node_ids], LATENCY_WINDOW)
+    avg_power, std_power = window_stats([power_data.get(n) for n in node_ids], POWER_WINDOW)
+    log_fleet_stats(node_ids, avg_latency, std_latency, avg_power, std_power)
+    
+    tail_latency = tail_power = None
+    if SWITCHING_STATISTIC == 'quantile':
+        tails = [tail_statistics(n) for n in node_ids]
+        tail_latency = np.array([np.nan if t[0] is None else t[0] for t in tails])
+        tail_power = np.array([np.nan if t[1] is None else t[1] for t in tails])
+    
+    result = evaluate_fleet(avg_latency, std_latency, avg_power, std_power,
+                            tail_latency, tail_power)
+    anomalies = detector.detect(node_ids, avg_latency, avg_power,
+                                [current_interfaces.get(n) for n in node_ids])
+    
+    abnormal_nodes = []
+    for i in action_indices(result['decision']):
+        node_id = node_ids[i]
+        if result['decision'][i] == SWITCH:
+            priority = '1,0' if result['latency_trigger'][i] else '0,1'
+            apply_switching(node_id, 
+                            rule_value(result['latency_value'][i]),
+                            rule_value(result['power_value'][i]),
+                            priority, generated)
+        else:
+            abnormal_nodes.append(node_id)
+    
+    # Out-of-range nodes first, then statistical anomalies by score
+    decisions = result['decision'].copy()
+    positions = {node_id: i for i, node_id in enumerate(node_ids)}
+    for node_id, score in anomalies:
+        i = positions[node_id]
+        if decisions[i] == NO_OP and rx_rule_value(node_id):
+            logging.info(f"NODE {node_id} deviates from its baseline/peers (robust z {score:.1f})")
+            decisions[i] = ABNORMAL
+            abnormal_nodes.append(node_id)
+    
+    for node_id in abnormal_nodes:
+        handle_abnormal_metrics(node_id)
+    
+    return decisions
 
-def should_switch_interface(avg_latency, std_latency, avg_power, std_power):
+def log_fleet_stats(node_ids, avg_latency, std_latency, avg_power, std_power):
     """
-    Determine if interface should be switched based on metrics
+    Write latency and power statistics for a batch of nodes with one
+    write per log file
     """
-    latency_condition = (avg_latency is not None and 
-                         20.0 <= avg_latency <= 60000)
-    power_condition = (avg_power is not None and 
-                       -100 <= avg_power <= -75)
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    latency_lines = [
+        f"{timestamp} - NODE_ID: {node_id} - Average Latency: {avg} ms, Std: {std} ms\n"
+        for node_id, avg, std in zip(node_ids, avg_latency, std_latency) if not np.isnan(avg)
+    ]
+    power_lines = [
+        f"{timestamp} - NODE_ID: {node_id} - Average Power: {avg} dBm, Std: {std} dBm\n"
+        for node_id, avg, std in zip(node_ids, avg_power, std_power) if not np.isnan(avg)
+    ]
     
-    return latency_condition or power_condition
+    if latency_lines:
+        with open(CALCULATION_LATENCY_LOG, 'a') as f:
+            f.writelines(latency_lines)
+    if power_lines:
+        with open(CALCULATION_POWER_LOG, 'a') as f:
+            f.writelines(power_lines)
+    logging.info(f"Analyzed metrics for {len(node_ids)} nodes "
+                 f"({len(latency_lines)} latency, {len(power_lines)} power windows)")
 
-def is_abnormal_metrics(avg_latency, avg_power):
+def tail_statistics(node_id):
     """
-    Check if metrics are abnormal (out of expected ranges)
+    Streaming tail latency and power estimates for a node (None if unknown)
     """
-    latency_abnormal = (avg_latency is not None and 
-                        (avg_latency > 60000 or avg_latency <= 0 or np.isnan(avg_latency)))
-    power_abnormal = (avg_power is not None and 
-                      (avg_power < -100 or avg_power == 0 or np.isnan(avg_power)))
-    
-    return latency_abnormal or power_abnormal
+    latency_estimator = latency_quantiles.get(node_id)
+    power_estimator = power_quantiles.get(node_id)
+    tail_latency = latency_estimator.get(TAIL_LATENCY_QUANTILE) if latency_estimator else None
+    tail_power = power_estimator.get(TAIL_POWER_QUANTILE) if power_estimator else None
+    return tail_latency, tail_power
 
-def trigger_interface_switch(node_id, avg_latency, std_latency, avg_power, std_power):
+def rule_value(value):
     """
-    Trigger interface switching based on metrics
+    Convert a kernel output to a flow rule field ('*' when undefined)
     """
-    if avg_latency is not None:
-        trigger_type = 'latency'
-        priority = '1,0'
-    else:
-        trigger_type = 'power'
-        priority = '0,1'
-    
-    handle_switching(node_id, trigger_type, avg_latency, std_latency, 
-                     avg_power, std_power, priority)
+    return '*' if np.isnan(value) else float(value)
 
 def handle_switching(node_id, trigger_type, avg_latency, std_latency, 
                     avg_power, std_power, priority):
     """
     Handle the interface switching process
     """
-    from data_processor import current_interfaces
+    generated = time.time()
+    latency_bound = avg_latency + 2 * std_latency if avg_latency is not None else None
+    power_bound = avg_power - 2 * std_power if avg_power is not None else None
     
-    current_interface = current_interfaces.get(node_id)
+    # Use streaming tail quantiles instead of avg +/- 2*std when configured
+    if SWITCHING_STATISTIC == 'quantile':
+        tail_latency, tail_power = tail_statistics(node_id)
+        if tail_latency is not None:
+            latency_bound = tail_latency
+        if tail_power is not None:
+            power_bound = tail_power
     
     # Calculate adjusted values based on metrics
     if trigger_type == 'latency':
-        if avg_latency + 2 * std_latency < 30:
-            latency_value = avg_latency + 2 * std_latency
+        if latency_bound < LATENCY_THRESHOLD_CAP:
+            latency_value = latency_bound
         else:
-            latency_value = 30.0
-        power_value = np.interp(avg_power, [-45, -10], [-70, -45])
+            latency_value = LATENCY_THRESHOLD_CAP
+        power_value = np.interp(avg_power, [-45, -10], [-70, -45]) if avg_power is not None else '*'
     else:  # power trigger
-        if avg_power - 2 * std_power > -80:
-            power_value = avg_power - 2 * std_power
+        if power_bound > POWER_THRESHOLD_FLOOR:
+            power_value = power_bound
         else:
-            power_value = -80.0
-        latency_value = np.interp(avg_latency, [5, 20], [20, 25])
+            power_value = POWER_THRESHOLD_FLOOR
+        latency_value = np.interp(avg_latency, [5, 20], [20, 25]) if avg_latency is not None else '*'
+    
+    apply_switching(node_id, latency_value, power_value, priority, generated)
+
+def apply_switching(node_id, latency_value, power_value, priority, generated=None):
+    """
+    Send switching flow rules using already adjusted threshold values;
+    generated is when the decision started, for the switch timing
+    """
+    from data_processor import current_interfaces
+    
+    current_interface = current_interfaces.get(node_id)
+    
+    # Pick the target technology from the link scores
+    target = select_technology(node_id, current_interface)
+    if target is not None and target == current_interface:
+        logging.info(f"Keeping NODE {node_id} on {current_interface}, its link score is still best")
+        return
+    
+    # Only switch to a technology whose cells cover the node; with neither
+    # covering it, fall back to a relay
+    covering = covering_technologies(node_id)
+    if covering is not None:
+        destination = target or ('CV2X' if current_interface == 'ITSG5' else 'ITSG5')
+        if destination not in covering:
+            if current_interface in covering:
+                logging.info(f"Keeping NODE {node_id} on {current_interface}, {destination} does not cover it")
+            else:
+                logging.info(f"NODE {node_id} is outside every technology's coverage, using a relay")
+                handle_abnormal_metrics(node_id)
+            return
+    
+    rule_interface = current_interface
+    if target is not None:
+        rule_interface = 'CV2X' if target == 'ITSG5' else 'ITSG5'
     
     # Send appropriate flow rules
     if not flow_rules.get(node_id):
-        send_flow_rule(node_id, latency_value, power_value, priority, current_interface)
+        send_flow_rule(node_id, latency_value, power_value, priority, rule_interface, generated)
+        record_switch_request(node_id)
     else:
-        itsg5_exists = any(rule['Value'].startswith('ITSG5') for rule in flow_rules[node_id].values())
-        cv2x_exists = any(rule['Value'].startswith('CV2X') for rule in flow_rules[node_id].values())
+        itsg5_exists = flow_rules.has_technology(node_id, 'ITSG5')
+        cv2x_exists = flow_rules.has_technology(node_id, 'CV2X')
         
         if not (itsg5_exists and cv2x_exists):
             if cv2x_exists and current_interface == 'CV2X':
-                send_flow_rule(node_id, latency_value, power_value, priority, 'CV2X')
+                send_flow_rule(node_id, latency_value, power_value, priority, 'CV2X', generated)
+                record_switch_request(node_id)
             elif itsg5_exists and current_interface == 'ITSG5':
-                send_flow_rule(node_id, latency_value, power_value, priority, 'ITSG5')
+                send_flow_rule(node_id, latency_value, power_value, priority, 'ITSG5', generated)
+                record_switch_request(node_id)
 
-def handle_abnormal_metrics(node_id):
+def check_predicted_switch(node_id):
     """
-    Handle cases where metrics are abnormal (out of range)
+    Switch a node ahead of time when its metric trend is predicted to
+    cross a switching threshold within the measured switch duration
     """
-    if len(received_nodes) < 3:
-        logging.warning("Not enough nodes for forwarding, skipping.")
+    from data_processor import window_versions
+    
+    if node_id in switching_nodes:
         return
     
-    third_node = received_nodes[2]
-    if third_node in switching_nodes:
-        logging.info(f"Skipping switching for {third_node}, already in progress.")
+    trigger_type = should_preempt(node_id, window_versions.get(node_id, 0))
+    if trigger_type is None:
         return
     
-    # Find abnormal RX node from latest flow rules
+    latency_values = window_values(node_id, 'Latency')
+    power_values = window_values(node_id, 'Power')
+    avg_latency = np.mean(latency_values) if latency_values else None
+    std_latency = np.std(latency_values) if latency_values else None
+    avg_power = np.mean(power_values) if power_values else None
+    std_power = np.std(power_values) if power_values else None
+    
+    priority = '1,0' if trigger_type == 'latency' else '0,1'
+    logging.info(f"Pre-emptive {trigger_type} switching for NODE {node_id}")
+    handle_switching(node_id, trigger_type, avg_latency, std_latency,
+                     avg_power, std_power, priority)
+
+def handle_scheduled_handover(node_id, target_interface):
+    """
+    Act on a predicted coverage exit of an RX node: move its link to the
+    technology still covering it, or set up a relay when none does
+    """
+    from data_processor import current_interfaces
+    
+    if node_id in switching_nodes or rx_rule_value(node_id) is None:
+        return
+    
+    if target_interface is None:
+        logging.info(f"NODE {node_id} leaves all coverage, setting up a relay ahead of time")
+        handle_abnormal_metrics(node_id)
+        return
+    
+    if current_interfaces.get(node_id) == target_interface:
+        return
+    logging.info(f"Scheduled handover of NODE {node_id} to {target_interface}")
+    rule_interface = 'CV2X' if target_interface == 'ITSG5' else 'ITSG5'
+    send_flow_rule(node_id, '*', '*', '*', rule_interface)
+    record_switch_request(node_id)
+
+def handle_abnormal_metrics(node_id):
+    """
+    Handle cases where metrics are abnormal (out of range or anomalous)
+    """
+    # Prefer the flagged node itself when it is an RX node
     abnormal_rx_node = None
-    switch_value = None
-    for rule in reversed(latest_flow_rules):
-        if "rx" in rule["Value"]:
-            abnormal_rx_node = rule["NODE_ID"]
-            switch_value = rule["Value"]
-            break
+    switch_value = rx_rule_value(node_id)
+    if switch_value:
+        abnormal_rx_node = node_id
+    else:
+        # Find abnormal RX node from latest flow rules
+        for rule in reversed(latest_flow_rules):
+            if "rx" in rule["Value"]:
+                abnormal_rx_node = rule["NODE_ID"]
+                switch_value = rule["Value"]
+                break
     
     if not abnormal_rx_node:
         logging.warning("No rx node found, aborting flow modification.")
         return
     
+    # Pick the relay from the connectivity graph
+    target_technology = 'ITSG5' if 'ITSG5' in switch_value else 'CV2X'
+    path = relay_graph.find_relay_path(abnormal_rx_node, target_technology,
+                                       excluded=switching_nodes)
+    if not path:
+        logging.warning(f"No relay reachable from rx node {abnormal_rx_node}, skipping.")
+        return
+    relay_node, next_hop = path[-1], path[-2]
+    
+    # Register the relay switch before any rule goes out, so a full
+    # orchestrator leaves no relay switched without forwarding
+    switch = None
+    if not flow_rule_exists(relay_node, switch_value):
+        switch = start_relay_switch(relay_node, next_hop)
+        if switch is None:
+            logging.warning(f"Relay {relay_node} not switched for rx node {abnormal_rx_node}, "
+                            f"retrying on its next abnormal window")
+            return
+    
     logging.info(f"Abnormal rx node found: {abnormal_rx_node}, sending initialization flow rule.")
     
     # Reset abnormal node
     if not flow_rule_exists(abnormal_rx_node, "Initialization"):
         send_initialization_flow_rule(abnormal_rx_node)
     
-    # Configure third node as backup
-    if not flow_rule_exists(third_node, switch_value):
-        logging.info(f"Sending switching flow rule to third node {third_node} with Value: {switch_value}")
+    # Configure relay node as backup
+    if switch is not None:
+        logging.info(f"Sending switching flow rule to relay node {relay_node} with Value: {switch_value}")
         
         if "ITSG5" in switch_value:
-            send_itsg5_flow_rule(third_node, switch_value, '*', '*', '*', 'Tech switching')
+            send_itsg5_flow_rule(relay_node, switch_value, '*', '*', '*', 'Tech switching')
         elif "CV2X" in switch_value:
-            send_cv2x_flow_rule(third_node, switch_value, '*', '*', '*', 'Tech switching')
+            send_cv2x_flow_rule(relay_node, switch_value, '*', '*', '*', 'Tech switching')
         
-        switching_nodes.add(third_node)
-        threading.Thread(target=wait_for_interface_update, 
-                        args=(third_node, abnormal_rx_node)).start()
+        relay_switch_sent(switch)
+
+def rx_rule_value(node_id):
+    """
+    Value of the RX switching rule a node holds, if any
+    """
+    for value in ('ITSG5_rx', 'CV2X_rx'):
+        if flow_rules.has_value(node_id, value):
+            return value
+    return None
 
-def wait_for_interface_update(third_node, rx_node):
+def start_relay_switch(relay_node, rx_node):
     """
-    Wait for interface update and complete the switching process
+    Hand the relay setup to the switching orchestrator; it advances when
+    the relay reports the RX node's interface and then its MAC address.
+    Returns None when the orchestrator cannot take the switch.
     """
-    from data_processor import df, latency_data, power_data
+    from data_processor import df
     
     target_interface = df.at[rx_node, 'Current interface'] if rx_node in df.index else '*'
+    switch = orchestrator.start(relay_node, rx_node, target_interface,
+                                on_interface_ready=relay_interface_ready,
+                                on_mac_ready=relay_mac_ready,
+                                on_failure=relay_switch_failed)
+    if switch is not None:
+        switching_nodes.add(relay_node)
+    return switch
+
+def relay_switch_sent(switch):
+    """
+    The relay's switching rule is out; it may already be on the target interface
+    """
+    from data_processor import df
     
-    while True:
-        time.sleep(1)
-        if df.at[third_node, 'Current interface'] == target_interface:
-            complete_switching_process(third_node, rx_node, target_interface)
-            break
+    relay_node = switch.relay_node
+    if relay_node in df.index:
+        orchestrator.notify_interface(relay_node, df.at[relay_node, 'Current interface'])
 
-def complete_switching_process(third_node, rx_node, target_interface):
+def relay_interface_ready(switch):
     """
-    Complete the switching process after interface update
+    Relay is on the target interface: send the client rule and wait for its MAC
     """
-    from data_processor import switching_nodes, received_nodes
+    from data_processor import df
+    
+    relay_node, rx_node = switch.relay_node, switch.rx_node
     
     # Send forwarding rules
-    send_forwarding_rule(third_node, rx_node, target_interface, "C")
+    send_forwarding_rule(relay_node, rx_node, switch.target_interface, "C")
     
     # Clean up data
-    latency_data.clear()
-    power_data.clear()
+    clear_all_metric_windows()
     logging.info("Cleared latency_data and power_data after sending CLIENT.")
     
     # Update node tracking
-    if third_node in switching_nodes:
-        switching_nodes.remove(third_node)
-    received_nodes[2] = rx_node
+    switching_nodes.discard(relay_node)
     
-    # Wait for MAC address before sending GO rule
-    while True:
-        time.sleep(1)
-        if third_node in df.index and pd.notna(df.at[third_node, "Src MAC"]):
-            send_forwarding_rule(rx_node, third_node, target_interface, "GO")
-            break
+    # MAC address may already be known
+    if relay_node in df.index and pd.notna(df.at[relay_node, "Src MAC"]):
+        orchestrator.notify_fields(relay_node, {'Src MAC': df.at[relay_node, "Src MAC"]})
+
+def relay_mac_ready(switch):
+    """
+    Relay MAC is known: send the group owner rule to the RX node
+    """
+    send_forwarding_rule(switch.rx_node, switch.relay_node, switch.target_interface, "GO")
+    logging.info(f"Relay switch {switch.relay_node} -> {switch.rx_node} completed in "
+                 f"{time.time() - switch.started:.2f} s")
+
+def relay_switch_failed(switch):
+    """
+    Release a relay whose switch timed out or was cancelled
+    """
+    switching_nodes.discard(switch.relay_node)
@@ -12,17 +12,15 @@ import os
 
 from config import *
 from data_processor import process_received_data, handle_disabled_flow_rule
-from flow_rule_manager import send_initialization_flow_rule
+from flow_rule_manager import send_initialization_flow_rule, reconcile_rules, repair_rules
+from delivery_tracker import delivery_tracker
+from switch_transactions import transactions
 
 # Initialize logger
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(message)s')
 
 # Global variables needed for MQTT operations
 client = None
-T_r = None
-T_s = None
-T_g = None
-T_b = None
 
 def initialize_mqtt_client():
     """Initialize and configure the MQTT client"""
@@ -30,7 +28,8 @@ def initialize_mqtt_client():
     client = mqtt.Client()
     client.on_connect = on_connect
     client.on_message = on_message
-    client.connect(MQTT_BROKER, MTT_PORT, 60)
+    client.on_publish = on_publish
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
     return client
 
 def on_connect(client, userdata, flags, rc):
@@ -39,15 +38,20 @@ def on_connect(client, userdata, flags, rc):
     client.subscribe(MQTT_TOPIC_DATA, qos=1)
     client.subscribe(MQTT_TOPIC_DISABLE, qos=1)
     client.subscribe(MQTT_TOPIC_RECEIVED, qos=1)
+    client.subscribe(MQTT_TOPIC_DIGEST, qos=1)
     logging.info(f"Subscribed to {MQTT_TOPIC_DATA} and {MQTT_TOPIC_DISABLE}")
+    # paho resends unacknowledged QoS 1 messages under their mids
+    delivery_tracker.reconnected()
+
+def on_publish(client, userdata, mid):
+    """Callback when the broker acknowledged a QoS 1 publish"""
+    delivery_tracker.acknowledge(mid)
 
 def on_message(client, userdata, msg):
     """
     Callback when message is received from MQTT broker
     Handles different message types and routes them appropriately
     """
-    global T_r, T_s, T_g, T_b
-    
     logging.debug(f"Received raw message on topic {msg.topic}: {msg.payload}")
     
     try:
@@ -67,6 +71,13 @@ def on_message(client, userdata, msg):
             handle_received_message(data)
             return
             
+        if msg.topic == MQTT_TOPIC_DIGEST:
+            if 'Digest' in data:
+                reconcile_rules(data['NODE_ID'], data['Digest'])
+            else:
+                repair_rules(data['NODE_ID'], data['Buckets'], data['Rules'])
+            return
+            
         if 'NODE_ID' in data:
             process_received_data(data, msg.topic)
             
@@ -76,54 +87,34 @@ def on_message(client, userdata, msg):
 def handle_received_message(data):
     """
     Special handling for received messages (acknowledgements)
-    Calculates and logs timing metrics
+    Stamps the switch transaction of the acknowledged rule and logs its
+    timing metrics
     """
-    global T_r, T_s, T_g, T_b
-    
     T_b = time.time()
     data["Timestamp"] = T_b
     
     with open(RECEIVED_MESSAGE_LOG, 'a') as f:
         f.write(json.dumps(data) + '\n')
 
-    if all(t is not None for t in [T_r, T_s, T_g, T_b]):
-        calculate_and_log_timing_metrics()
+    transaction = transactions.acknowledge(data['NODE_ID'], data.get('Num'), T_b)
+    if transaction is not None:
+        log_timing_metrics(transaction)
 
-def calculate_and_log_timing_metrics():
+def log_timing_metrics(transaction):
     """
-    Calculate timing metrics between different stages
-    and log them to the testing data file
+    Log the timing metrics of an acknowledged switch to the testing data
+    file (the complete transaction goes to the switch timing log once
+    the node reports its new interface)
     """
-    global T_r, T_s, T_g, T_b
-    
-    controller_delay = T_s - T_r
-    time_to_generate = T_s - T_g
-    time_to_send_fl = (T_b - T_s) / 2
-
-    current_interface = get_current_interface()
-    opposite_interface = get_opposite_interface(current_interface)
+    timings = transaction.timings()
+    current_interface = transaction.source or "Unknown"
+    opposite_interface = transaction.target
 
     with open(TESTING_DATA_LOG, 'a') as f:
-        f.write(f"Controller_Dealy from {current_interface} to {opposite_interface}: {controller_delay * 1000} milliseconds\n")
-        f.write(f"Time_to_generate from {current_interface} to {opposite_interface}: {time_to_generate * 1000} milliseconds\n")
-        f.write(f"Time_to_send_FL from {current_interface} to {opposite_interface}: {time_to_send_fl * 1000} milliseconds\n")
-
-    # Reset timing variables
-    T_r = T_s = T_g = T_b = None
-
-def get_current_interface():
-    """Determine current interface based on flow rules"""
-    # Implementation depends on flow_rule_manager module
-    from flow_rule_manager import get_latest_interface
-    return get_latest_interface()
-
-def get_opposite_interface(current_interface):
-    """Get the opposite interface of the given one"""
-    if current_interface == "ITSG5":
-        return "CV2X"
-    elif current_interface == "CV2X":
-        return "ITSG5"
-    return "Unknown"
+        if timings['Controller delay'] is not None:
+            f.write(f"Controller_Dealy from {current_interface} to {opposite_interface}: {timings['Controller delay']} milliseconds\n")
+        f.write(f"Time_to_generate from {current_interface} to {opposite_interface}: {timings['Time to generate']} milliseconds\n")
+        f.write(f"Time_to_send_FL from {current_interface} to {opposite_interface}: {timings['Time to send FL']} milliseconds\n")
 
 def start_mqtt_loop():
     """Start the MQTT network loop"""
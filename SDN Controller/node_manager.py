@@ -9,52 +9,29 @@ import os
 import pandas as pd
 
 from config import *
-
-def simulate_node_movement():
-    """
-    Continuously simulate node movement within coverage area
-    Updates position and direction for all nodes
-    """
-    while True:
-        update_node_positions()
-        time.sleep(1)  # Update every second
-
-def update_node_positions():
-    """
-    Update position and direction for all nodes based on their speed
-    """
-    from data_processor import speed_data
-    
-    for node_id in list(speed_data.keys()):
-        speed = speed_data[node_id]['speed']
-        position = speed_data[node_id]['position']
-        direction = speed_data[node_id]['direction']
-        
-        # Calculate new position (speed in km/h converted to m/s)
-        new_position = position + direction * (speed * 1000 / 3600)
-        
-        # Reverse direction if boundary reached
-        if new_position >= COVERAGE or new_position <= 0:
-            speed_data[node_id]['direction'] *= -1
-            new_position = max(0, min(COVERAGE, new_position))
-        
-        speed_data[node_id]['position'] = new_position
-        
-        # Log position update
-        logging.debug(f"Node {node_id} moved to position {new_position:.2f}m "
-                     f"(speed: {speed}km/h, direction: {'+' if direction > 0 else '-'})")
+import relay_graph
+import congestion_control
+from link_scoring import clear_link_scores
+from link_adaptation import clear_link_adaptation
+from match_cache import match_cache
+from handover_scheduler import scheduler, plan_handover
+from switching_orchestrator import orchestrator
 
 def log_realtime_rules():
     """
     Continuously log current flow rules to file
     """
-    from flow_rule_manager import flow_rules
+    from flow_rule_manager import flow_rules, flow_rules_lock, rule_expiry, delivery_tracker
     
     while True:
+        with flow_rules_lock:
+            snapshot = {node_id: dict(rules) for node_id, rules in flow_rules.items()}
         with open(REALTIME_RULE_LOG, 'a') as f:
             f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Current Flow Rules:\n")
-            for node_id, rules in flow_rules.items():
-                f.write(f"  Node {node_id}:\n")
+            f.write(f"  Expiry: {rule_expiry.stats()}\n")
+            f.write(f"  Delivery: {delivery_tracker.stats()}\n")
+            for node_id, rules in snapshot.items():
+                f.write(f"  Node {node_id}: delivery latency {delivery_tracker.histogram(node_id)}\n")
                 for rule_num, rule in rules.items():
                     f.write(f"    {rule_num}: {rule}\n")
             f.write("\n")
@@ -66,16 +43,19 @@ def initialize_node(node_id, initial_speed=DEFAULT_SPEED):
     """
     from data_processor import speed_data
     
+    # Anchored now; the position follows in closed form from speed and direction
     speed_data[node_id] = {
         'speed': initial_speed,
         'position': 0,  # Starting position in meters
         'direction': 1   # 1 for moving forward, -1 for backward
     }
+    relay_graph.update_node(node_id, position=0)
+    plan_handover(node_id)
     logging.info(f"Initialized node {node_id} with speed {initial_speed} km/h")
 
 def get_node_position(node_id):
     """
-    Get current position of a node
+    Get current position of a node, evaluated at the time of the call
     """
     from data_processor import speed_data
     return speed_data.get(node_id, {}).get('position', 0)
@@ -94,6 +74,7 @@ def set_node_speed(node_id, new_speed):
     from data_processor import speed_data
     if node_id in speed_data:
         speed_data[node_id]['speed'] = new_speed
+        plan_handover(node_id)
         logging.info(f"Updated node {node_id} speed to {new_speed} km/h")
     else:
         logging.warning(f"Attempted to set speed for unknown node {node_id}")
@@ -105,14 +86,55 @@ def reverse_node_direction(node_id):
     from data_processor import speed_data
     if node_id in speed_data:
         speed_data[node_id]['direction'] *= -1
+        plan_handover(node_id)
         logging.info(f"Reversed direction for node {node_id}")
     else:
         logging.warning(f"Attempted to reverse direction for unknown node {node_id}")
 
+def remove_node(node_id):
+    """
+    Forget a node that left, in every module keeping state for it
+    """
+    from flow_rule_manager import remove_node_rules
+    from data_processor import forget_node, tx_rx_mapping
+    
+    remove_node_rules(node_id)
+    forget_node(node_id)
+    tx_rx_mapping.remove_node(node_id)
+    match_cache.remove_node(node_id)
+    relay_graph.remove_node(node_id)
+    congestion_control.remove_node(node_id)
+    clear_link_scores(node_id)
+    clear_link_adaptation(node_id)
+    scheduler.cancel(node_id)
+    orchestrator.cancel(node_id)
+    logging.info(f"Removed node {node_id}")
+
+def remove_inactive_nodes():
+    """
+    Periodically remove nodes that stopped sending data
+    """
+    from data_processor import inactive_nodes
+    
+    while True:
+        for node_id in inactive_nodes():
+            remove_node(node_id)
+        time.sleep(NODE_SWEEP_INTERVAL)
+
 def start_node_management_threads():
     """
     Start all node management related threads
     """
-    threading.Thread(target=simulate_node_movement, daemon=True).start()
     threading.Thread(target=log_realtime_rules, daemon=True).start()
+    threading.Thread(target=remove_inactive_nodes, daemon=True).start()
+    
+    from metrics_monitor import handle_scheduled_handover
+    scheduler.start(handle_scheduled_handover)
+    
+    from flow_rule_manager import rule_expiry, delete_flow_rule, delivery_tracker, republish
+    rule_expiry.start(delete_flow_rule)
+    delivery_tracker.start(republish)
+    
+    from switch_transactions import transactions
+    transactions.start()
     logging.info("Started node management threads")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Pairing Registry - TX to RX node pairing with forward and reverse indexes
+
+from collections.abc import MutableMapping
+
+class PairingRegistry(MutableMapping):
+    """
+    Which RX node each TX node sends to ({tx_node: rx_node}), plus the
+    reverse index {rx_node: TX nodes in pairing order}, so finding the TX
+    nodes of an RX node never scans the whole mapping
+    """
+    def __init__(self):
+        self.rx_of = {}  # {tx_node: rx_node}
+        self.tx_of = {}  # {rx_node: {tx_node: None}}
+
+    def __getitem__(self, tx_node):
+        return self.rx_of[tx_node]
+
+    def __setitem__(self, tx_node, rx_node):
+        previous = self.rx_of.get(tx_node)
+        if previous == rx_node:
+            return
+        if previous is not None:
+            self._unlink(tx_node, previous)
+        self.rx_of[tx_node] = rx_node
+        self.tx_of.setdefault(rx_node, {})[tx_node] = None
+
+    def __delitem__(self, tx_node):
+        self._unlink(tx_node, self.rx_of.pop(tx_node))
+
+    def _unlink(self, tx_node, rx_node):
+        senders = self.tx_of[rx_node]
+        del senders[tx_node]
+        if not senders:
+            del self.tx_of[rx_node]
+
+    def __iter__(self):
+        return iter(list(self.rx_of))
+
+    def __len__(self):
+        return len(self.rx_of)
+
+    def __contains__(self, tx_node):
+        return tx_node in self.rx_of
+
+    def tx_nodes(self, rx_node):
+        """
+        TX nodes paired with an RX node, in the order they were paired
+        """
+        return list(self.tx_of.get(rx_node, ()))
+
+    def is_rx(self, node_id):
+        return node_id in self.tx_of
+
+    def remove_node(self, node_id):
+        """
+        Drop a node from both sides of the pairing
+        """
+        self.pop(node_id, None)
+        for tx_node in self.tx_nodes(node_id):
+            del self[tx_node]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# Quantile Estimator - constant-memory streaming quantiles (P-square algorithm)
+
+class P2Quantile:
+    """
+    Streaming estimate of a single quantile using the P-square algorithm
+    (Jain & Chlamtac). Keeps five markers regardless of sample count.
+    """
+    __slots__ = ('p', 'count', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        """Add one sample to the estimate"""
+        q = self.heights
+        if self.count < 5:
+            q.append(x)
+            self.count += 1
+            if self.count == 5:
+                q.sort()
+            return
+
+        self.count += 1
+        n = self.positions
+
+        # Find the cell containing x and adjust extreme markers
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Adjust the three middle markers if they drifted from their desired positions
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q = self.heights
+        n = self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        """Current estimate, None before the first sample"""
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            ordered = sorted(self.heights)
+            return ordered[min(int(round(self.p * (self.count - 1))), self.count - 1)]
+        return self.heights[2]
+
+class StreamingQuantiles:
+    """
+    Fixed set of streaming quantile estimators for one metric of one node
+    """
+    __slots__ = ('estimators',)
+
+    def __init__(self, quantiles):
+        self.estimators = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x):
+        for estimator in self.estimators.values():
+            estimator.add(x)
+
+    def get(self, p):
+        estimator = self.estimators.get(p)
+        return estimator.value() if estimator else None
+
+    @property
+    def count(self):
+        return next(iter(self.estimators.values())).count if self.estimators else 0
+
+    def snapshot(self):
+        """Current estimates keyed as 'p50', 'p95', ..."""
+        return {f"p{p * 100:g}": est.value() for p, est in self.estimators.items()}
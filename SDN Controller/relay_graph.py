@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# Relay Graph - incremental connectivity graph and best-path relay selection
+
+import heapq
+import logging
+import threading
+
+from config import *
+import spatial_index
+from spatial_index import track_index, nodes_within
+
+# Global data structures
+graph_nodes = {}  # {node_id: {'position': meters along track, 'interface': str}}
+adjacency = {}  # {node_id: {neighbour_id: edge cost}}
+graph_lock = threading.RLock()  # ingest and relay queries from the monitor and scheduler threads share the graph
+
+def update_node(node_id, position=None, interface=None):
+    """
+    Add or update a node; only its own edges are recomputed
+    """
+    with graph_lock:
+        node = graph_nodes.get(node_id)
+        if node is None:
+            node = graph_nodes[node_id] = {'position': None, 'interface': '*'}
+            adjacency[node_id] = {}
+
+        if interface is not None:
+            node['interface'] = interface
+        if position is None or position == node['position']:
+            return
+        _connect(node_id, position)
+
+def refresh_edges(node_id):
+    """
+    Recompute a node's edges after it reported a new road position
+    """
+    with graph_lock:
+        if node_id in graph_nodes:
+            _connect(node_id)
+
+def _connect(node_id, position=None):
+    # Simulated nodes are placed at their closed-form track position first
+    if position is None:
+        position = simulated_position(node_id)
+    if position is not None:
+        graph_nodes[node_id]['position'] = position
+        track_index.update(node_id, position)
+    _detach(node_id)
+    for neighbour_id, distance in nodes_within(node_id, RELAY_RANGE):
+        if neighbour_id not in adjacency:
+            continue
+        cost = distance / RELAY_RANGE
+        adjacency[node_id][neighbour_id] = cost
+        adjacency[neighbour_id][node_id] = cost
+
+def remove_node(node_id):
+    """
+    Drop a node and its edges from the graph
+    """
+    with graph_lock:
+        if node_id not in graph_nodes:
+            return
+        _detach(node_id)
+        spatial_index.remove_node(node_id)
+        del graph_nodes[node_id]
+        del adjacency[node_id]
+
+def _detach(node_id):
+    for neighbour_id in adjacency[node_id]:
+        adjacency[neighbour_id].pop(node_id, None)
+    adjacency[node_id] = {}
+
+def relay_cost(node_id, target_interface):
+    """
+    Cost of using a node as the relay endpoint: poor link quality and
+    the need to switch technology both make a node less attractive
+    """
+    from link_scoring import link_score
+
+    interface = graph_nodes[node_id]['interface']
+    score = link_score(node_id, target_interface)
+    cost = 1.0 - (RELAY_UNKNOWN_SCORE if score is None else score)
+    if interface != target_interface:
+        cost += RELAY_SWITCH_PENALTY
+    return cost
+
+def simulated_position(node_id):
+    """
+    Closed-form track position of a simulated node now (None if not simulated)
+    """
+    from data_processor import speed_data
+
+    return speed_data[node_id]['position'] if node_id in speed_data else None
+
+def sync_around(node_id, radius):
+    """
+    Move the simulated nodes a search from node_id can reach to their
+    closed-form positions now: those within radius of it now, and those
+    an earlier query left indexed there. Positions come from one
+    vectorized evaluation; only the edges of these nodes are rebuilt.
+    """
+    from data_processor import speed_data
+
+    with graph_lock:
+        center = simulated_position(node_id)
+        if center is None:
+            center = graph_nodes[node_id]['position']
+        if center is None:
+            return
+        positions = dict(speed_data.near(center, radius))
+        for other_id, _ in track_index.within(center, radius):
+            if other_id not in positions and other_id in speed_data:
+                positions[other_id] = simulated_position(other_id)
+        for other_id, position in positions.items():
+            if other_id in graph_nodes and position != graph_nodes[other_id]['position']:
+                _connect(other_id, position)
+
+def find_relay_path(rx_node, target_interface, excluded=(), max_hops=RELAY_MAX_HOPS):
+    """
+    Cheapest path from the failing RX node to a relay candidate.
+    Path cost is the sum of edge costs plus the relay's own cost.
+    Labels are kept per (node, hops), so a cheap path that used up the
+    hop budget does not hide a costlier one with hops to spare.
+    Returns [rx_node, ..., relay] or None.
+    """
+    with graph_lock:
+        if rx_node not in adjacency:
+            return None
+        # Every node of a path is within max_hops ranges of the RX node
+        sync_around(rx_node, max_hops * RELAY_RANGE)
+
+        start = (rx_node, 0)
+        distances = {start: 0.0}
+        previous = {}
+        settled = {}  # {node_id: fewest hops of a label popped so far}
+        heap = [(0.0, 0, rx_node)]
+        best_cost, best_label = float('inf'), None
+
+        while heap:
+            distance, hops, node_id = heapq.heappop(heap)
+            if distance > distances.get((node_id, hops), float('inf')):
+                continue
+            # Relay costs are non-negative, nothing further away can win
+            if distance >= best_cost:
+                break
+            # A label popped earlier was as cheap and needed no more hops
+            if settled.get(node_id, max_hops + 1) <= hops:
+                continue
+            first_visit = node_id not in settled
+            settled[node_id] = hops
+
+            if first_visit and node_id != rx_node and node_id not in excluded:
+                cost = distance + relay_cost(node_id, target_interface)
+                if cost < best_cost:
+                    best_cost, best_label = cost, (node_id, hops)
+
+            if hops >= max_hops:
+                continue
+            for neighbour_id, edge_cost in adjacency[node_id].items():
+                candidate = distance + edge_cost
+                label = (neighbour_id, hops + 1)
+                if candidate < distances.get(label, float('inf')) \
+                        and settled.get(neighbour_id, max_hops + 1) > hops + 1:
+                    distances[label] = candidate
+                    previous[label] = (node_id, hops)
+                    heapq.heappush(heap, (candidate, hops + 1, neighbour_id))
+
+    if best_label is None:
+        return None
+
+    labels = [best_label]
+    while labels[-1] != start:
+        labels.append(previous[labels[-1]])
+    path = [node_id for node_id, _ in reversed(labels)]
+    logging.info(f"Relay path for rx {rx_node}: {' -> '.join(path)} (cost {best_cost:.2f})")
+    return path
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# Rule Digest - per-bucket hashes of a node's rule set, compared to find where controller and node drifted apart
+
+import zlib
+
+from config import *
+
+def bucket_of(num):
+    """
+    Digest bucket of a rule Num (the same on the controller and the node)
+    """
+    return zlib.crc32(str(num).encode()) % RULE_DIGEST_BUCKETS
+
+def rule_hash(num, version):
+    return zlib.crc32(f"{num}:{version}".encode())
+
+def rule_digest(rules):
+    """
+    {bucket: XOR of the hashes of its (Num, Version) pairs}; empty buckets
+    are left out so the digest of a small rule set stays small
+    """
+    digest = {}
+    for num, version in rules:
+        bucket = bucket_of(num)
+        digest[bucket] = digest.get(bucket, 0) ^ rule_hash(num, version)
+    return {bucket: value for bucket, value in digest.items() if value}
+
+def drifted_buckets(local, remote):
+    """
+    Buckets whose hashes differ between two digests
+    """
+    return sorted(bucket for bucket in set(local) | set(remote) if local.get(bucket, 0) != remote.get(bucket, 0))
+
+def rule_differences(local, remote):
+    """
+    (Nums to send, Nums to drop) turning the remote {Num: Version} of some
+    buckets into the local one: rules the remote side lacks or holds at
+    another Version are sent, rules the local side lacks or holds at another
+    Version are dropped first
+    """
+    send = sorted(num for num, version in local.items() if remote.get(num) != version)
+    drop = sorted(num for num, version in remote.items() if local.get(num) != version)
+    return send, drop
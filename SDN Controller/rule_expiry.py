@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Rule Expiry - controller-side flow rule timeouts on a timer wheel, confirmed by the nodes' disable messages
+
+import math
+import time
+import heapq
+import numbers
+import logging
+import itertools
+import threading
+from collections import deque
+
+from config import *
+
+class RuleExpiry:
+    """
+    Deadline of every stored rule on a timer wheel, so the controller
+    drops rules on its own when their Timeout passes instead of waiting
+    for the node's disable message. Deadlines are rounded up to slots of
+    RULE_EXPIRY_RESOLUTION seconds and only the slot numbers are kept in a
+    min-heap: scheduling appends to a slot, expiry pops whole slots.
+    Rescheduling or cancelling a rule leaves its old entry behind as
+    stale; stale entries are skipped when their slot comes up and the
+    slots are rebuilt once they outnumber the live ones.
+
+    Disable messages then act as confirmations. Counters tell rules the
+    controller expired first (later confirmed or not) from rules the node
+    reported before their local deadline.
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.slots = {}  # {slot: [(seq, node_id, num)]}
+        self.slot_heap = []  # slots that hold entries
+        self.entries = 0  # entries across all slots, stale ones included
+        self.live = {}  # {(node_id, num): seq of its current wheel entry}
+        self.awaiting = {}  # {(node_id, num): local expiry time}
+        self.expiry_order = deque()  # [(local expiry time, (node_id, num))], oldest first
+        self.sequence = itertools.count()
+        self.counts = dict.fromkeys(('expired locally', 'confirmed', 'unconfirmed',
+                                     'reported early', 'unknown'), 0)
+        self.worker = None
+        self.on_expire = None
+
+    def schedule(self, node_id, num, timeout, now=None):
+        """
+        (Re)start a rule's timeout; non-numeric timeouts never expire
+        """
+        if not isinstance(timeout, numbers.Real):
+            self.cancel(node_id, num)
+            return
+        now = self.clock() if now is None else now
+        with self.condition:
+            seq = next(self.sequence)
+            self.live[(node_id, num)] = seq
+            self.awaiting.pop((node_id, num), None)
+            slot = math.ceil((now + timeout) / RULE_EXPIRY_RESOLUTION)
+            entries = self.slots.get(slot)
+            if entries is None:
+                entries = self.slots[slot] = []
+                heapq.heappush(self.slot_heap, slot)
+            entries.append((seq, node_id, num))
+            self.entries += 1
+            self._compact()
+            self.condition.notify_all()
+
+    def cancel(self, node_id, num):
+        """
+        Forget a rule's deadline (deleted or replaced)
+        """
+        with self.condition:
+            self.live.pop((node_id, num), None)
+
+    def _compact(self):
+        if self.entries <= 2 * len(self.live) + 64:
+            return
+        for slot, entries in list(self.slots.items()):
+            entries[:] = [entry for entry in entries if self.live.get((entry[1], entry[2])) == entry[0]]
+            if not entries:
+                del self.slots[slot]
+        self.slot_heap = list(self.slots)
+        heapq.heapify(self.slot_heap)
+        self.entries = sum(len(entries) for entries in self.slots.values())
+
+    def next_deadline(self):
+        return self.slot_heap[0] * RULE_EXPIRY_RESOLUTION if self.slot_heap else None
+
+    def due(self, now=None):
+        """
+        Pop the rules whose deadline has passed: [(node_id, num)]
+        """
+        now = self.clock() if now is None else now
+        expired = []
+        with self.condition:
+            while self.slot_heap and self.slot_heap[0] * RULE_EXPIRY_RESOLUTION <= now:
+                entries = self.slots.pop(heapq.heappop(self.slot_heap))
+                self.entries -= len(entries)
+                for seq, node_id, num in entries:
+                    if self.live.get((node_id, num)) != seq:
+                        continue
+                    del self.live[(node_id, num)]
+                    self.awaiting[(node_id, num)] = now
+                    self.expiry_order.append((now, (node_id, num)))
+                    expired.append((node_id, num))
+            self.counts['expired locally'] += len(expired)
+
+            # Expiries the node never confirmed within the window
+            while self.expiry_order and now - self.expiry_order[0][0] >= RULE_CONFIRM_WINDOW:
+                expired_at, key = self.expiry_order.popleft()
+                if self.awaiting.get(key) == expired_at:
+                    del self.awaiting[key]
+                    self.counts['unconfirmed'] += 1
+        return expired
+
+    def confirm(self, node_id, num):
+        """
+        Account for a node's disable message; returns how it relates to
+        the local deadline ('confirmed', 'reported early' or 'unknown')
+        """
+        with self.condition:
+            if self.awaiting.pop((node_id, num), None) is not None:
+                outcome = 'confirmed'
+            elif (node_id, num) in self.live:
+                outcome = 'reported early'
+            else:
+                outcome = 'unknown'
+            self.counts[outcome] += 1
+        return outcome
+
+    def stats(self):
+        with self.condition:
+            return {**self.counts, 'pending': len(self.live), 'awaiting confirmation': len(self.awaiting)}
+
+    def start(self, on_expire):
+        """
+        Run a single thread that sleeps until the next deadline and calls
+        on_expire(node_id, num) for each expired rule; on_expire runs on
+        that thread and has to take the lock of the table it changes
+        """
+        self.on_expire = on_expire
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.slot_heap and not self.awaiting:
+                    self.condition.wait()
+                deadline = self.next_deadline()
+                delay = deadline - self.clock() if deadline is not None else RULE_CONFIRM_WINDOW
+                if delay > 0:
+                    self.condition.wait(min(delay, RULE_CONFIRM_WINDOW))
+            expired = self.due()
+            for node_id, num in expired:
+                self.on_expire(node_id, num)
+            if expired:
+                logging.info(f"Expired {len(expired)} flow rules locally: {self.stats()}")
+
+rule_expiry = RuleExpiry()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Rule Groups - nodes grouped by segment so shared rules are published once per group
+
+import math
+
+from config import *
+import spatial_index
+
+def segment_group(node_id):
+    """
+    Group id of the road square or track segment (RULE_GROUP_SEGMENT
+    meters) a node is in, None if its position is unknown
+    """
+    from data_processor import speed_data
+
+    if node_id in spatial_index.road_index.positions:
+        x, y, _ = spatial_index.road_index.positions[node_id]
+        return f"seg_{math.floor(x / RULE_GROUP_SEGMENT)}_{math.floor(y / RULE_GROUP_SEGMENT)}"
+    if node_id in speed_data:
+        return f"seg_{math.floor(speed_data[node_id]['position'] / RULE_GROUP_SEGMENT)}"
+    return None
+
+def group_topic(gid):
+    return f"{MQTT_TOPIC_GROUP}/{gid}"
+
+class RuleGroups:
+    """
+    Group membership of nodes. Each node belongs to at most one group and
+    subscribes to its topic; the last rule published to a group is kept so
+    nodes that join later can be accounted for.
+    """
+    def __init__(self):
+        self.group_of = {}  # {node_id: gid}
+        self.members = {}  # {gid: {node_id: None}}
+        self.retained = {}  # {gid: rule last published to the group}
+
+    def assign(self, node_id, gid):
+        """
+        Move a node into a group; returns the gid it left empty, if any
+        """
+        previous = self.group_of.get(node_id)
+        if previous == gid:
+            return None
+        emptied = self._leave(node_id, previous) if previous is not None else None
+        self.group_of[node_id] = gid
+        self.members.setdefault(gid, {})[node_id] = None
+        return emptied
+
+    def remove_node(self, node_id):
+        """
+        Drop a node; returns the gid it left empty, if any
+        """
+        previous = self.group_of.pop(node_id, None)
+        return self._leave(node_id, previous) if previous is not None else None
+
+    def _leave(self, node_id, gid):
+        self.group_of.pop(node_id, None)
+        members = self.members[gid]
+        del members[node_id]
+        if members:
+            return None
+        del self.members[gid]
+        self.retained.pop(gid, None)
+        return gid
+
+    def partition(self, node_ids):
+        """
+        ({gid: [members among node_ids]}, [nodes without a group])
+        """
+        groups, ungrouped = {}, []
+        for node_id in node_ids:
+            gid = self.group_of.get(node_id)
+            if gid is None:
+                ungrouped.append(node_id)
+            else:
+                groups.setdefault(gid, []).append(node_id)
+        return groups, ungrouped
+
+rule_groups = RuleGroups()
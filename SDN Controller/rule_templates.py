@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Rule Templates - flow rules serialized from shared pre-encoded parts plus per-node fields, and rule patches
+
+import json
+from collections.abc import Mapping
+
+class TemplatedRule(Mapping):
+    """
+    Read-only flow rule: the per-node fields plus references to the parts
+    shared with every other rule of the same template
+    """
+    __slots__ = ('template', 'num', 'version', 'match', 'extras', 'timeout')
+
+    def __init__(self, template, num, version, match, extras, timeout):
+        self.template = template
+        self.num = num
+        self.version = version
+        self.match = match
+        self.extras = extras
+        self.timeout = timeout
+
+    def __getitem__(self, key):
+        if key == 'Num':
+            return self.num
+        if key == 'Version':
+            return self.version
+        if key == 'match':
+            return self.match
+        if key == 'Counter':
+            return 0
+        if key == 'Timeout':
+            return self.timeout
+        if key in self.template.shared:
+            return self.template.shared[key]
+        return self.extras[key]
+
+    def __iter__(self):
+        yield 'Num'
+        yield 'Version'
+        yield 'match'
+        yield from self.template.shared
+        yield from self.extras
+        yield 'Counter'
+        yield 'Timeout'
+
+    def __len__(self):
+        return 5 + len(self.template.shared) + len(self.extras)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class RuleTemplate:
+    """
+    Fields shared by a batch of rules (Command type, Value, thresholds,
+    priority) encoded once. Per-node extras such as rate hints and TX
+    profiles are encoded once per distinct value.
+    """
+    def __init__(self, **shared):
+        self.shared = shared
+        self.shared_json = json.dumps(shared)[1:-1]
+        self.extras_json = {}  # {id(extras): (extras, encoded)}
+
+    def _encode_extras(self, extras):
+        # Keep the extras alive with their encoding so the id stays unique
+        cached = self.extras_json.get(id(extras))
+        if cached is None or cached[0] is not extras:
+            cached = self.extras_json[id(extras)] = (extras, json.dumps(extras)[1:-1] if extras else '')
+        return cached[1]
+
+    def render(self, num, match_json, match, timeout, extras=None, version=1):
+        """
+        (rule, payload bytes) for one node; match_json is the node's
+        already encoded match dictionary
+        """
+        extras = extras if extras is not None else {}
+        extras_json = self._encode_extras(extras)
+        payload = (f'{{"Num": "{num}", "Version": {version}, "match": {match_json}, {self.shared_json}, '
+                   f'{extras_json}{", " if extras_json else ""}"Counter": 0, "Timeout": {json.dumps(timeout)}}}')
+        return TemplatedRule(self, num, version, match, extras, timeout), payload.encode()
+
+def rule_patch(node_id, previous, flow_rule):
+    """
+    Patch message turning a node's previous rule into flow_rule (same Num,
+    newer Version): only the changed fields, plus the Timeout so the node
+    restarts it
+    """
+    changes = {key: value for key, value in flow_rule.items()
+               if key not in ('Num', 'Version', 'Counter') and previous.get(key) != value}
+    changes['Timeout'] = flow_rule['Timeout']
+    return {'NODE_ID': node_id, 'Num': flow_rule['Num'], 'Version': flow_rule['Version'], 'Patch': changes}
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# Spatial Index - neighbour queries over node positions (track and road grid)
+
+import math
+import bisect
+import heapq
+
+from config import *
+
+class TrackIndex:
+    """
+    Sorted 1-D index of positions along the track (meters)
+    """
+    def __init__(self):
+        self.entries = []  # [(position, node_id)] sorted
+        self.positions = {}  # {node_id: position}
+
+    def update(self, node_id, position):
+        """Insert or move a node"""
+        old = self.positions.get(node_id)
+        if old == position:
+            return
+        if old is not None:
+            self._discard(old, node_id)
+        self.positions[node_id] = position
+        bisect.insort(self.entries, (position, node_id))
+
+    def remove(self, node_id):
+        old = self.positions.pop(node_id, None)
+        if old is not None:
+            self._discard(old, node_id)
+
+    def _discard(self, position, node_id):
+        index = bisect.bisect_left(self.entries, (position, node_id))
+        if index < len(self.entries) and self.entries[index] == (position, node_id):
+            del self.entries[index]
+
+    def within(self, position, radius):
+        """(node_id, distance) pairs within radius of position"""
+        entries = self.entries
+        index = bisect.bisect_left(entries, (position - radius, ''))
+        result = []
+        while index < len(entries) and entries[index][0] <= position + radius:
+            other_position, other_id = entries[index]
+            result.append((other_id, abs(other_position - position)))
+            index += 1
+        return result
+
+    def nearest(self, position, k, exclude=()):
+        """Up to k (node_id, distance) pairs closest to position, skipping excluded nodes"""
+        right = bisect.bisect_left(self.entries, (position, ''))
+        left = right - 1
+        result = []
+        while len(result) < k and (left >= 0 or right < len(self.entries)):
+            left_distance = position - self.entries[left][0] if left >= 0 else float('inf')
+            right_distance = self.entries[right][0] - position if right < len(self.entries) else float('inf')
+            if left_distance <= right_distance:
+                node_id, distance = self.entries[left][1], left_distance
+                left -= 1
+            else:
+                node_id, distance = self.entries[right][1], right_distance
+                right += 1
+            if node_id not in exclude:
+                result.append((node_id, distance))
+        return result
+
+class GridIndex:
+    """
+    Uniform 2-D grid over projected positions (meters) for road segments
+    """
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # {(cx, cy): set of node_ids}
+        self.positions = {}  # {node_id: (x, y, cell)}
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def update(self, node_id, x, y):
+        """Insert or move a node; only touches the grid if its cell changed"""
+        cell = self._cell(x, y)
+        old = self.positions.get(node_id)
+        if old is not None and old[2] != cell:
+            self._discard(node_id, old[2])
+        if old is None or old[2] != cell:
+            self.cells.setdefault(cell, set()).add(node_id)
+        self.positions[node_id] = (x, y, cell)
+
+    def remove(self, node_id):
+        old = self.positions.pop(node_id, None)
+        if old is not None:
+            self._discard(node_id, old[2])
+
+    def _discard(self, node_id, cell):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(node_id)
+            if not members:
+                del self.cells[cell]
+
+    def within(self, x, y, radius):
+        """(node_id, distance) pairs within radius of (x, y)"""
+        cx0, cy0 = self._cell(x - radius, y - radius)
+        cx1, cy1 = self._cell(x + radius, y + radius)
+        result = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for node_id in self.cells.get((cx, cy), ()):
+                    nx, ny, _ = self.positions[node_id]
+                    distance = math.hypot(nx - x, ny - y)
+                    if distance <= radius:
+                        result.append((node_id, distance))
+        return result
+
+    def nearest(self, x, y, k, exclude=()):
+        """Up to k (node_id, distance) pairs closest to (x, y), searched ring by ring"""
+        cx, cy = self._cell(x, y)
+        candidates = []
+        seen = 0
+        ring = 0
+        total = len(self.positions)
+        while seen < total:
+            for cell in self._ring(cx, cy, ring):
+                for node_id in self.cells.get(cell, ()):
+                    seen += 1
+                    if node_id in exclude:
+                        continue
+                    nx, ny, _ = self.positions[node_id]
+                    candidates.append((math.hypot(nx - x, ny - y), node_id))
+            # Cells outside this ring are at least ring * cell_size away
+            if len(candidates) >= k:
+                kth = heapq.nsmallest(k, candidates)[-1][0]
+                if kth <= ring * self.cell_size:
+                    break
+            ring += 1
+        return [(node_id, distance) for distance, node_id in heapq.nsmallest(k, candidates)]
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+# Shared indexes
+track_index = TrackIndex()
+road_index = GridIndex()
+map_origin = MAP_ORIGIN
+
+def project_position(raw):
+    """
+    Convert a reported 'lat,lon' Position string to local meters
+    (equirectangular projection around the map origin)
+    """
+    global map_origin
+    try:
+        lat, lon = (float(v) for v in str(raw).split(',')[:2])
+    except ValueError:
+        return None
+    if map_origin is None:
+        map_origin = (lat, lon)
+    lat0, lon0 = map_origin
+    x = math.radians(lon - lon0) * EARTH_RADIUS * math.cos(math.radians(lat0))
+    y = math.radians(lat - lat0) * EARTH_RADIUS
+    return x, y
+
+def update_reported_position(node_id, raw):
+    """
+    Index a Position reported in telemetry
+    """
+    projected = project_position(raw)
+    if projected is not None:
+        road_index.update(node_id, *projected)
+    return projected
+
+def remove_node(node_id):
+    track_index.remove(node_id)
+    road_index.remove(node_id)
+
+def nodes_within(node_id, radius):
+    """
+    Neighbours of a node within radius meters. Two nodes that both report
+    road positions are compared on the road grid, any other pair on the
+    track, so A sees B exactly when B sees A.
+    """
+    neighbours = {}
+    if node_id in road_index.positions:
+        x, y, _ = road_index.positions[node_id]
+        neighbours.update(road_index.within(x, y, radius))
+    if node_id in track_index.positions:
+        on_road = node_id in road_index.positions
+        for other_id, distance in track_index.within(track_index.positions[node_id], radius):
+            if not (on_road and other_id in road_index.positions):
+                neighbours[other_id] = distance
+    neighbours.pop(node_id, None)
+    return list(neighbours.items())
+
+def nearest_nodes(node_id, k):
+    """
+    The k nodes closest to a node, each pair compared in the same frame as
+    nodes_within
+    """
+    candidates = []
+    if node_id in road_index.positions:
+        x, y, _ = road_index.positions[node_id]
+        candidates += road_index.nearest(x, y, k, exclude=(node_id,))
+        exclude = road_index.positions
+    else:
+        exclude = (node_id,)
+    if node_id in track_index.positions:
+        candidates += track_index.nearest(track_index.positions[node_id], k, exclude=exclude)
+    return sorted(candidates, key=lambda pair: pair[1])[:k]
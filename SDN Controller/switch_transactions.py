@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Switch Transactions - per-switch timing keyed by (rule Num, NODE_ID) instead of global T_r/T_s/T_g/T_b
+
+import json
+import time
+import threading
+
+from config import *
+
+class SwitchTransaction:
+    """
+    Timestamps of one switch: the latest data from the node before the
+    decision (received), decision start (generated), switching rules
+    ready to go out (sent), the node's Received ACK (acked) and the node
+    reporting the new interface (executed)
+    """
+    __slots__ = ('num', 'node_id', 'source', 'target', 'received', 'generated', 'sent', 'acked', 'executed')
+
+    def __init__(self, num, node_id, source, target, received, generated, sent):
+        self.num = num
+        self.node_id = node_id
+        self.source = source
+        self.target = target
+        self.received = received
+        self.generated = generated
+        self.sent = sent
+        self.acked = None
+        self.executed = None
+
+    def timings(self):
+        """
+        Stage durations in milliseconds, None where a timestamp is missing
+        """
+        def span(start, end, scale=1.0):
+            return round((end - start) * 1000 * scale, 3) if start is not None and end is not None else None
+        return {
+            'Controller delay': span(self.received, self.sent),
+            'Time to generate': span(self.generated, self.sent),
+            'Time to send FL': span(self.sent, self.acked, 0.5),  # half the rule/ACK round trip
+            'Time to execute': span(self.acked, self.executed),
+            'Total': span(self.received if self.received is not None else self.generated, self.executed),
+        }
+
+    def record(self, status):
+        return {
+            'NODE_ID': self.node_id, 'Num': self.num, 'From': self.source, 'To': self.target, 'Status': status,
+            'T_r': self.received, 'T_g': self.generated, 'T_s': self.sent, 'T_b': self.acked,
+            'T_e': self.executed, **self.timings(),
+        }
+
+class SwitchTransactions:
+    """
+    Open switches by (Num, NODE_ID) with a per-node index, so any number
+    of nodes can switch at once without their timestamps mixing. Each
+    transaction is written to SWITCH_TIMING_LOG when the node reports its
+    new interface, or as incomplete after PENDING_SWITCH_EXPIRY, whether
+    by the next record written or by the thread started with start().
+    """
+    def __init__(self, clock=time.time, log_path=None):
+        self.clock = clock
+        self.log_path = log_path or SWITCH_TIMING_LOG
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.worker = None
+        self.received_at = {}  # {node_id: time of its latest data}
+        self.table = {}  # {(num, node_id): SwitchTransaction}, in opening order
+        self.by_node = {}  # {node_id: {num: SwitchTransaction}}
+
+    def note_received(self, node_id, now=None):
+        self.received_at[node_id] = self.clock() if now is None else now
+
+    def open(self, node_id, num, source, target, generated=None, now=None):
+        """
+        Start timing a switch once its RX rule is ready to go out; a
+        transaction still open under the same key (a patched rule) is
+        superseded
+        """
+        now = self.clock() if now is None else now
+        transaction = SwitchTransaction(num, node_id, source, target, self.received_at.get(node_id),
+                                        generated if generated is not None else now, now)
+        with self.lock:
+            superseded = self._close(node_id, num)
+            self.table[(num, node_id)] = transaction
+            self.by_node.setdefault(node_id, {})[num] = transaction
+            expired = self._expired(now)
+            self.condition.notify()
+        self._write([(superseded, 'superseded')] if superseded else [])
+        self._write((entry, 'incomplete') for entry in expired)
+        return transaction
+
+    def acknowledge(self, node_id, num=None, now=None):
+        """
+        Stamp the node's Received ACK; ACKs without a Num (older nodes)
+        go to the node's oldest transaction still waiting for one
+        """
+        now = self.clock() if now is None else now
+        with self.lock:
+            transactions = self.by_node.get(node_id, {})
+            if num is not None:
+                transaction = transactions.get(num)
+            else:
+                transaction = next((entry for entry in transactions.values() if entry.acked is None), None)
+            if transaction is None or transaction.acked is not None:
+                return None
+            transaction.acked = now
+        return transaction
+
+    def executed(self, node_id, interface, now=None):
+        """
+        Complete the node's transactions that switched to interface
+        """
+        now = self.clock() if now is None else now
+        with self.lock:
+            done = [entry for entry in self.by_node.get(node_id, {}).values() if entry.target == interface]
+            for entry in done:
+                entry.executed = now
+                self._close(node_id, entry.num)
+            expired = self._expired(now)
+        self._write((entry, 'complete') for entry in done)
+        self._write((entry, 'incomplete') for entry in expired)
+        return done
+
+    def expire(self, now=None):
+        """
+        Close and write the transactions unanswered for PENDING_SWITCH_EXPIRY
+        """
+        now = self.clock() if now is None else now
+        with self.lock:
+            expired = self._expired(now)
+        self._write((entry, 'incomplete') for entry in expired)
+        return expired
+
+    def next_expiry(self):
+        """
+        When the oldest open transaction expires, None if none is open
+        """
+        oldest = next(iter(self.table.values()), None)
+        return oldest.sent + PENDING_SWITCH_EXPIRY if oldest is not None else None
+
+    def start(self):
+        """
+        Run a single thread that wakes when the oldest open transaction
+        expires, so switches are written even after switching stops
+        """
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.next_expiry() is None:
+                    self.condition.wait()
+                delay = self.next_expiry() - self.clock()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+            self.expire()
+
+    def _close(self, node_id, num):
+        transaction = self.table.pop((num, node_id), None)
+        if transaction is not None:
+            transactions = self.by_node[node_id]
+            del transactions[num]
+            if not transactions:
+                del self.by_node[node_id]
+        return transaction
+
+    def _expired(self, now):
+        stale = []
+        for key, transaction in self.table.items():
+            if now - transaction.sent < PENDING_SWITCH_EXPIRY:
+                break
+            stale.append(key)
+        return [self._close(node_id, num) for num, node_id in stale]
+
+    def _write(self, entries):
+        lines = [json.dumps(transaction.record(status)) + '\n' for transaction, status in entries]
+        if not lines:
+            return
+        with open(self.log_path, 'a') as f:
+            f.writelines(lines)
+
+    def open_count(self):
+        return len(self.table)
+
+transactions = SwitchTransactions()
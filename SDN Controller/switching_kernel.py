@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Switching Kernel - vectorized switching decisions for the whole fleet
+
+import numpy as np
+
+from config import *
+
+# Decision codes returned by evaluate_fleet
+NO_OP = 0
+SWITCH = 1
+ABNORMAL = 2
+
+def evaluate_fleet(avg_latency, std_latency, avg_power, std_power,
+                   tail_latency=None, tail_power=None):
+    """
+    Classify every node in one pass and compute the thresholds
+    handle_switching would send. Inputs are equal-length arrays,
+    missing statistics are NaN. When tail quantiles are given they
+    replace avg +/- 2*std wherever they are available.
+    """
+    avg_latency = np.asarray(avg_latency, dtype=float)
+    std_latency = np.asarray(std_latency, dtype=float)
+    avg_power = np.asarray(avg_power, dtype=float)
+    std_power = np.asarray(std_power, dtype=float)
+
+    has_latency = ~np.isnan(avg_latency)
+    has_power = ~np.isnan(avg_power)
+
+    # Switch inside the switching ranges, abnormal outside the valid ranges
+    with np.errstate(invalid='ignore'):
+        switch = ((has_latency & (avg_latency >= LATENCY_SWITCH_RANGE[0]) &
+                   (avg_latency <= LATENCY_SWITCH_RANGE[1])) |
+                  (has_power & (avg_power >= POWER_SWITCH_RANGE[0]) &
+                   (avg_power <= POWER_SWITCH_RANGE[1])))
+        abnormal = ~switch & ((has_latency & ((avg_latency > LATENCY_SWITCH_RANGE[1]) |
+                                              (avg_latency <= 0))) |
+                              (has_power & ((avg_power < POWER_SWITCH_RANGE[0]) |
+                                            (avg_power == 0))))
+
+    decision = np.full(avg_latency.shape, NO_OP, dtype=np.int8)
+    decision[switch] = SWITCH
+    decision[abnormal] = ABNORMAL
+
+    # Latency trigger whenever latency stats exist, power trigger otherwise
+    latency_trigger = has_latency
+    latency_bound = avg_latency + 2 * std_latency
+    power_bound = avg_power - 2 * std_power
+    if tail_latency is not None:
+        tail_latency = np.asarray(tail_latency, dtype=float)
+        latency_bound = np.where(np.isnan(tail_latency), latency_bound, tail_latency)
+    if tail_power is not None:
+        tail_power = np.asarray(tail_power, dtype=float)
+        power_bound = np.where(np.isnan(tail_power), power_bound, tail_power)
+
+    with np.errstate(invalid='ignore'):
+        latency_value = np.where(
+            latency_trigger,
+            np.where(latency_bound < LATENCY_THRESHOLD_CAP, latency_bound, LATENCY_THRESHOLD_CAP),
+            np.interp(avg_latency, [5, 20], [20, 25])
+        )
+        power_value = np.where(
+            latency_trigger,
+            np.interp(avg_power, [-45, -10], [-70, -45]),
+            np.where(power_bound > POWER_THRESHOLD_FLOOR, power_bound, POWER_THRESHOLD_FLOOR)
+        )
+
+    return {
+        'decision': decision,
+        'latency_trigger': latency_trigger,
+        'latency_value': latency_value,
+        'power_value': power_value
+    }
+
+def window_stats(windows, size):
+    """
+    Mean and std of each full window, NaN for incomplete ones
+    """
+    values = np.full((len(windows), size), np.nan)
+    for i, window in enumerate(windows):
+        if window is not None and len(window) == size:
+            values[i] = window
+    return values.mean(axis=1), values.std(axis=1)
+
+def action_indices(decision):
+    """
+    Indices of nodes that need a switch or abnormal handling
+    """
+    return np.flatnonzero(decision != NO_OP)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# Switching Orchestrator - tracks in-flight relay switches as state machines
+
+import time
+import logging
+import threading
+
+from config import *
+
+# Switch states
+WAITING_INTERFACE = 'waiting_interface'
+WAITING_MAC = 'waiting_mac'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+class RelaySwitch:
+    """
+    One relay setup: the relay moves to the RX node's interface, then
+    forwarding rules are sent once its interface and MAC are known
+    """
+    def __init__(self, relay_node, rx_node, target_interface,
+                 on_interface_ready, on_mac_ready, on_failure):
+        self.relay_node = relay_node
+        self.rx_node = rx_node
+        self.target_interface = target_interface
+        self.on_interface_ready = on_interface_ready
+        self.on_mac_ready = on_mac_ready
+        self.on_failure = on_failure
+        self.state = WAITING_INTERFACE
+        self.started = time.time()
+        self.deadline = self.started + RELAY_SWITCH_STAGE_TIMEOUT
+        self.done = threading.Event()
+
+class SwitchingOrchestrator:
+    def __init__(self, max_concurrent=MAX_CONCURRENT_SWITCHES):
+        self.max_concurrent = max_concurrent
+        self.condition = threading.Condition()
+        self.switches = {}  # {relay_node: RelaySwitch}
+        self.watcher = None
+
+    def start(self, relay_node, rx_node, target_interface,
+              on_interface_ready, on_mac_ready, on_failure=None):
+        """
+        Register a new relay switch. Returns None if the relay is already
+        switching or the concurrency limit is reached.
+        """
+        with self.condition:
+            if relay_node in self.switches:
+                logging.info(f"Relay switch for {relay_node} already in flight")
+                return None
+            if len(self.switches) >= self.max_concurrent:
+                logging.warning(f"{len(self.switches)} switches in flight, "
+                                f"not starting relay switch for {relay_node}")
+                return None
+
+            switch = RelaySwitch(relay_node, rx_node, target_interface,
+                                 on_interface_ready, on_mac_ready, on_failure)
+            self.switches[relay_node] = switch
+            self._ensure_watcher()
+            self.condition.notify_all()
+        logging.info(f"Relay switch started: {relay_node} -> {target_interface} for rx {rx_node}")
+        return switch
+
+    def notify_interface(self, node_id, interface):
+        """
+        Called when a node reports its current interface
+        """
+        with self.condition:
+            switch = self.switches.get(node_id)
+            if (switch is None or switch.state != WAITING_INTERFACE or
+                    interface != switch.target_interface):
+                return
+            switch.state = WAITING_MAC
+            switch.deadline = time.time() + RELAY_SWITCH_STAGE_TIMEOUT
+            self.condition.notify_all()
+        switch.on_interface_ready(switch)
+
+    def notify_fields(self, node_id, data):
+        """
+        Called when a node's telemetry updates; completes switches waiting
+        for the relay's MAC address
+        """
+        if node_id not in self.switches or not data.get('Src MAC'):
+            return
+        with self.condition:
+            switch = self.switches.get(node_id)
+            if switch is None or switch.state != WAITING_MAC:
+                return
+            self._finish(switch, COMPLETED)
+        switch.on_mac_ready(switch)
+
+    def cancel(self, relay_node):
+        """
+        Abort an in-flight switch
+        """
+        with self.condition:
+            switch = self.switches.get(relay_node)
+            if switch is None:
+                return False
+            self._finish(switch, CANCELLED)
+        logging.info(f"Relay switch for {relay_node} cancelled")
+        if switch.on_failure:
+            switch.on_failure(switch)
+        return True
+
+    def wait(self, relay_node, timeout=None):
+        """
+        Block until the relay's switch reaches a terminal state; returns the state
+        """
+        switch = self.switches.get(relay_node)
+        if switch is None:
+            return None
+        switch.done.wait(timeout)
+        return switch.state
+
+    def in_flight(self):
+        with self.condition:
+            return {node: switch.state for node, switch in self.switches.items()}
+
+    def _finish(self, switch, state):
+        # Caller holds the condition
+        switch.state = state
+        self.switches.pop(switch.relay_node, None)
+        switch.done.set()
+        self.condition.notify_all()
+
+    def _ensure_watcher(self):
+        if self.watcher is None or not self.watcher.is_alive():
+            self.watcher = threading.Thread(target=self._watch_deadlines, daemon=True)
+            self.watcher.start()
+
+    def _watch_deadlines(self):
+        """
+        Single thread expiring overdue switches; sleeps until the next deadline
+        """
+        while True:
+            expired = []
+            with self.condition:
+                while not self.switches:
+                    self.condition.wait()
+                now = time.time()
+                for switch in list(self.switches.values()):
+                    if switch.deadline <= now:
+                        expired.append((switch, switch.state))
+                        self._finish(switch, FAILED)
+                if not expired:
+                    next_deadline = min(s.deadline for s in self.switches.values())
+                    self.condition.wait(max(0, next_deadline - now))
+
+            for switch, stage in expired:
+                logging.warning(f"Relay switch for {switch.relay_node} timed out in state {stage}")
+                if switch.on_failure:
+                    switch.on_failure(switch)
+
+orchestrator = SwitchingOrchestrator()
@@ -0,0 +1,6 @@
+# Test setup - controller modules are imported from the directory above, as main.py does
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,73 @@
+# Tests - per-area busy ratios, congestion states and rate hints
+
+import pytest
+
+from config import CBR_AREA_SIZE, CONGESTION_STATES
+import congestion_control as cc
+import data_processor
+
+@pytest.fixture(autouse=True)
+def parked_nodes():
+    for store in (cc.node_loads, cc.area_loads, cc.area_members, cc.area_states, cc.hinted_states):
+        store.clear()
+    parked = {'A': 0.2, 'B': 0.5, 'C': 1.5}  # A and B share the first area, C is two areas on
+    for node_id, area in parked.items():
+        data_processor.speed_data[node_id] = {'speed': 0, 'position': area * CBR_AREA_SIZE, 'direction': 1}
+    yield
+    for node_id in parked:
+        del data_processor.speed_data[node_id]
+
+def test_parse_busy_ratio_accepts_cbr_and_cbp():
+    assert cc.parse_busy_ratio('0.25') == 0.25
+    assert cc.parse_busy_ratio('(25)') == 0.25
+    assert cc.parse_busy_ratio('40%') == 0.4
+
+def test_nodes_on_the_same_track_segment_share_an_area():
+    assert cc.area_of('A', 'ITSG5') == cc.area_of('B', 'ITSG5')
+    assert cc.area_of('A', 'ITSG5') != cc.area_of('C', 'ITSG5')
+    assert cc.area_of('A', 'ITSG5') != cc.area_of('A', 'CV2X')
+
+def test_busy_area_backs_off_all_its_nodes():
+    assert cc.record_busy_ratio('A', 'ITSG5', {'CBR': '0.1'}) == []
+    assert cc.record_busy_ratio('B', 'ITSG5', {'CBR': '0.1'}) == []
+
+    # A's smoothed ratio climbs until the shared area backs off
+    stale = []
+    while not stale:
+        stale = cc.record_busy_ratio('A', 'ITSG5', {'CBR': '(90)'})
+    assert stale == ['A', 'B']
+    hints = cc.rate_hints('B')
+    assert hints['Traffic rate'] < CONGESTION_STATES[0][2]
+    assert cc.rate_hints('C') == cc.area_hints(None)
+
+def test_area_relaxes_one_state_at_a_time():
+    for _ in range(20):
+        cc.record_busy_ratio('A', 'ITSG5', {'CBR': '0.9'})
+    busiest = cc.area_states[cc.area_of('A', 'ITSG5')]
+    assert busiest == len(CONGESTION_STATES) - 1
+
+    states = [busiest]
+    while states[-1]:
+        cc.record_busy_ratio('A', 'ITSG5', {'CBR': '0.0'})
+        states.append(cc.area_states[cc.area_of('A', 'ITSG5')])
+    assert all(previous - state in (0, 1) for previous, state in zip(states, states[1:]))
+
+def test_unreadable_reports_are_ignored():
+    assert cc.record_busy_ratio('A', 'ITSG5', {}) == []
+    assert cc.record_busy_ratio('A', 'ITSG5', {'CBR': 'n/a'}) == []
+    assert 'A' not in cc.node_loads
+
+def test_channel_load_reports_go_to_on_stale():
+    notified = []
+    stale = data_processor.process_channel_load('A', 'ITSG5', {'CBR': '0.9'}, notified.append)
+    assert notified == stale == ['A']
+    assert data_processor.process_channel_load('A', 'ITSG5', {'CBR': '0.9'}, notified.append) == []
+    assert notified == ['A']
+
+def test_removed_node_leaves_its_area():
+    cc.record_busy_ratio('A', 'ITSG5', {'CBR': '0.9'})
+    area = cc.area_of('A', 'ITSG5')
+    cc.remove_node('A')
+    assert area not in cc.area_loads
+    assert cc.area_busy_ratio(area) is None
+    assert 'A' not in cc.hinted_states
@@ -0,0 +1,46 @@
+# Tests - per-technology cells, membership and time to exit
+
+import numpy as np
+import pytest
+
+from coverage_model import CoverageModel
+
+CELLS = {'ITSG5': [(0, 0, 100)], 'CV2X': [(150, 0, 100)]}
+
+def test_membership_per_cell():
+    model = CoverageModel(cells=CELLS)
+    points = np.array([[0.0, 0.0], [120.0, 0.0], [300.0, 0.0]])
+    assert model.membership(points, 'ITSG5')[:, 0].tolist() == [True, False, False]
+    assert model.covered(points, 'CV2X').tolist() == [False, True, False]
+
+def test_line_exit_chains_overlapping_cells():
+    model = CoverageModel(cells={'ITSG5': [(0, 0, 100), (150, 0, 100)], 'CV2X': [(0, 0, 10)]})
+    points = np.array([[0.0, 0.0], [0.0, 0.0], [500.0, 0.0]])
+    velocities = np.array([[10.0, 0.0], [0.0, 0.0], [10.0, 0.0]])
+    assert model.line_exit(points, velocities, 'ITSG5').tolist() == pytest.approx([25.0, np.inf, 0.0])
+
+def test_track_node_covered_both_ways_never_leaves():
+    model = CoverageModel(cells={'ITSG5': [(100, 0, 100)], 'CV2X': [(50, 0, 60)]}, track=(0, 200))
+    points, velocities = np.array([[50.0, 0.0]]), np.array([[10.0, 0.0]])
+    assert model.exit_times(points, velocities, np.array([True]), 'ITSG5')[0] == np.inf
+    assert model.exit_times(points, velocities, np.array([False]), 'ITSG5')[0] == pytest.approx(15.0)
+    # Heading back from the track end, CV2X covers the node again only after it left
+    assert model.exit_times(points, velocities, np.array([True]), 'CV2X')[0] == pytest.approx(6.0)
+
+def test_evaluate_names_the_handover_target():
+    model = CoverageModel(cells=CELLS)
+    snapshot = model.evaluate(['A', 'B', 'C'], [[0, 0], [140, 0], [np.nan, np.nan]],
+                              [[10, 0], [10, 0], [0, 0]], [False, False, False])
+    assert snapshot['A']['ITSG5'] == (True, pytest.approx(10.0), 'CV2X')
+    assert snapshot['B']['CV2X'] == (True, pytest.approx(11.0), None)
+    assert 'C' not in snapshot
+
+    only = model.evaluate(['A'], [[0, 0]], [[10, 0]], [False], technologies=['CV2X'])
+    assert only == {'A': {'CV2X': (False, 0.0, 'ITSG5')}}
+
+def test_unconfigured_cells_span_the_track():
+    model = CoverageModel(cells=None, track=(0, 2000))
+    assert not model.configured
+    points = np.array([[0.0, 0.0], [2000.0, 0.0]])
+    for technology in model.technologies:
+        assert model.covered(points, technology).all()
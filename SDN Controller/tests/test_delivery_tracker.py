@@ -0,0 +1,70 @@
+# Tests - PUBACK tracking, late messages and retries of refused publishes
+
+from config import DELIVERY_DEADLINE, DELIVERY_MAX_RETRIES, DELIVERY_RETRY_BACKOFF
+from delivery_tracker import DeliveryTracker
+
+def make_tracker():
+    clock = [0.0]
+    return DeliveryTracker(clock=lambda: clock[0]), clock
+
+def test_puback_records_delivery_latency():
+    tracker, clock = make_tracker()
+    tracker.track(1, 'node/command/N1', b'{}', 'N1', ['001'])
+    assert tracker.rules_in_flight('N1') == ['001']
+    clock[0] = 0.015
+    tracker.acknowledge(1)
+    assert tracker.in_flight() == 0
+    assert tracker.histogram('N1')['<=20ms'] == 1
+    assert tracker.stats()['acknowledged'] == 1
+
+def test_ack_before_track_is_claimed():
+    tracker, clock = make_tracker()
+    tracker.acknowledge(7)
+    tracker.track(7, 'node/command/N1', b'{}', 'N1', ['001'])
+    assert tracker.in_flight() == 0
+    assert tracker.stats()['acknowledged'] == 1
+
+def test_old_early_acks_are_dropped():
+    tracker, clock = make_tracker()
+    for mid in range(100):
+        tracker.acknowledge(mid)
+    clock[0] = DELIVERY_DEADLINE
+    tracker.acknowledge(1_000)
+    assert list(tracker.early_acks) == [1_000]
+    tracker.track(5, 'node/command/N1', b'{}', 'N1')
+    assert tracker.in_flight() == 1
+
+def test_late_messages_are_counted_not_republished():
+    tracker, clock = make_tracker()
+    tracker.track(1, 'node/command/N1', b'{}', 'N1', ['001'])
+    clock[0] = DELIVERY_DEADLINE
+    assert tracker.overdue() == []
+    assert tracker.stats()['late'] == 1
+    assert tracker.in_flight() == 1
+
+def test_reconnect_restarts_deadlines_under_the_same_mid():
+    tracker, clock = make_tracker()
+    tracker.track(1, 'node/command/N1', b'{}', 'N1', ['001'])
+    clock[0] = 3.0
+    tracker.reconnected()
+    clock[0] = DELIVERY_DEADLINE
+    tracker.overdue()
+    assert tracker.stats()['late'] == 0
+    assert tracker.pending[1].attempt == 1
+    tracker.acknowledge(1)
+    assert tracker.stats()['resent on reconnect'] == 1
+
+def test_refused_publishes_are_retried_then_given_up():
+    tracker, clock = make_tracker()
+    tracker.track(None, 'node/command/N1', b'{}', 'N1', ['001'], queued=False)
+    assert tracker.in_flight() == 0
+    for attempt in range(DELIVERY_MAX_RETRIES):
+        assert tracker.overdue() == []
+        clock[0] += DELIVERY_RETRY_BACKOFF
+        [delivery] = tracker.overdue()
+        assert delivery.nums == ('001',)
+        tracker.track(None, delivery.topic, delivery.payload, delivery=delivery, queued=False)
+    clock[0] += DELIVERY_RETRY_BACKOFF
+    assert tracker.overdue() == []
+    stats = tracker.stats()
+    assert (stats['retried'], stats['failed']) == (DELIVERY_MAX_RETRIES, 1)
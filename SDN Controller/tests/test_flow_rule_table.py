@@ -0,0 +1,65 @@
+# Tests - flow rule storage, secondary indexes and node removal
+
+from flow_rule_table import FlowRuleTable, rule_technology
+import data_processor
+
+def rule(num, value, command='Tech switching', next_hop=None, version=1):
+    return {'Num': num, 'Version': version, 'Command type': command, 'Value': value, 'Next hop': next_hop}
+
+def test_rule_technology_comes_from_the_value():
+    assert rule_technology(rule('001', 'ITSG5_rx')) == 'ITSG5'
+    assert rule_technology(rule('001', 'CV2X_tx')) == 'CV2X'
+    assert rule_technology(rule('001', 'Initialization')) is None
+
+def test_indexes_follow_inserts_and_deletes():
+    table = FlowRuleTable()
+    table.insert('A', '001', rule('001', 'ITSG5_rx'))
+    table.insert('A', '002', rule('002', 'CV2X_rx', 'Forwarding', 'B'))
+    assert table.has_value('A', 'ITSG5_rx')
+    assert list(table.with_command('A', 'Forwarding', 'B')) == ['002']
+    assert table.has_technology('A', 'CV2X')
+
+    # Replacing a Num moves it out of its old index entries
+    table.insert('A', '001', rule('001', 'CV2X_tx'))
+    assert not table.has_value('A', 'ITSG5_rx')
+    assert not table.has_technology('A', 'ITSG5')
+    assert set(table.by_technology[('A', 'CV2X')]) == {'001', '002'}
+
+    assert table.delete('A', '002')['Value'] == 'CV2X_rx'
+    assert table.delete('A', '002') is None
+    assert table.with_command('A', 'Forwarding', 'B') == {}
+
+def test_digest_returns_to_empty():
+    table = FlowRuleTable()
+    table.insert('A', '001', rule('001', 'ITSG5_rx'))
+    table.insert('A', '002', rule('002', 'ITSG5_tx', version=3))
+    assert table.digest('A')
+    table.delete('A', '001')
+    table.delete('A', '002')
+    assert table.digest('A') == {}
+
+def test_removed_node_leaves_no_index_entries():
+    table = FlowRuleTable()
+    table.insert('A', '001', rule('001', 'ITSG5_rx'), match_version=1)
+    table.insert('A', '002', rule('002', 'CV2X_rx', 'Forwarding', 'B'))
+    table.insert('B', '003', rule('003', 'ITSG5_rx'))
+    table.remove_node('A')
+    assert 'A' not in table and len(table) == 1
+    assert not any(key[0] == 'A' for index in (table.by_value, table.by_command, table.by_technology) for key in index)
+    assert table.match_versions == {('B', '003'): None}
+    assert 'A' not in table.digests
+
+def test_silent_nodes_are_found_and_forgotten():
+    data_processor.last_seen.update({'GONE': 100.0, 'HERE': 150.0})
+    data_processor.latency_data['GONE'] = [5.0]
+    data_processor.current_interfaces['GONE'] = 'ITSG5'
+    data_processor.speed_data['GONE'] = {'speed': 40, 'position': 0, 'direction': 1}
+    try:
+        assert data_processor.inactive_nodes(now=100.0 + data_processor.NODE_INACTIVITY_TIMEOUT) == ['GONE']
+        data_processor.forget_node('GONE')
+        assert 'GONE' not in data_processor.latency_data
+        assert 'GONE' not in data_processor.current_interfaces
+        assert 'GONE' not in data_processor.speed_data
+        assert data_processor.inactive_nodes(now=100.0 + data_processor.NODE_INACTIVITY_TIMEOUT) == []
+    finally:
+        data_processor.last_seen.clear()
@@ -0,0 +1,49 @@
+# Tests - handovers queued ahead of predicted coverage exits
+
+import pytest
+
+import data_processor
+import handover_scheduler
+from handover_scheduler import HandoverScheduler, plan_handover
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = HandoverScheduler(clock=Clock())
+    monkeypatch.setattr(handover_scheduler, 'scheduler', scheduler)
+    return scheduler
+
+def test_plan_fires_one_lead_time_before_the_crossing(scheduler):
+    fire_time = scheduler.schedule('A', 1100.0, 'CV2X')
+    assert fire_time == pytest.approx(1100.0 - scheduler.lead_time())
+    assert scheduler.due(now=fire_time - 0.1) == []
+    assert scheduler.due(now=fire_time) == [('A', 1100.0, 'CV2X')]
+    assert scheduler.due(now=1200.0) == []
+
+def test_replanning_supersedes_the_older_entry(scheduler):
+    scheduler.schedule('A', 1100.0, 'CV2X')
+    scheduler.schedule('A', 1050.0, None)
+    scheduler.schedule('B', 1080.0, 'ITSG5')
+    assert scheduler.due(now=1200.0) == [('A', 1050.0, None), ('B', 1080.0, 'ITSG5')]
+
+def test_cancelled_plan_never_fires(scheduler):
+    scheduler.schedule('A', 1100.0, 'CV2X')
+    scheduler.cancel('A')
+    assert scheduler.due(now=1200.0) == []
+
+def test_plan_handover_follows_the_coverage_model(scheduler, monkeypatch):
+    monkeypatch.setitem(data_processor.current_interfaces, 'A', 'ITSG5')
+    monkeypatch.setattr(handover_scheduler, 'coverage_info', lambda node_id, technology: (True, 30.0, 'CV2X'))
+    assert plan_handover('A') == pytest.approx(1030.0 - scheduler.lead_time())
+    assert scheduler.plans['A'][1:] == (1030.0, 'CV2X')
+
+    # Never leaving coverage drops the plan
+    monkeypatch.setattr(handover_scheduler, 'coverage_info', lambda node_id, technology: (True, float('inf'), None))
+    assert plan_handover('A') is None
+    assert scheduler.due(now=1100.0) == []
@@ -0,0 +1,52 @@
+# Tests - TX profiles adapted from PER, RSSI and latency
+
+import pytest
+
+from config import DEFAULT_TX_PROFILES, TX_POWER_RANGE, TX_RATE_RANGE, LATENCY_THRESHOLD_CAP
+import link_adaptation
+from link_adaptation import update_link_adaptation, tx_profile, clear_link_adaptation
+
+@pytest.fixture(autouse=True)
+def no_states():
+    link_adaptation.link_states.clear()
+    yield
+    link_adaptation.link_states.clear()
+
+def test_unmeasured_link_gets_the_default_profile():
+    assert tx_profile('RX', 'ITSG5') == DEFAULT_TX_PROFILES['ITSG5']
+    assert tx_profile('RX', 'CV2X') == DEFAULT_TX_PROFILES['CV2X']
+    assert update_link_adaptation('RX', 'ITSG5', {'Speed': 40}) is None
+
+def test_packet_errors_raise_power_before_lowering_the_mcs():
+    update_link_adaptation('RX', 'ITSG5', {'PER': '(50)'})
+    assert tx_profile('RX', 'ITSG5')['Power'] > DEFAULT_TX_PROFILES['ITSG5']['Power']
+    assert tx_profile('RX', 'ITSG5')['MCS'] == DEFAULT_TX_PROFILES['ITSG5']['MCS']
+
+    # CV2X already sends at full power
+    update_link_adaptation('RX', 'CV2X', {'PER': '0.5'})
+    assert tx_profile('RX', 'CV2X')['Power'] == TX_POWER_RANGE['CV2X'][1]
+    assert tx_profile('RX', 'CV2X')['MCS'] == DEFAULT_TX_PROFILES['CV2X']['MCS'] - 1
+
+def test_clean_link_sends_more_packets_at_a_faster_mcs():
+    update_link_adaptation('RX', 'ITSG5', {'PER': '0'})
+    profile = tx_profile('RX', 'ITSG5')
+    assert profile['MCS'] == 'MK2MCS_R34QPSK'
+    assert profile['Rate'] == 150  # 9 instead of 6 Mbit/s in the same airtime
+    assert tx_profile('RX', 'ITSG5', traffic_rate=5000)['Rate'] == TX_RATE_RANGE[1]
+
+def test_strong_signal_lowers_power_to_the_link_budget():
+    update_link_adaptation('RX', 'ITSG5', {'RSSI': '-50,-50'})
+    assert tx_profile('RX', 'ITSG5')['Power'] == TX_POWER_RANGE['ITSG5'][0]
+
+def test_high_latency_shortens_packets_until_it_recovers():
+    update_link_adaptation('RX', 'CV2X', {'Latency': str(LATENCY_THRESHOLD_CAP * 2)})
+    assert tx_profile('RX', 'CV2X')['Length'] == DEFAULT_TX_PROFILES['CV2X']['Length'] // 2
+    for _ in range(10):
+        update_link_adaptation('RX', 'CV2X', {'Latency': '1'})
+    assert tx_profile('RX', 'CV2X')['Length'] == DEFAULT_TX_PROFILES['CV2X']['Length']
+
+def test_cleared_node_is_back_to_defaults():
+    update_link_adaptation('RX', 'ITSG5', {'PER': '0'})
+    clear_link_adaptation('RX')
+    assert link_adaptation.link_states == {}
+    assert tx_profile('RX', 'ITSG5') == DEFAULT_TX_PROFILES['ITSG5']
@@ -0,0 +1,44 @@
+# Tests - per-technology link scores and technology selection
+
+import pytest
+
+from config import LINK_SCORE_ALPHA, LINK_SCORE_WEIGHTS
+import link_scoring
+from link_scoring import update_link_score, link_score, clear_link_scores, select_technology
+
+@pytest.fixture(autouse=True)
+def no_scores():
+    link_scoring.link_scores.clear()
+    yield
+    link_scoring.link_scores.clear()
+
+def test_metrics_are_normalized_and_weighted():
+    # Latency at its good bound, PER halfway to its bad bound
+    score = update_link_score('A', 'ITSG5', {'Latency': '5ms', 'PER': '(15)'})
+    weights = LINK_SCORE_WEIGHTS['Latency'] + LINK_SCORE_WEIGHTS['PER']
+    assert score == pytest.approx((LINK_SCORE_WEIGHTS['Latency'] + 0.5 * LINK_SCORE_WEIGHTS['PER']) / weights)
+    assert link_score('A', 'CV2X') is None
+
+def test_repeated_metrics_are_smoothed():
+    update_link_score('A', 'ITSG5', {'Latency': '5'})
+    assert update_link_score('A', 'ITSG5', {'Latency': '60'}) == pytest.approx(1 - LINK_SCORE_ALPHA)
+
+def test_unknown_or_unreadable_fields_are_skipped():
+    assert update_link_score('A', 'ITSG5', {'Speed': 40, 'Latency': 'n/a'}) is None
+    assert update_link_score('A', 'LTE', {'Latency': '5'}) is None
+
+def test_node_stays_only_on_a_clearly_better_link():
+    update_link_score('A', 'ITSG5', {'Latency': '10'})
+    assert select_technology('A', 'ITSG5') == 'CV2X'  # nothing known about CV2X yet
+
+    update_link_score('A', 'CV2X', {'Latency': '50'})
+    assert select_technology('A', 'ITSG5') == 'ITSG5'
+    assert select_technology('A', '*') == 'ITSG5'
+    assert select_technology('B', '*') is None
+
+def test_cleared_node_has_no_scores():
+    update_link_score('A', 'ITSG5', {'Latency': '5'})
+    update_link_score('A', 'CV2X', {'Latency': '5'})
+    update_link_score('B', 'ITSG5', {'Latency': '5'})
+    clear_link_scores('A')
+    assert list(link_scoring.link_scores) == [('B', 'ITSG5')]
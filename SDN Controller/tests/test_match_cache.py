@@ -0,0 +1,64 @@
+# Tests - cached match dictionaries and stale rule detection
+
+import json
+
+import numpy as np
+
+from config import MATCH_FIELDS
+from flow_rule_table import FlowRuleTable
+from match_cache import MatchCache
+
+def rule(num, value='ITSG5_tx'):
+    return {'Num': num, 'Version': 1, 'match': {'NODE_ID': 'A'}, 'Command type': 'Tech switching', 'Value': value}
+
+def test_match_is_rebuilt_only_when_a_field_changes():
+    cache = MatchCache()
+    assert cache.observe('A', {'Src MAC': 'aa', 'Latency': '5'})
+    version = cache.version('A')
+    match, encoded = cache.encoded('A')
+    assert match == {'NODE_ID': 'A', **dict.fromkeys(MATCH_FIELDS, '*'), 'Src MAC': 'aa'}
+    assert json.loads(encoded) == match
+
+    assert not cache.observe('A', {'Src MAC': 'aa', 'Latency': '9'})
+    assert cache.version('A') == version
+    assert cache.encoded('A')[0] is match
+
+    assert cache.observe('A', {'Src MAC': 'bb'})
+    assert cache.version('A') == version + 1
+    assert cache.match('A')['Src MAC'] == 'bb'
+
+def test_missing_values_fall_back_to_wildcards():
+    cache = MatchCache()
+    cache.observe('A', {'Src IP': np.nan})
+    assert cache.version('A') == 1
+    assert not cache.is_specific('A')
+    cache.observe('A', {'Src IP': '10.0.0.1'})
+    assert cache.is_specific('A')
+    assert cache.observe('A', {'Src IP': None})
+    assert cache.match('A')['Src IP'] == '*'
+
+def test_match_copies_do_not_leak_into_the_cache():
+    cache = MatchCache()
+    cache.observe('A', {'Src MAC': 'aa'})
+    cache.match('A')['Src MAC'] = 'changed'
+    assert cache.match('A')['Src MAC'] == 'aa'
+
+def test_rules_built_on_an_older_match_are_stale():
+    cache = MatchCache()
+    table = FlowRuleTable()
+    cache.observe('A', {'Src MAC': 'aa'})
+    table.insert('A', '001', rule('001'), cache.version('A'))
+    table.insert('A', '002', rule('002', 'Initialization'), None)
+    assert table.stale('A', cache.version('A')) == []
+
+    cache.observe('A', {'Src MAC': 'bb'})
+    assert table.stale('A', cache.version('A')) == ['001']
+    table.mark_current('A', '001', cache.version('A'))
+    assert table.stale('A', cache.version('A')) == []
+
+def test_removed_node_starts_over():
+    cache = MatchCache()
+    cache.observe('A', {'Src MAC': 'aa'})
+    cache.remove_node('A')
+    assert cache.version('A') == 0
+    assert cache.match('A')['Src MAC'] == '*'
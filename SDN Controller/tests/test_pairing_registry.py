@@ -0,0 +1,35 @@
+# Tests - TX to RX pairing with a reverse index
+
+from pairing_registry import PairingRegistry
+
+def test_reverse_index_keeps_pairing_order():
+    pairing = PairingRegistry()
+    pairing['T2'] = 'RX'
+    pairing['T1'] = 'RX'
+    pairing['T3'] = 'OTHER'
+    assert pairing.tx_nodes('RX') == ['T2', 'T1']
+    assert pairing.is_rx('RX') and not pairing.is_rx('T1')
+    assert pairing.get('T3') == 'OTHER'
+    assert pairing.tx_nodes('nobody') == []
+
+def test_repairing_moves_the_tx_node():
+    pairing = PairingRegistry()
+    pairing['T1'] = 'RX'
+    pairing['T1'] = 'OTHER'
+    assert not pairing.is_rx('RX')
+    assert pairing.tx_nodes('OTHER') == ['T1']
+    assert dict(pairing) == {'T1': 'OTHER'}
+
+def test_removed_node_leaves_both_sides():
+    pairing = PairingRegistry()
+    pairing['T1'] = 'RX'
+    pairing['T2'] = 'RX'
+    pairing['RX'] = 'OTHER'
+    pairing.remove_node('RX')
+    assert len(pairing) == 0
+    assert pairing.tx_of == {}
+
+    pairing['T1'] = 'RX'
+    pairing.remove_node('T1')
+    assert not pairing.is_rx('RX')
+    pairing.remove_node('unknown')
@@ -0,0 +1,44 @@
+# Tests - streaming P-square quantile estimates
+
+import numpy as np
+
+from quantile_estimator import P2Quantile, StreamingQuantiles
+
+def test_no_samples_has_no_estimate():
+    assert P2Quantile(0.5).value() is None
+
+def test_first_samples_use_the_exact_order_statistic():
+    estimator = P2Quantile(0.5)
+    for x in (9.0, 1.0, 5.0):
+        estimator.add(x)
+    assert estimator.value() == 5.0
+
+def test_tracks_quantiles_of_a_long_stream():
+    samples = np.random.default_rng(0).normal(20.0, 5.0, 20_000)
+    for p in (0.05, 0.5, 0.95):
+        estimator = P2Quantile(p)
+        for x in samples:
+            estimator.add(float(x))
+        assert abs(estimator.value() - np.quantile(samples, p)) < 0.25
+
+def test_memory_stays_at_five_markers():
+    estimator = P2Quantile(0.95)
+    for x in range(10_000):
+        estimator.add(float(x))
+    assert len(estimator.heights) == 5
+    assert estimator.count == 10_000
+
+def test_follows_a_shift_in_level():
+    estimator = P2Quantile(0.5)
+    for x in np.r_[np.full(500, 10.0), np.full(5_000, 50.0)]:
+        estimator.add(float(x))
+    assert estimator.value() > 45.0
+
+def test_streaming_quantiles_share_samples():
+    quantiles = StreamingQuantiles((0.05, 0.5, 0.95))
+    for x in range(1, 1_001):
+        quantiles.add(float(x))
+    assert quantiles.count == 1_000
+    assert quantiles.get(0.05) < quantiles.get(0.5) < quantiles.get(0.95)
+    assert quantiles.get(0.99) is None
+    assert set(quantiles.snapshot()) == {'p5', 'p50', 'p95'}
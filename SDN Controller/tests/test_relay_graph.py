@@ -0,0 +1,112 @@
+# Tests - relay graph edges, closed-form positions and relay path search
+
+import pytest
+
+from config import RELAY_RANGE, RELAY_SWITCH_PENALTY, RELAY_UNKNOWN_SCORE
+from fleet_motion import FleetMotion
+import data_processor
+import link_scoring
+import relay_graph
+import spatial_index
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def empty_graph(monkeypatch):
+    relay_graph.graph_nodes.clear()
+    relay_graph.adjacency.clear()
+    for index in (spatial_index.track_index, spatial_index.road_index):
+        index.positions.clear()
+    spatial_index.track_index.entries.clear()
+    spatial_index.road_index.cells.clear()
+    link_scoring.link_scores.clear()
+    clock = Clock()
+    monkeypatch.setattr(data_processor, 'speed_data', FleetMotion(clock=clock))
+    yield clock
+    link_scoring.link_scores.clear()
+
+def score(node_id, technology, latency):
+    link_scoring.update_link_score(node_id, technology, {'Latency': str(latency)})
+
+def test_edges_follow_positions():
+    relay_graph.update_node('A', position=0.0, interface='ITSG5')
+    relay_graph.update_node('B', position=RELAY_RANGE / 2, interface='ITSG5')
+    relay_graph.update_node('C', position=RELAY_RANGE * 3, interface='ITSG5')
+    assert relay_graph.adjacency['A'] == {'B': 0.5}
+    assert relay_graph.adjacency['C'] == {}
+
+    relay_graph.update_node('C', position=RELAY_RANGE * 1.25)
+    assert relay_graph.adjacency['C'] == {'B': 0.75}
+    assert relay_graph.adjacency['B'] == {'A': 0.5, 'C': 0.75}
+
+    relay_graph.remove_node('B')
+    assert relay_graph.adjacency == {'A': {}, 'C': {}}
+    assert 'B' not in spatial_index.track_index.positions
+
+def test_relay_cost_prefers_good_links_on_the_target_technology():
+    relay_graph.update_node('R', position=0.0, interface='ITSG5')
+    relay_graph.update_node('GOOD', position=100.0, interface='ITSG5')
+    relay_graph.update_node('OTHER', position=50.0, interface='CV2X')
+    relay_graph.update_node('BAD', position=20.0, interface='ITSG5')
+    score('GOOD', 'ITSG5', 5)
+    score('BAD', 'ITSG5', 60)
+
+    assert relay_graph.relay_cost('OTHER', 'ITSG5') == pytest.approx(1 - RELAY_UNKNOWN_SCORE + RELAY_SWITCH_PENALTY)
+    assert relay_graph.find_relay_path('R', 'ITSG5') == ['R', 'GOOD']
+    assert relay_graph.find_relay_path('R', 'ITSG5', excluded={'GOOD'}) == ['R', 'OTHER']
+    assert relay_graph.find_relay_path('unknown', 'ITSG5') is None
+
+def test_no_relay_out_of_range():
+    relay_graph.update_node('R', position=0.0)
+    relay_graph.update_node('FAR', position=RELAY_RANGE * 2)
+    assert relay_graph.find_relay_path('R', 'ITSG5') is None
+
+def test_costlier_path_with_hops_to_spare_is_kept():
+    # R-P-X is cheaper to X than R-X, but leaves no hop to reach Z
+    for node_id in ('R', 'P', 'X', 'Z'):
+        relay_graph.update_node(node_id, interface='ITSG5')
+    for a, b, cost in (('R', 'P', 0.1), ('P', 'X', 0.1), ('R', 'X', 0.5), ('X', 'Z', 0.1)):
+        relay_graph.adjacency[a][b] = relay_graph.adjacency[b][a] = cost
+    for node_id in ('P', 'X'):
+        score(node_id, 'ITSG5', 60)
+    score('Z', 'ITSG5', 5)
+
+    assert relay_graph.find_relay_path('R', 'ITSG5', max_hops=2) == ['R', 'X', 'Z']
+    assert relay_graph.find_relay_path('R', 'ITSG5', max_hops=1) == ['R', 'P']
+
+def test_simulated_nodes_are_placed_at_query_time(empty_graph):
+    clock = empty_graph
+    fleet = data_processor.speed_data
+    # 36 km/h is 10 m/s; A and B drive towards each other, C far away
+    fleet['A'] = {'speed': 36, 'position': 0, 'direction': 1}
+    fleet['B'] = {'speed': 36, 'position': 1000, 'direction': -1}
+    fleet['C'] = {'speed': 36, 'position': 1900, 'direction': 1}
+    relay_graph.update_node('A', position=0, interface='ITSG5')
+    relay_graph.update_node('B', position=1000, interface='ITSG5')
+    relay_graph.update_node('C', position=1900, interface='ITSG5')
+    assert relay_graph.find_relay_path('A', 'ITSG5') is None
+
+    clock.now += 45
+    assert relay_graph.find_relay_path('A', 'ITSG5') == ['A', 'B']
+    assert relay_graph.graph_nodes['A']['position'] == pytest.approx(450)
+    assert relay_graph.adjacency['B'] == {'A': pytest.approx(0.5)}
+
+    # B drives on past A and out of range; C is never touched
+    clock.now += 30
+    assert relay_graph.find_relay_path('A', 'ITSG5') is None
+    assert relay_graph.graph_nodes['B']['position'] == pytest.approx(250)
+    assert relay_graph.adjacency['B'] == {}
+    assert relay_graph.graph_nodes['C']['position'] == 1900
+
+def test_road_report_refreshes_the_closed_form_track_position(empty_graph):
+    clock = empty_graph
+    data_processor.speed_data['A'] = {'speed': 36, 'position': 0, 'direction': 1}
+    relay_graph.update_node('A', position=0)
+    clock.now += 10
+    relay_graph.refresh_edges('A')
+    assert spatial_index.track_index.positions['A'] == pytest.approx(100)
@@ -0,0 +1,39 @@
+# Tests - per-bucket rule set digests and drift detection
+
+from config import RULE_DIGEST_BUCKETS
+from rule_digest import bucket_of, rule_digest, drifted_buckets, rule_differences
+
+RULES = [(f"{num:03d}", 1) for num in range(1, 41)]
+
+def test_buckets_are_stable_and_in_range():
+    assert all(0 <= bucket_of(num) < RULE_DIGEST_BUCKETS for num, _ in RULES)
+    assert bucket_of('007') == bucket_of('007')
+
+def test_digest_ignores_rule_order():
+    assert rule_digest(RULES) == rule_digest(list(reversed(RULES)))
+
+def test_equal_rule_sets_do_not_drift():
+    assert drifted_buckets(rule_digest(RULES), rule_digest(list(RULES))) == []
+    assert drifted_buckets({}, {}) == []
+
+def test_version_change_drifts_only_its_bucket():
+    changed = [(num, 2 if num == '017' else version) for num, version in RULES]
+    assert drifted_buckets(rule_digest(RULES), rule_digest(changed)) == [bucket_of('017')]
+
+def test_missing_and_extra_rules_drift_their_buckets():
+    node = [rule for rule in RULES if rule[0] != '005'] + [('099', 1)]
+    drifted = drifted_buckets(rule_digest(RULES), rule_digest(node))
+    assert drifted == sorted({bucket_of('005'), bucket_of('099')})
+
+def test_empty_buckets_are_left_out():
+    digest = rule_digest([('001', 1)])
+    assert list(digest) == [bucket_of('001')]
+    assert drifted_buckets(digest, {}) == [bucket_of('001')]
+
+def test_differences_send_missing_and_stale_rules_only():
+    local = {'001': 1, '002': 2, '003': 1}
+    remote = {'001': 1, '002': 1, '004': 1}
+    send, drop = rule_differences(local, remote)
+    assert send == ['002', '003']
+    assert drop == ['002', '004']
+    assert rule_differences(local, dict(local)) == ([], [])
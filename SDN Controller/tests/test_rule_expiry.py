@@ -0,0 +1,62 @@
+# Tests - controller-side rule expiry on the timer wheel
+
+from config import RULE_CONFIRM_WINDOW, RULE_EXPIRY_RESOLUTION
+from rule_expiry import RuleExpiry
+
+def make_expiry():
+    clock = [1000.0]
+    return RuleExpiry(clock=lambda: clock[0]), clock
+
+def test_rule_expires_once_its_timeout_passed():
+    expiry, _ = make_expiry()
+    expiry.schedule('N1', '001', 20, now=1000.0)
+    assert expiry.due(1019.0) == []
+    assert expiry.due(1020.0 + RULE_EXPIRY_RESOLUTION) == [('N1', '001')]
+    assert expiry.due(1100.0) == []
+    assert expiry.stats()['expired locally'] == 1
+
+def test_never_expires_early():
+    expiry, _ = make_expiry()
+    expiry.schedule('N1', '001', 10.3, now=1000.2)
+    assert expiry.due(1010.4) == []
+    assert expiry.next_deadline() >= 1010.5
+
+def test_rescheduling_moves_the_deadline():
+    expiry, _ = make_expiry()
+    expiry.schedule('N1', '001', 10, now=1000.0)
+    expiry.schedule('N1', '001', 60, now=1005.0)
+    assert expiry.due(1030.0) == []
+    assert expiry.due(1070.0) == [('N1', '001')]
+
+def test_cancelled_and_untimed_rules_never_expire():
+    expiry, _ = make_expiry()
+    expiry.schedule('N1', '001', 10, now=1000.0)
+    expiry.cancel('N1', '001')
+    expiry.schedule('N1', '002', '*', now=1000.0)
+    assert expiry.due(2000.0) == []
+    assert expiry.stats()['pending'] == 0
+
+def test_disable_messages_confirm_local_expiry():
+    expiry, _ = make_expiry()
+    expiry.schedule('N1', '001', 10, now=1000.0)
+    expiry.schedule('N1', '002', 100, now=1000.0)
+    expiry.due(1020.0)
+    assert expiry.confirm('N1', '001') == 'confirmed'
+    assert expiry.confirm('N1', '002') == 'reported early'
+    assert expiry.confirm('N9', '003') == 'unknown'
+
+def test_unconfirmed_expiries_are_counted_after_the_window():
+    expiry, _ = make_expiry()
+    expiry.schedule('N1', '001', 10, now=1000.0)
+    expiry.due(1020.0)
+    expiry.due(1020.0 + RULE_CONFIRM_WINDOW)
+    stats = expiry.stats()
+    assert stats['unconfirmed'] == 1
+    assert stats['awaiting confirmation'] == 0
+
+def test_stale_entries_are_compacted():
+    expiry, _ = make_expiry()
+    for step in range(5_000):
+        expiry.schedule('N1', '001', 100 + step, now=1000.0)
+    assert expiry.entries <= 2 * len(expiry.live) + 64
+    assert expiry.due(1000.0 + 100 + 5_000) == [('N1', '001')]
@@ -0,0 +1,41 @@
+# Tests - flow rules rendered from pre-encoded templates, and rule patches
+
+import json
+
+from rule_templates import RuleTemplate, rule_patch
+
+MATCH = {'NODE_ID': 'A', 'Src MAC': '*'}
+
+def template():
+    return RuleTemplate(**{'Command type': 'Tech switching', 'Value': 'ITSG5_rx', 'Priority': 2})
+
+def test_payload_is_the_rule_as_json():
+    rule, payload = template().render('007', json.dumps(MATCH), MATCH, 30.5, {'Traffic rate': 50}, version=2)
+    assert json.loads(payload) == dict(rule)
+    assert dict(rule) == {'Num': '007', 'Version': 2, 'match': MATCH, 'Command type': 'Tech switching',
+                          'Value': 'ITSG5_rx', 'Priority': 2, 'Traffic rate': 50, 'Counter': 0, 'Timeout': 30.5}
+    assert len(rule) == len(dict(rule))
+
+def test_rules_without_extras_are_valid_json():
+    rule, payload = template().render('001', json.dumps(MATCH), MATCH, None)
+    assert json.loads(payload) == dict(rule)
+    assert rule.get('Traffic rate') is None
+
+def test_shared_parts_are_encoded_once():
+    shared = template()
+    extras = {'Traffic rate': 50}
+    first, _ = shared.render('001', json.dumps(MATCH), MATCH, 10, extras)
+    second, _ = shared.render('002', json.dumps(MATCH), MATCH, 10, extras)
+    assert first.template is second.template
+    assert len(shared.extras_json) == 1
+
+def test_patch_carries_only_changed_fields_and_the_timeout():
+    previous, _ = template().render('001', json.dumps(MATCH), MATCH, 10, {'Traffic rate': 50})
+    patched = RuleTemplate(**{'Command type': 'Tech switching', 'Value': 'ITSG5_rx', 'Priority': 3})
+    rule, _ = patched.render('001', json.dumps(MATCH), MATCH, 20, {'Traffic rate': 50}, version=2)
+    assert rule_patch('A', previous, rule) == {'NODE_ID': 'A', 'Num': '001', 'Version': 2,
+                                               'Patch': {'Priority': 3, 'Timeout': 20}}
+
+    # Nothing else changed: the patch only restarts the rule's timeout
+    refreshed, _ = template().render('001', json.dumps(MATCH), MATCH, 10, {'Traffic rate': 50}, version=3)
+    assert rule_patch('A', previous, refreshed)['Patch'] == {'Timeout': 10}
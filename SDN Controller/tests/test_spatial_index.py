@@ -0,0 +1,95 @@
+# Tests - track and road grid indexes, radius and k-nearest queries
+
+import random
+
+import pytest
+
+import spatial_index
+from spatial_index import TrackIndex, GridIndex, nodes_within, nearest_nodes
+
+@pytest.fixture(autouse=True)
+def empty_indexes(monkeypatch):
+    monkeypatch.setattr(spatial_index, 'track_index', TrackIndex())
+    monkeypatch.setattr(spatial_index, 'road_index', GridIndex(cell_size=100))
+
+def test_track_radius_query_follows_moves():
+    index = TrackIndex()
+    for node_id, position in (('A', 0.0), ('B', 50.0), ('C', 300.0)):
+        index.update(node_id, position)
+    assert sorted(index.within(10.0, 60.0)) == [('A', 10.0), ('B', 40.0)]
+
+    index.update('C', 20.0)
+    index.remove('A')
+    assert sorted(index.within(10.0, 60.0)) == [('B', 40.0), ('C', 10.0)]
+    assert index.entries == sorted(index.entries)
+
+def test_grid_radius_query_spans_cells():
+    index = GridIndex(cell_size=100)
+    index.update('A', 95.0, 0.0)
+    index.update('B', 105.0, 0.0)
+    index.update('C', 105.0, 300.0)
+    assert sorted(n for n, _ in index.within(100.0, 0.0, 10.0)) == ['A', 'B']
+
+    index.update('C', 100.0, 5.0)
+    assert sorted(n for n, _ in index.within(100.0, 0.0, 10.0)) == ['A', 'B', 'C']
+    index.remove('B')
+    assert ('B', 5.0) not in index.within(100.0, 0.0, 10.0)
+
+def brute_nearest(points, origin, k, exclude):
+    distances = sorted((abs(p - origin) if isinstance(p, float) else
+                        ((p[0] - origin[0]) ** 2 + (p[1] - origin[1]) ** 2) ** 0.5, n)
+                       for n, p in points.items() if n not in exclude)
+    return [d for d, _ in distances[:k]]
+
+def test_k_nearest_matches_brute_force():
+    rng = random.Random(5)
+    track, grid = TrackIndex(), GridIndex(cell_size=100)
+    line = {f"N{i}": rng.uniform(0, 5000) for i in range(300)}
+    plane = {f"N{i}": (rng.uniform(0, 3000), rng.uniform(0, 3000)) for i in range(300)}
+    for node_id in line:
+        track.update(node_id, line[node_id])
+        grid.update(node_id, *plane[node_id])
+
+    for i in range(0, 300, 17):
+        node_id = f"N{i}"
+        found = track.nearest(line[node_id], 5, exclude=(node_id,))
+        assert node_id not in dict(found)
+        assert [d for _, d in found] == pytest.approx(brute_nearest(line, line[node_id], 5, {node_id}))
+
+        found = grid.nearest(*plane[node_id], 5, exclude=(node_id,))
+        assert [d for _, d in found] == pytest.approx(brute_nearest(plane, plane[node_id], 5, {node_id}))
+
+def test_k_nearest_on_small_indexes_returns_everyone():
+    grid = GridIndex(cell_size=100)
+    grid.update('A', 0.0, 0.0)
+    grid.update('B', 1000.0, 1000.0)
+    assert [n for n, _ in grid.nearest(0.0, 0.0, 5)] == ['A', 'B']
+    assert TrackIndex().nearest(0.0, 3) == []
+
+def test_neighbours_are_symmetric_in_a_mixed_fleet():
+    # R1 and R2 report road positions far apart, but sit together on the
+    # track; T only has a track position
+    spatial_index.track_index.update('R1', 0.0)
+    spatial_index.track_index.update('R2', 10.0)
+    spatial_index.track_index.update('T', 20.0)
+    spatial_index.road_index.update('R1', 0.0, 0.0)
+    spatial_index.road_index.update('R2', 900.0, 0.0)
+
+    neighbours = {node_id: dict(nodes_within(node_id, 50.0)) for node_id in ('R1', 'R2', 'T')}
+    assert neighbours['R1'] == {'T': 20.0}
+    assert neighbours['R2'] == {'T': 10.0}
+    assert neighbours['T'] == {'R1': 20.0, 'R2': 10.0}
+    for node_id, found in neighbours.items():
+        for other_id, distance in found.items():
+            assert neighbours[other_id][node_id] == distance
+
+def test_nearest_nodes_uses_the_pair_frame():
+    spatial_index.track_index.update('R1', 0.0)
+    spatial_index.track_index.update('R2', 10.0)
+    spatial_index.track_index.update('T', 500.0)
+    spatial_index.road_index.update('R1', 0.0, 0.0)
+    spatial_index.road_index.update('R2', 900.0, 0.0)
+
+    assert nearest_nodes('R1', 2) == [('T', 500.0), ('R2', 900.0)]
+    assert nearest_nodes('T', 1) == [('R2', 490.0)]
+    assert nearest_nodes('unknown', 3) == []
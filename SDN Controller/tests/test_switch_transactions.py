@@ -0,0 +1,107 @@
+# Tests - per-switch timing keyed by (rule Num, NODE_ID)
+
+import json
+import time
+
+import pytest
+
+from config import PENDING_SWITCH_EXPIRY
+from switch_transactions import SwitchTransactions
+
+@pytest.fixture
+def log_path(tmp_path):
+    return tmp_path / 'switch_timing.log'
+
+def records(log_path):
+    return [json.loads(line) for line in log_path.read_text().splitlines()] if log_path.exists() else []
+
+def test_complete_switch_is_written_with_its_stages(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.note_received('N1', now=99.0)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', generated=99.5, now=100.0)
+    transactions.acknowledge('N1', '001', now=100.2)
+    transactions.executed('N1', 'CV2X', now=101.0)
+
+    [record] = records(log_path)
+    assert record['Status'] == 'complete'
+    assert record['Controller delay'] == pytest.approx(1000.0)
+    assert record['Time to generate'] == pytest.approx(500.0)
+    assert record['Time to send FL'] == pytest.approx(100.0)
+    assert record['Time to execute'] == pytest.approx(800.0)
+    assert record['Total'] == pytest.approx(2000.0)
+    assert transactions.open_count() == 0
+
+def test_overlapping_switches_keep_their_own_timestamps(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=100.0)
+    transactions.open('N2', '002', 'CV2X', 'ITSG5', now=100.5)
+    transactions.acknowledge('N2', '002', now=100.6)
+    transactions.acknowledge('N1', '001', now=101.0)
+    transactions.executed('N2', 'ITSG5', now=101.6)
+    transactions.executed('N1', 'CV2X', now=103.0)
+
+    by_node = {record['NODE_ID']: record for record in records(log_path)}
+    assert by_node['N1']['Time to send FL'] == pytest.approx(500.0)
+    assert by_node['N2']['Time to send FL'] == pytest.approx(50.0)
+    assert by_node['N2']['Time to execute'] == pytest.approx(1000.0)
+
+def test_ack_without_num_goes_to_the_oldest_waiting_switch(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    first = transactions.open('N1', '001', 'ITSG5', 'CV2X', now=100.0)
+    second = transactions.open('N1', '002', 'ITSG5', 'CV2X', now=101.0)
+    assert transactions.acknowledge('N1', now=102.0) is first
+    assert transactions.acknowledge('N1', now=103.0) is second
+    assert transactions.acknowledge('N1', now=104.0) is None
+
+def test_only_switches_to_the_reported_interface_complete(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=100.0)
+    assert transactions.executed('N1', 'ITSG5', now=101.0) == []
+    assert transactions.open_count() == 1
+
+def test_patched_rule_supersedes_its_open_switch(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=100.0)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=102.0)
+    assert [record['Status'] for record in records(log_path)] == ['superseded']
+    assert transactions.open_count() == 1
+
+def test_unanswered_switches_are_written_as_incomplete(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=100.0)
+    transactions.open('N2', '002', 'ITSG5', 'CV2X', now=100.0 + PENDING_SWITCH_EXPIRY)
+    [record] = records(log_path)
+    assert (record['NODE_ID'], record['Status']) == ('N1', 'incomplete')
+    assert transactions.open_count() == 1
+
+def test_completing_a_switch_writes_the_expired_ones(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=100.0)
+    transactions.open('N2', '002', 'ITSG5', 'CV2X', now=101.0)
+    transactions.executed('N2', 'CV2X', now=100.0 + PENDING_SWITCH_EXPIRY)
+    assert [(record['NODE_ID'], record['Status']) for record in records(log_path)] == \
+        [('N2', 'complete'), ('N1', 'incomplete')]
+    assert transactions.open_count() == 0
+
+def test_switches_expire_after_switching_stops(log_path):
+    now = [100.0]
+    transactions = SwitchTransactions(clock=lambda: now[0], log_path=log_path)
+    transactions.open('N1', '001', 'ITSG5', 'CV2X')
+    assert transactions.next_expiry() == 100.0 + PENDING_SWITCH_EXPIRY
+    assert transactions.expire() == []
+
+    now[0] += PENDING_SWITCH_EXPIRY
+    [expired] = transactions.expire()
+    assert expired.node_id == 'N1'
+    assert transactions.next_expiry() is None
+    assert [record['Status'] for record in records(log_path)] == ['incomplete']
+
+def test_expiry_thread_writes_without_further_switches(log_path):
+    transactions = SwitchTransactions(log_path=log_path)
+    transactions.start()
+    transactions.open('N1', '001', 'ITSG5', 'CV2X', now=time.time() - PENDING_SWITCH_EXPIRY)
+    deadline = time.time() + 2
+    while transactions.open_count() and time.time() < deadline:
+        time.sleep(0.01)
+    assert transactions.open_count() == 0
+    assert [record['Status'] for record in records(log_path)] == ['incomplete']
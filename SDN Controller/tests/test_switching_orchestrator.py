@@ -0,0 +1,41 @@
+# Tests - relay switch state machines and the concurrency limit
+
+from switching_orchestrator import SwitchingOrchestrator, WAITING_INTERFACE, WAITING_MAC, CANCELLED
+
+def noop(switch):
+    pass
+
+def test_full_orchestrator_refuses_new_switches():
+    orchestrator = SwitchingOrchestrator(max_concurrent=1)
+    assert orchestrator.start('R1', 'RX', 'ITSG5', noop, noop) is not None
+    assert orchestrator.start('R1', 'RX', 'ITSG5', noop, noop) is None
+    assert orchestrator.start('R2', 'RX', 'ITSG5', noop, noop) is None
+    assert list(orchestrator.in_flight()) == ['R1']
+
+    orchestrator.cancel('R1')
+    assert orchestrator.start('R2', 'RX', 'ITSG5', noop, noop) is not None
+
+def test_switch_completes_after_interface_and_mac():
+    events = []
+    orchestrator = SwitchingOrchestrator()
+    orchestrator.start('R', 'RX', 'CV2X',
+                       on_interface_ready=lambda s: events.append('interface'),
+                       on_mac_ready=lambda s: events.append('mac'))
+
+    orchestrator.notify_fields('R', {'Src MAC': 'aa:bb'})
+    orchestrator.notify_interface('R', 'ITSG5')
+    assert events == [] and orchestrator.in_flight() == {'R': WAITING_INTERFACE}
+
+    orchestrator.notify_interface('R', 'CV2X')
+    assert orchestrator.in_flight() == {'R': WAITING_MAC}
+    orchestrator.notify_fields('R', {'Src MAC': 'aa:bb'})
+    assert events == ['interface', 'mac']
+    assert orchestrator.wait('R', 0) is None and orchestrator.in_flight() == {}
+
+def test_cancel_calls_on_failure():
+    failed = []
+    orchestrator = SwitchingOrchestrator()
+    switch = orchestrator.start('R', 'RX', 'ITSG5', noop, noop, on_failure=failed.append)
+    assert orchestrator.cancel('R')
+    assert failed == [switch] and switch.state == CANCELLED
+    assert not orchestrator.cancel('R')
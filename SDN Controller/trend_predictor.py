@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# Trend Predictor - forecasts threshold crossings from recent metric trends
+
+import time
+import logging
+import numpy as np
+from collections import deque
+
+from config import *
+
+# Global data structures
+metric_history = {}  # {(node_id, metric): deque of (timestamp, value)}
+pending_switches = {}  # {node_id: time the switching rule was sent}
+preempt_attempts = {}  # {node_id: time of the last pre-emptive switching attempt}
+predicted_versions = {}  # {node_id: window version the last prediction was made for}
+switch_durations = deque(maxlen=SWITCH_DURATION_SAMPLES)
+
+def record_sample(node_id, metric, value, timestamp=None):
+    """
+    Add a metric sample to the node's trend window
+    """
+    key = (node_id, metric)
+    if key not in metric_history:
+        metric_history[key] = deque(maxlen=TREND_WINDOW)
+    metric_history[key].append((time.time() if timestamp is None else timestamp, value))
+
+def clear_history(node_id):
+    """
+    Drop trend windows for a node (e.g. after an interface change)
+    """
+    for metric in ('Latency', 'Power'):
+        metric_history.pop((node_id, metric), None)
+
+def fit_trend(samples):
+    """
+    Least-squares line through (timestamp, value) samples.
+    Returns (level at the latest sample, slope per second) or None.
+    """
+    if len(samples) < TREND_MIN_SAMPLES:
+        return None
+    t = np.fromiter((s[0] for s in samples), dtype=float, count=len(samples))
+    v = np.fromiter((s[1] for s in samples), dtype=float, count=len(samples))
+    t -= t[-1]
+    t_mean = t.mean()
+    variance = ((t - t_mean) ** 2).sum()
+    if variance == 0:
+        return None
+    slope = ((t - t_mean) * (v - v.mean())).sum() / variance
+    level = v.mean() - slope * t_mean
+    return level, slope
+
+def time_to_crossing(samples, threshold, rising):
+    """
+    Seconds until the fitted trend crosses threshold (0 if already past,
+    None if the trend moves away from it)
+    """
+    trend = fit_trend(samples)
+    if trend is None:
+        return None
+    level, slope = trend
+    if (rising and level >= threshold) or (not rising and level <= threshold):
+        return 0.0
+    if (rising and slope <= 0) or (not rising and slope >= 0):
+        return None
+    return (threshold - level) / slope
+
+def predict_crossing(node_id):
+    """
+    Predict which trigger a node is about to hit.
+    Returns (trigger_type, seconds_to_crossing) or None.
+    """
+    candidates = []
+    latency_samples = metric_history.get((node_id, 'Latency'))
+    if latency_samples:
+        eta = time_to_crossing(latency_samples, LATENCY_SWITCH_RANGE[0], rising=True)
+        if eta is not None:
+            candidates.append(('latency', eta))
+    power_samples = metric_history.get((node_id, 'Power'))
+    if power_samples:
+        eta = time_to_crossing(power_samples, POWER_SWITCH_RANGE[1], rising=False)
+        if eta is not None:
+            candidates.append(('power', eta))
+    return min(candidates, key=lambda c: c[1]) if candidates else None
+
+def should_preempt(node_id, version=None):
+    """
+    Trigger type if the node is predicted to cross a switching threshold
+    within the measured switch duration, None otherwise. A trigger counts
+    as an attempt whether or not rules go out, and the node gets no other
+    one for PREEMPT_COOLDOWN seconds; with a window version, nothing is
+    predicted twice for the same window.
+    """
+    if version is not None:
+        if predicted_versions.get(node_id) == version:
+            return None
+        predicted_versions[node_id] = version
+    
+    now = time.time()
+    if node_id in pending_switches:
+        if now - pending_switches[node_id] < PENDING_SWITCH_EXPIRY:
+            return None
+        del pending_switches[node_id]
+    if now - preempt_attempts.get(node_id, float('-inf')) < PREEMPT_COOLDOWN:
+        return None
+
+    prediction = predict_crossing(node_id)
+    if prediction is None:
+        return None
+    trigger_type, eta = prediction
+    # Crossings that already happened are left to the reactive path
+    if 0 < eta <= median_switch_duration():
+        logging.info(f"Predicted {trigger_type} threshold crossing for NODE {node_id} in {eta:.2f} s")
+        preempt_attempts[node_id] = now
+        return trigger_type
+    return None
+
+def record_switch_request(node_id, timestamp=None):
+    """
+    Remember when a switching rule was sent to a node
+    """
+    pending_switches[node_id] = time.time() if timestamp is None else timestamp
+
+def record_switch_completion(node_id, timestamp=None):
+    """
+    Measure the switch duration once the node reports its new interface
+    """
+    preempt_attempts.pop(node_id, None)
+    requested = pending_switches.pop(node_id, None)
+    if requested is None:
+        return None
+    duration = (time.time() if timestamp is None else timestamp) - requested
+    switch_durations.append(duration)
+    logging.info(f"Measured switch duration for NODE {node_id}: {duration * 1000:.1f} ms")
+    return duration
+
+def median_switch_duration():
+    """
+    Median measured switch duration, or the configured default
+    """
+    if not switch_durations:
+        return DEFAULT_SWITCH_DURATION
+    return float(np.median(switch_durations))
+
+def window_values(node_id, metric):
+    """
+    Values currently held in a node's trend window
+    """
+    return [v for _, v in metric_history.get((node_id, metric), ())]
@@ -12,6 +12,12 @@ MQTT_TOPIC_COMMAND = 'node/command'
 MQTT_TOPIC_DATA = 'node/data'
 MQTT_TOPIC_DISABLE = 'node/disable'
 MQTT_TOPIC_RECEIVED = 'node/received'
+MQTT_TOPIC_GROUP = 'node/command/group'
+MQTT_TOPIC_DIGEST = 'node/digest'
+
+# Rule Set Digest (buckets must match the controller)
+RULE_DIGEST_BUCKETS = 32
+RULE_DIGEST_INTERVAL = 30  # seconds between rule set digests
 
 # Node Identity
 NODE_ID = ''.join(random.choices(string.digits, k=2)) + ''.join(random.choices(string.ascii_letters, k=2))
@@ -34,5 +40,9 @@ CV2X_TX_LOG = f'{LOG_BASE}/cv2x_tx.log'
 CV2X_RX_LOG = f'{LOG_BASE}/cv2x_rx.log'
 ACME_RX_LOG = f'{LOG_BASE}/acme_lan/acme_rx.log'
 
+# Rate Control (used until the controller sends congestion hints)
+DEFAULT_REPORT_INTERVAL = 5  # seconds between telemetry extractions
+SWITCH_TECH_PATH = '/mnt/rw/switch_tech.py'
+
 # Interface Configuration
 CV2X_IFACES = {'tx': 'rmnet_usb1', 'rx': 'rmnet_usb1'}
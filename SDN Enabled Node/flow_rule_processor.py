@@ -6,14 +6,27 @@ import time
 import threading
 from datetime import datetime, timedelta
 import os
+import zlib
 from config import *
 
+def bucket_of(num):
+    """Digest bucket of a rule Num, as the controller computes it"""
+    return zlib.crc32(str(num).encode()) % RULE_DIGEST_BUCKETS
+
+def rule_hash(num, version):
+    return zlib.crc32(f"{num}:{version}".encode())
+
 class FlowRuleProcessor:
     def __init__(self):
         self.received_flow_rules = []
         self.flow_rule_timeouts = {}
         self.executed_flow_value = None
         self.current_tech = None
+        self.report_interval = DEFAULT_REPORT_INTERVAL
+        self.traffic_rate = None
+        self.tx_profile = None
+        self.groups = set()
+        self.group_rules = {}  # {gid: rule}, one active rule per group
         self._init_state()
 
     def _init_state(self):
@@ -30,19 +43,62 @@ class FlowRuleProcessor:
 
     def process_rule(self, data):
         """Identical to original on_message processing"""
-        if 'match' not in data or data['match'].get('NODE_ID') != NODE_ID:
+        if 'match' not in data:
+            return False
+        gid = data['match'].get('Group')
+        if data['match'].get('NODE_ID') != NODE_ID and gid not in self.groups:
             return False
 
+        if any(rule['Num'] == data['Num'] and rule.get('Version', 1) > data.get('Version', 1)
+               for rule in self.received_flow_rules):
+            return False  # a retried copy older than the patches already applied
+        if gid is not None:
+            # A group rule replaces the group's previous one
+            self._drop_group_rule(gid)
+            self.group_rules[gid] = data
+        # A rule resent during reconciliation replaces the copy the node has
+        for rule in [rule for rule in self.received_flow_rules if rule['Num'] == data['Num']]:
+            self._drop_rule(rule)
         self.received_flow_rules.append(data)
         if 'Counter' not in data:
             data['Counter'] = 0
+        data.setdefault('Version', 1)
             
         timeout = data['Timeout']
         self.flow_rule_timeouts[data['Num']] = (
             datetime.now() + timedelta(seconds=timeout)
         )
         self.display_rules()
+        if gid is not None and self._has_own_rule(data['Value']):
+            # Rules sent to this node win over its group's rule
+            return False
+        return self._apply(data)
+
+    def apply_patch(self, data):
+        """Update a rule in place from a controller patch"""
+        if data.get('NODE_ID') != NODE_ID:
+            return False
+        rule = next((rule for rule in self.received_flow_rules
+                     if rule['Num'] == data['Num'] and rule['match'].get('NODE_ID') == NODE_ID), None)
+        if rule is None or rule.get('Version', 1) >= data['Version']:
+            return False  # expired meanwhile, or an older patch arriving late
+
+        rule.update(data['Patch'])
+        rule['Version'] = data['Version']
+        self.flow_rule_timeouts[rule['Num']] = (
+            datetime.now() + timedelta(seconds=rule['Timeout'])
+        )
+        self.display_rules()
+        if data['Patch'].keys() <= {'Timeout'}:
+            return False  # only the timeout was refreshed
+        return self._apply(rule)
+
+    def _apply(self, data):
+        """Act on a new or changed rule"""
+        self.update_tx_hints(data)
         
+        if data.get('Command type') == 'Rate control':
+            return 'RATE'
         if data['Value'] == 'Initialization':
             return 'INIT'
         else:
@@ -52,6 +108,57 @@ class FlowRuleProcessor:
                 return 'ACK'
         return True
 
+    def set_groups(self, groups):
+        """Forget the rules of groups the node no longer belongs to"""
+        self.groups = set(groups)
+        for gid in list(self.group_rules):
+            if gid not in self.groups:
+                self._drop_group_rule(gid)
+        self.display_rules()
+
+    def _drop_group_rule(self, gid):
+        rule = self.group_rules.pop(gid, None)
+        if rule is None:
+            return
+        if rule in self.received_flow_rules:
+            self.received_flow_rules.remove(rule)
+        self.flow_rule_timeouts.pop(rule['Num'], None)
+
+    def _drop_rule(self, rule):
+        gid = rule['match'].get('Group')
+        if gid is not None and self.group_rules.get(gid) is rule:
+            self._drop_group_rule(gid)
+            return
+        self.received_flow_rules.remove(rule)
+        self.flow_rule_timeouts.pop(rule['Num'], None)
+
+    def digest(self):
+        """{bucket: XOR of (Num, Version) hashes} of the active rules, empty buckets left out"""
+        digest = {}
+        for rule in self.received_flow_rules:
+            bucket = bucket_of(rule['Num'])
+            digest[bucket] = digest.get(bucket, 0) ^ rule_hash(rule['Num'], rule.get('Version', 1))
+        return {str(bucket): value for bucket, value in digest.items() if value}
+
+    def bucket_rules(self, buckets):
+        """{Num: Version} of the active rules in the given digest buckets"""
+        buckets = set(buckets)
+        return {rule['Num']: rule.get('Version', 1) for rule in self.received_flow_rules
+                if bucket_of(rule['Num']) in buckets}
+
+    def drop_rules(self, data):
+        """Drop the rules the controller does not have, or has at another Version"""
+        if data.get('NODE_ID') != NODE_ID:
+            return
+        nums = set(data['Drop'])
+        for rule in [rule for rule in self.received_flow_rules if rule['Num'] in nums]:
+            self._drop_rule(rule)
+        self.display_rules()
+
+    def _has_own_rule(self, value):
+        return any(rule['Value'] == value and rule['match'].get('NODE_ID') == NODE_ID
+                   for rule in self.received_flow_rules)
+
     def evaluate_rule(self, data):
         """Preserved threshold evaluation logic"""
         self.latency_threshold = float('inf')
@@ -64,6 +171,18 @@ class FlowRuleProcessor:
             except ValueError:
                 pass
 
+    def update_tx_hints(self, data):
+        """Congestion hints and TX profile carried by controller rules"""
+        if isinstance(data.get('TX profile'), dict):
+            self.tx_profile = data['TX profile']
+        try:
+            if data.get('Report interval', '*') != '*':
+                self.report_interval = float(data['Report interval'])
+            if data.get('Traffic rate', '*') != '*':
+                self.traffic_rate = int(data['Traffic rate'])
+        except ValueError:
+            pass
+
     def check_timeouts(self):
         """Original timeout checking logic"""
         current_time = datetime.now()
@@ -77,11 +196,14 @@ class FlowRuleProcessor:
             for rule in self.received_flow_rules:
                 if rule['Num'] == num:
                     yield {
-                        'NODE_ID': rule['match']['NODE_ID'],
+                        'NODE_ID': NODE_ID,
                         'Num': rule['Num'],
                         'Value': rule['Value']
                     }
                     self.received_flow_rules.remove(rule)
+                    gid = rule['match'].get('Group')
+                    if self.group_rules.get(gid) is rule:
+                        del self.group_rules[gid]
                     break
             del self.flow_rule_timeouts[num]
         
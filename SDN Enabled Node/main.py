@@ -19,6 +19,7 @@ class NodeApplication:
         self.tech = TechController()
         self.monitor = DataMonitor()
         self.forwarding = ForwardingManager()
+        self.tech.extract_callback = lambda: self.monitor.extract_all_data(self.current_tech)
         
         # Original global state tracking
         self.initialization_done = False
@@ -36,6 +37,7 @@ class NodeApplication:
         threading.Thread(target=self._check_flow_rules).start()
         threading.Thread(target=self._log_received_rules).start()
         threading.Thread(target=self._log_executed_values).start()
+        threading.Thread(target=self._publish_rule_digest).start()
         
         # Main loop
         while True:
@@ -50,6 +52,14 @@ class NodeApplication:
                 self.mqtt.publish(MQTT_TOPIC_DISABLE, expired_rule)
             time.sleep(5)
 
+    def _publish_rule_digest(self):
+        """Let the controller check its view of this node's rules"""
+        while True:
+            time.sleep(RULE_DIGEST_INTERVAL)
+            if self.mqtt.connected:
+                self.mqtt.publish(MQTT_TOPIC_DIGEST, {'NODE_ID': NODE_ID,
+                                                      'Digest': self.flow_rules.digest()})
+
     def _log_received_rules(self):
         """Original rule logging thread"""
         while True:
@@ -73,6 +83,8 @@ class NodeApplication:
 
     def process_message(self, msg):
         """Original message processing pipeline"""
+        if not msg.payload:
+            return  # a cleared retained group rule
         data = json.loads(msg.payload)
         
         # Flow rule handling
@@ -82,12 +94,45 @@ class NodeApplication:
                 self.tech.handle_initialization()
                 self.flow_rules.increment_counter('Initialization')
             elif result == 'ACK':
-                self.mqtt.send_received_ack()
+                self.mqtt.send_received_ack(data['Num'])
+            if result:
+                self._apply_tx_hints()
+        
+        # Changes to a rule the node already has
+        elif 'Patch' in data:
+            result = self.flow_rules.apply_patch(data)
+            if result == 'ACK':
+                self.mqtt.send_received_ack(data['Num'])
+            if result:
+                self._apply_tx_hints()
+        
+        # The controller's digest differs: report the rules held in those buckets
+        elif 'Reconcile' in data:
+            if data.get('NODE_ID') == NODE_ID:
+                buckets = data['Reconcile']['Buckets']
+                self.mqtt.publish(MQTT_TOPIC_DIGEST, {'NODE_ID': NODE_ID, 'Buckets': buckets,
+                                                      'Rules': self.flow_rules.bucket_rules(buckets)})
+        
+        # Rules the controller no longer has for this node
+        elif 'Drop' in data:
+            self.flow_rules.drop_rules(data)
+        
+        # Rule group membership
+        elif 'Groups' in data:
+            self.mqtt.set_groups(data['Groups'])
+            self.flow_rules.set_groups(data['Groups'])
         
         # Value execution
         elif 'Value' in data:
             self._execute_value(data['Value'])
 
+    def _apply_tx_hints(self):
+        """Follow the controller's congestion hints and TX profile"""
+        self.tech.set_tx_hints(self.flow_rules.report_interval,
+                               self.flow_rules.traffic_rate,
+                               self.flow_rules.tx_profile,
+                               self.current_tech)
+
     def _execute_value(self, value):
         """Original value execution logic"""
         self.executed_flow_value = value
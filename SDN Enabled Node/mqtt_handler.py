@@ -15,12 +15,15 @@ class MQTTHandler:
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
         self.connected = False
+        self.groups = set()
 
     def _on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self.connected = True
             logging.info(f"Connected to MQTT broker")
             client.subscribe(f"{MQTT_TOPIC_COMMAND}/{NODE_ID}")
+            for gid in self.groups:
+                client.subscribe(f"{MQTT_TOPIC_GROUP}/{gid}")
             self._send_own_info()
         else:
             logging.error(f"Connection failed with code {rc}")
@@ -44,8 +47,19 @@ class MQTTHandler:
     def publish(self, topic, payload):
         self.client.publish(topic, json.dumps(payload), qos=1)
 
-    def send_received_ack(self):
-        ack = {"NODE_ID": NODE_ID, "Received": "True"}
+    def set_groups(self, groups):
+        """Follow the rule groups the controller assigned; a retained group rule arrives on subscribe"""
+        groups = set(groups)
+        for gid in self.groups - groups:
+            self.client.unsubscribe(f"{MQTT_TOPIC_GROUP}/{gid}")
+        for gid in groups - self.groups:
+            self.client.subscribe(f"{MQTT_TOPIC_GROUP}/{gid}")
+        self.groups = groups
+        logging.info(f"Rule groups: {sorted(groups)}")
+
+    def send_received_ack(self, num=None):
+        """Acknowledge a switching rule; the Num lets the controller time each switch separately"""
+        ack = {"NODE_ID": NODE_ID, "Received": "True", "Num": num}
         self.publish(MQTT_TOPIC_RECEIVED, ack)
         logging.info(f"Sent Received ACK: {ack}")
 
@@ -11,24 +11,31 @@ class TechController:
         self.current_capture_processes = []
         self.initialization_done = False
         self.extract_timer = None
+        self.extract_callback = None
+        self.report_interval = DEFAULT_REPORT_INTERVAL
+        self.traffic_rate = None
+        self.tx_profile = None
         self.T_f = None
 
     def handle_initialization(self):
         """Original initialization sequence"""
         result = subprocess.run(
-            ['/mnt/rw/switch_tech.py', 'check'],
+            [SWITCH_TECH_PATH, 'check'],
             capture_output=True, 
             text=True
         )
         if "No technology is currently active" not in result.stdout:
-            subprocess.run(['/mnt/rw/switch_tech.py', 'disc'])
+            subprocess.run([SWITCH_TECH_PATH, 'disc'])
         self.current_tech = None
         self.initialization_done = True
 
     def switch_technology(self, target_tech, current_tech_prefix):
         """Original tech switching with timing"""
+        command = [SWITCH_TECH_PATH, target_tech]
+        if target_tech.endswith('_tx'):
+            command += self._profile_args(target_tech)
         proc = subprocess.Popen(
-            ['/mnt/rw/switch_tech.py', target_tech],
+            command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True
@@ -101,6 +108,33 @@ class TechController:
         self.extract_timer = threading.Timer(0, self._start_periodic_extraction)
         self.extract_timer.start()
 
+    def _start_periodic_extraction(self):
+        """Extraction re-armed at the controller's reporting interval"""
+        if self.extract_callback:
+            self.extract_callback()
+        self.extract_timer = threading.Timer(self.report_interval, self._start_periodic_extraction)
+        self.extract_timer.start()
+
+    def set_tx_hints(self, report_interval, traffic_rate, tx_profile, current_action):
+        """Apply congestion hints and TX profile; changes restart only the running transmitter"""
+        self.report_interval = report_interval
+        if traffic_rate == self.traffic_rate and tx_profile == self.tx_profile:
+            return
+        self.traffic_rate = traffic_rate
+        self.tx_profile = tx_profile
+        if current_action and current_action.endswith('_tx'):
+            subprocess.run([SWITCH_TECH_PATH, 'profile'] + self._profile_args(current_action))
+
+    def _profile_args(self, target_tech):
+        """switch_tech.py options for the TX profile, rate defaulting to the congestion hint"""
+        profile = dict(self.tx_profile or {})
+        if target_tech.startswith('ITSG5') and self.traffic_rate and 'Rate' not in profile:
+            profile['Rate'] = self.traffic_rate
+        args = []
+        for key, value in profile.items():
+            args += [f"--{key.lower()}", str(value)]
+        return args
+
     def _cancel_extraction_timer(self):
         """Original timer cancellation"""
         if self.extract_timer:
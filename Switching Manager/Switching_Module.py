@@ -10,11 +10,25 @@ import warnings
 # Ignore DeprecationWarning
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Define paths for various technologies
-ACME_PATH = "/usr/bin/acme"
+# Define paths for various technologies (overridable, e.g. with shim binaries that log their arguments)
+LLC_PATH = os.environ.get("LLC_PATH", "llc")
+ACME_PATH = os.environ.get("ACME_PATH", "/usr/bin/acme")
+# Privilege wrapper for commands; SWITCH_SUDO="" runs them directly
+SUDO = os.environ.get("SWITCH_SUDO", "sudo").split()
 LOG_PATH = "/mnt/rw/log"
 ACME_LOG_PATH = "/mnt/rw/log/acme_lan"
 
+# TX profile fields and the llc test-tx options carrying them
+PROFILE_KEYS = ("mcs", "power", "rate", "length")
+# Values of the original fixed TX commands, used for any field a profile leaves out
+BASELINE_TX_PROFILES = {
+    "ITSG5": {"mcs": "MK2MCS_R12QPSK", "power": 30, "rate": 100, "length": 50},
+    "CV2X": {"mcs": 5, "power": 23, "length": 300},
+}
+ITSG5_TX_OPTIONS = {"power": "-p", "mcs": "-m", "rate": "-r", "length": "-l"}
+ITSG5_TX_PATTERN = f"{LLC_PATH} -i0 test-tx"
+ACME_TX_PATTERN = f"{ACME_PATH} .*-k"
+
 # Ensure that the log directory exists
 if not os.path.exists(LOG_PATH):
     os.makedirs(LOG_PATH)
@@ -84,15 +98,22 @@ def check_CV2X_communication():
     return False
 
 
+# Launch the ITSG5 test traffic with the given TX profile over the baseline one
+def start_ITSG5_test_tx(profile):
+    profile = {**BASELINE_TX_PROFILES["ITSG5"], **profile}
+    return subprocess.Popen(
+        [*SUDO, LLC_PATH, "-i0", "test-tx", "-c", "184", "-a", "3", "-p", str(profile["power"]),
+         "-m", str(profile["mcs"]), "-n", "100000", "-r", str(profile["rate"]), "-l", str(profile["length"]),
+         "-g", "time", "-f", "txlog.txt"], stdout=open(f"{LOG_PATH}/llc_tx_test.log", "w"),
+        stderr=subprocess.STDOUT)
+
+
 # Launch ITSG5_tx
-def start_ITSG5_tx():
+def start_ITSG5_tx(profile=None):
     print("Starting ITSG5 TX service...")
-    subprocess.run(["sudo", "llc", "-i0", "chconfig", "-s", "-w", "CCH", "-c", "184", "-a", "3"],
+    subprocess.run([*SUDO, LLC_PATH, "-i0", "chconfig", "-s", "-w", "CCH", "-c", "184", "-a", "3"],
                    stdout=open(f"{LOG_PATH}/llc_tx_chconfig.log", "w"), stderr=subprocess.STDOUT)
-    tx_process = subprocess.Popen(
-        ["sudo", "llc", "-i0", "test-tx", "-c", "184", "-a", "3", "-p", "30", "-m", "MK2MCS_R12QPSK", "-n", "100000",
-         "-r", "100", "-l", "50", "-g", "time", "-f", "txlog.txt"], stdout=open(f"{LOG_PATH}/llc_tx_test.log", "w"),
-        stderr=subprocess.STDOUT)
+    tx_process = start_ITSG5_test_tx(profile or {})
     if check_ITS_G5_communication():
         print("ITSG5 TX started successfully and is running in the background.")
     else:
@@ -102,11 +123,11 @@ def start_ITSG5_tx():
 # Launch ITSG5_rx
 def start_ITSG5_rx():
     print("Starting ITSG5 RX service...")
-    subprocess.run(["sudo", "llc", "-i0", "chconfig", "-s", "-w", "CCH", "-c", "184", "-a", "3"],
+    subprocess.run([*SUDO, LLC_PATH, "-i0", "chconfig", "-s", "-w", "CCH", "-c", "184", "-a", "3"],
                    stdout=open(f"{LOG_PATH}/llc_tx_chconfig.log", "w"), stderr=subprocess.STDOUT)
-    subprocess.run(["sudo", "llc", "-i1", "chconfig", "-s", "-w", "SCH", "-c", "184", "-a", "3"],
+    subprocess.run([*SUDO, LLC_PATH, "-i1", "chconfig", "-s", "-w", "SCH", "-c", "184", "-a", "3"],
                    stdout=open(f"{LOG_PATH}/llc_rx_chconfig.log", "w"), stderr=subprocess.STDOUT)
-    subprocess.Popen(["sudo", "llc", "-i1", "test-rx", "-c", "184", "-y", "-l", "-f", "rxlog.txt"],
+    subprocess.Popen([*SUDO, LLC_PATH, "-i1", "test-rx", "-c", "184", "-y", "-l", "-f", "rxlog.txt"],
                      stdout=open(f"{LOG_PATH}/llc_rx_test.log", "w"), stderr=subprocess.STDOUT)
     if check_ITS_G5_communication():
         print("ITSG5 RX started successfully and is running in the background.")
@@ -114,22 +135,29 @@ def start_ITSG5_rx():
         stop_current_tech()
 
 
+# Launch the acme CV2X transmitter with the given TX profile over the baseline one
+def start_acme_tx(profile):
+    profile = {**BASELINE_TX_PROFILES["CV2X"], **profile}
+    return subprocess.Popen([*SUDO, ACME_PATH, "-l", str(profile["length"]),
+                             "-W", f"{profile['power']},{profile['mcs']},0", "-k", "10000"],
+                            stdout=open(f"{ACME_LOG_PATH}/acme_tx.log", "w"), stderr=subprocess.STDOUT)
+
+
 # Launch CV2X_tx
-def start_CV2X_tx():
+def start_CV2X_tx(profile=None):
     print("Starting CV2X TX service...")
-    subprocess.run(["sudo", "systemctl", "start", "cv2x"], stdout=open(f"{LOG_PATH}/cv2x_service.log", "w"),
+    subprocess.run([*SUDO, "systemctl", "start", "cv2x"], stdout=open(f"{LOG_PATH}/cv2x_service.log", "w"),
                    stderr=subprocess.STDOUT)
-    subprocess.Popen(["sudo", ACME_PATH, "-l", "300", "-W", "23,5,0", "-k", "10000"],
-                     stdout=open(f"{ACME_LOG_PATH}/acme_tx.log", "w"), stderr=subprocess.STDOUT)
+    start_acme_tx(profile or {})
     print("CV2X TX is started successfully and is running in the background.")
 
 
 # Launch CV2X_rx
 def start_CV2X_rx():
     print("Starting CV2X RX service...")
-    subprocess.run(["sudo", "systemctl", "start", "cv2x"], stdout=open(f"{LOG_PATH}/cv2x_service.log", "w"),
+    subprocess.run([*SUDO, "systemctl", "start", "cv2x"], stdout=open(f"{LOG_PATH}/cv2x_service.log", "w"),
                    stderr=subprocess.STDOUT)
-    subprocess.Popen(["sudo", ACME_PATH, "-R"], stdout=open(f"{ACME_LOG_PATH}/acme_rx.log", "w"),
+    subprocess.Popen([*SUDO, ACME_PATH, "-R"], stdout=open(f"{ACME_LOG_PATH}/acme_rx.log", "w"),
                      stderr=subprocess.STDOUT)
     if check_CV2X_communication():
         print(
@@ -143,7 +171,7 @@ def stop_current_tech():
     print("Attempting to stop current technology...")
     for i in range(5):
         print("Stopping etsa...")
-        subprocess.run(["sudo", "pkill", "-9", "-f", "etsa"])
+        subprocess.run([*SUDO, "pkill", "-9", "-f", "etsa"])
         print("Stopping llc...")
 
         # Get PIDs of llc processes, filtering out unwanted ones
@@ -153,12 +181,12 @@ def stop_current_tech():
             if pid and 'llc -i0 config' not in pid and 'llc -i1 count' not in pid and '[cw-llc' not in pid:
                 pid = pid.split()[0]  # Extract the PID
                 print(f"Force killing llc process with PID: {pid}")
-                subprocess.run(["sudo", "kill", "-9", pid])
+                subprocess.run([*SUDO, "kill", "-9", pid])
 
         print("Stopping cv2x...")
-        subprocess.run(["sudo", "systemctl", "stop", "cv2x"])
+        subprocess.run([*SUDO, "systemctl", "stop", "cv2x"])
         print("Stopping acme...")
-        subprocess.run(["sudo", "pkill", "-9", "-f", "acme"])
+        subprocess.run([*SUDO, "pkill", "-9", "-f", "acme"])
 
         # Verify that all processes are stopped
         llc_processes = subprocess.run("pgrep -a -f 'llc -i'", shell=True, capture_output=True,
@@ -210,15 +238,85 @@ def query_current_tech():
         print("No technology is currently active.")
 
 
+# Apply a new TX profile to the running transmitter without restarting the technology;
+# options not given keep the values it is running with, or the baseline ones
+def set_tx_profile(args):
+    current_tech = confirm_current_tech()
+    if current_tech == "ITSG5":
+        profile = {**running_profile("ITSG5"), **parse_profile(args)}
+        subprocess.run([*SUDO, "pkill", "-f", ITSG5_TX_PATTERN])
+        start_ITSG5_test_tx(profile)
+    elif current_tech == "CV2X":
+        profile = {**running_profile("CV2X"), **parse_profile(args)}
+        subprocess.run([*SUDO, "pkill", "-f", ACME_TX_PATTERN])
+        start_acme_tx(profile)
+    else:
+        print("No technology is currently active, profile applies on the next start.")
+        return
+    print(f"{current_tech} TX profile set to {profile}.")
+
+
+# Value following an option in an argument list, None if the option is absent
+def option_value(args, option):
+    if option not in args:
+        return None
+    index = args.index(option)
+    if index + 1 >= len(args):
+        return None
+    value = args[index + 1]
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+# Read '--mcs', '--power', '--rate' and '--length' from the remaining arguments
+def parse_profile(args):
+    profile = {}
+    for key in PROFILE_KEYS:
+        value = option_value(args, f"--{key}")
+        if value is not None:
+            profile[key] = value
+    return profile
+
+
+# Profile of the running transmitter, read back from its command line
+def running_profile(tech):
+    pattern, tool = (ITSG5_TX_PATTERN, LLC_PATH) if tech == "ITSG5" else (ACME_TX_PATTERN, ACME_PATH)
+    processes = subprocess.run(["pgrep", "-a", "-f", pattern], capture_output=True,
+                               text=True).stdout.strip().split('\n')
+    args = []
+    for process in processes:
+        # Skip other command lines that merely mention the pattern (shells, sudo wrappers)
+        tokens = process.split()
+        if tool in tokens:
+            args = tokens[tokens.index(tool) + 1:]
+            if (args[:2] == ["-i0", "test-tx"]) if tech == "ITSG5" else ("-k" in args):
+                break
+            args = []
+    profile = {}
+    if tech == "ITSG5":
+        for key, flag in ITSG5_TX_OPTIONS.items():
+            value = option_value(args, flag)
+            if value is not None:
+                profile[key] = value
+    else:
+        length = option_value(args, "-l")
+        if length is not None:
+            profile["length"] = length
+        weights = str(option_value(args, "-W") or "").split(",")
+        if len(weights) >= 2:
+            profile["power"], profile["mcs"] = (int(v) if v.lstrip("-").isdigit() else v for v in weights[:2])
+    return profile
+
+
 # Function to display available operations
 def display_available_operations():
     print("Available operations:")
     print("- check: Query current technology.")
     print("- disc: Disconnect current technology.")
-    print("- ITSG5_tx: Start ITSG5 TX service.")
+    print("- ITSG5_tx [--mcs <name>] [--power <dBm>] [--rate <pps>] [--length <bytes>]: Start ITSG5 TX service.")
     print("- ITSG5_rx: Start ITSG5 RX service.")
-    print("- CV2X_tx: Start CV2X TX service.")
+    print("- CV2X_tx [--mcs <index>] [--power <dBm>] [--length <bytes>]: Start CV2X TX service.")
     print("- CV2X_rx: Start CV2X RX service.")
+    print("- profile [options]: Apply a TX profile to the running transmitter.")
     print("- help: Display available operations.")
 
 
@@ -241,7 +339,7 @@ def main():
             print("Already using ITSG5.")
         else:
             disconnect_current_tech()
-            start_ITSG5_tx()
+            start_ITSG5_tx(parse_profile(sys.argv[2:]))
     elif operation == "ITSG5_rx":
         current_tech = confirm_current_tech()
         if current_tech == "ITSG5":
@@ -255,7 +353,7 @@ def main():
             print("Already using CV2X.")
         else:
             disconnect_current_tech()
-            start_CV2X_tx()
+            start_CV2X_tx(parse_profile(sys.argv[2:]))
     elif operation == "CV2X_rx":
         current_tech = confirm_current_tech()
         if current_tech == "CV2X":
@@ -263,6 +361,8 @@ def main():
         else:
             disconnect_current_tech()
             start_CV2X_rx()
+    elif operation == "profile":
+        set_tx_profile(sys.argv[2:])
     elif operation == "help":
         display_available_operations()
     else:
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# Radio Tool Shim - stands in for llc/acme and logs the arguments it receives
+#
+# Link it under the tool's name and point the switching module at it:
+#   ln -s $PWD/radio_shim.py /tmp/shim/llc
+#   ln -s $PWD/radio_shim.py /tmp/shim/acme
+#   LLC_PATH=/tmp/shim/llc ACME_PATH=/tmp/shim/acme SWITCH_SUDO="" ./Switching_Module.py ITSG5_tx --mcs MK2MCS_R34QPSK
+
+import os
+import sys
+import json
+import time
+
+SHIM_LOG = os.environ.get("SHIM_LOG", "/tmp/radio_shim.log")
+
+
+def main():
+    entry = {"time": time.time(), "tool": os.path.basename(sys.argv[0]), "args": sys.argv[1:]}
+    with open(SHIM_LOG, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()